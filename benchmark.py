@@ -0,0 +1,259 @@
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import time
+import warnings
+
+import matplotlib
+
+matplotlib.use("Agg")  # 无显示环境下绘图，须在导入 pyplot 之前设置
+
+import matplotlib.pyplot as plt
+import networkx as nx
+import numpy as np
+import scipy
+
+from campus_generator import MAP_HEIGHT, MAP_WIDTH, write_campus
+from csr_graph import CSRGraph
+from history import EditJournal
+from map_renderer import MapRenderer
+from routing_engine import RoutingEngine, SEARCH_METHODS
+
+
+# 规模基准测试：用合成校园路网测量 CSV 读取、建图、最短路径、点击命中、撤回日志与整图重绘的耗时，
+# 结果以 JSON 输出（每项一条记录），可保存下来与之后的运行结果对比，发现性能回退
+#
+# 用法：python benchmark.py --sizes 1000 10000 100000 --out bench.json [--baseline old.json]
+
+DEFAULT_SIZES = [1000, 10000, 100000]
+# 节点数超过该值时跳过绘制测试（每个节点一个文字标签，整图绘制耗时随节点数线性增长）
+DRAW_NODE_LIMIT = 20000
+# 对比基准结果时，耗时增加超过该比例视为回退
+REGRESSION_THRESHOLD = 0.3
+
+
+def _time(fn, *args):
+    """执行一次，返回 (秒, 返回值)"""
+    begin = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - begin, result
+
+
+def _best(repeat, fn, *args):
+    """执行 repeat 次，返回 (最短耗时, 最后一次的返回值)；取最小值以减小系统噪声的影响"""
+    best = float("inf")
+    for _ in range(repeat):
+        seconds, result = _time(fn, *args)
+        best = min(best, seconds)
+    return best, result
+
+
+class BenchmarkRun:
+    """一次测试运行：收集 (规模, 项目, 耗时) 记录"""
+
+    def __init__(self, data_dir, queries=50, picks=1000, edits=200, repeat=3, seed=0):
+        self.data_dir = data_dir
+        self.queries = queries
+        self.picks = picks
+        self.edits = edits
+        self.repeat = repeat  # 读取、建图等一次性操作的重复次数
+        self.seed = seed
+        self.results = []
+
+    def record(self, size, name, seconds, ops=1, **extra):
+        entry = {"size": size, "name": name, "seconds": round(seconds, 6), "ops": ops,
+                 "ms_per_op": round(seconds / ops * 1000, 4) if ops else None}
+        entry.update(extra)
+        self.results.append(entry)
+        print(f"  {name:<32} {entry['ms_per_op']:>12.3f} ms/次  （{ops} 次）")
+
+    def run_size(self, size):
+        print(f"节点数 {size}")
+        out_dir = os.path.join(self.data_dir, f"campus_{size}")
+        node_path = os.path.join(out_dir, "node.csv")
+        edge_path = os.path.join(out_dir, "edge.csv")
+        if not (os.path.exists(node_path) and os.path.exists(edge_path)):
+            seconds, _ = _time(write_campus, out_dir, size, self.seed)
+            self.record(size, "generate", seconds)
+
+        # 读取与建图
+        seconds, engine = _best(self.repeat, RoutingEngine, node_path, edge_path)
+        self.record(size, "csv_load", seconds, edges=len(engine.edges))
+
+        def build_networkx():
+            engine.G = None  # 丢弃已建好的图，下次访问时重建
+            return engine.G
+
+        seconds, _ = _best(self.repeat, build_networkx)
+        self.record(size, "build_networkx", seconds)
+        seconds, _ = _best(self.repeat, CSRGraph.from_edges, engine.locations, engine.edges.values())
+        self.record(size, "build_csr", seconds)
+        snapshot_path = os.path.join(out_dir, "map.snap")
+        seconds, _ = _best(self.repeat, engine.save_snapshot, snapshot_path)
+        self.record(size, "snapshot_write", seconds)
+        seconds, _ = _best(self.repeat, RoutingEngine(None).load_snapshot, snapshot_path)
+        self.record(size, "snapshot_load", seconds)
+
+        rng = random.Random(self.seed)
+        names = list(engine.locations)
+        self._routing(size, engine, rng, names)
+        self._picking(size, engine, rng)
+        self._editing(size, engine, rng, names)
+        if size <= DRAW_NODE_LIMIT:
+            self._drawing(size, engine, rng, names)
+        else:
+            print(f"  节点数超过 {DRAW_NODE_LIMIT}，跳过绘制测试")
+
+    def _routing(self, size, engine, rng, names):
+        pairs = [tuple(rng.sample(names, 2)) for _ in range(self.queries)]
+        engine.geometry()  # A* 启发函数的坐标表，不计入查询耗时
+        for method in SEARCH_METHODS:
+            if method in ("ch", "overlay"):
+                continue  # 需要单独预处理，见 contraction.py / floors.py
+            expanded = 0
+            begin = time.perf_counter()
+            for start, end in pairs:
+                try:
+                    engine.shortest_path(start, end, method)
+                except nx.NetworkXNoPath:
+                    pass
+                expanded += engine.last_expanded
+            self.record(size, f"shortest_path.{method}", time.perf_counter() - begin, len(pairs),
+                        mean_expanded=round(expanded / len(pairs), 1))
+
+        # 重复查询：结果取自路径缓存
+        hits = engine.route_cache.hits
+        begin = time.perf_counter()
+        for start, end in pairs:
+            try:
+                engine.shortest_path(start, end)
+            except nx.NetworkXNoPath:
+                pass
+        self.record(size, "shortest_path.cached", time.perf_counter() - begin, len(pairs),
+                    hits=engine.route_cache.hits - hits)
+
+    def _picking(self, size, engine, rng):
+        seconds, _ = _time(engine.nearest_node, 0.0, 0.0)
+        self.record(size, "pick.build_index", seconds)
+        points = [(rng.uniform(0, MAP_WIDTH), rng.uniform(0, MAP_HEIGHT)) for _ in range(self.picks)]
+        seconds, _ = _time(lambda: [engine.nearest_node(x, y, 15) for x, y in points])
+        self.record(size, "pick.node", seconds, len(points))
+        seconds, _ = _time(lambda: [engine.nearest_edge(x, y, 10) for x, y in points])
+        self.record(size, "pick.edge", seconds, len(points))
+
+    def _editing(self, size, engine, rng, names):
+        """撤回日志：每步编辑及其撤回的耗时（只记录操作本身，不复制地图）"""
+        journal = EditJournal(engine)
+        moved = rng.sample(names, min(self.edits, len(names)))
+
+        def edit(ops):
+            for label, op in ops:
+                journal.perform(label, op)
+
+        def undo(count):
+            for _ in range(count):
+                journal.undo()
+
+        for name, ops in [
+            ("move_node", [("移动", ("move_node", (n, 10.0, 10.0))) for n in moved]),
+            ("add_edge", [("新增路径", ("add_edge", (a, b, 1.0))) for a, b in zip(moved[::2], moved[1::2])]),
+            ("delete_node", [("删除", ("delete_node", (n,))) for n in moved]),
+        ]:
+            seconds, _ = _time(edit, ops)
+            self.record(size, f"edit.{name}", seconds, len(ops))
+            seconds, _ = _time(undo, len(ops))
+            self.record(size, f"undo.{name}", seconds, len(ops))
+
+    def _drawing(self, size, engine, rng, names):
+        dpi = 100
+        fig, ax = plt.subplots(figsize=(MAP_WIDTH / dpi, MAP_HEIGHT / dpi), dpi=dpi)
+        renderer = MapRenderer(ax, MAP_WIDTH, MAP_HEIGHT)
+
+        def full_draw():
+            # 与界面 draw_graph 相同：更新路网图元、高亮图层后整图绘制
+            renderer.set_graph(engine.G.nodes(data="pos"), engine.G.edges())
+            renderer.set_overlays([], None, [], [], engine.edge_weight)
+            renderer.refresh()
+
+        seconds, _ = _time(full_draw)
+        self.record(size, "draw.full", seconds)
+
+        start, end = rng.sample(names, 2)
+        try:
+            path, _ = engine.shortest_path(start, end)
+        except nx.NetworkXNoPath:
+            path = []
+
+        def overlay_draw():
+            # 选中节点、显示路径：只通过 blitting 重绘高亮图层
+            renderer.set_overlays([start, end], None, path, [], engine.edge_weight)
+            renderer.refresh()
+
+        seconds, _ = _time(overlay_draw)
+        self.record(size, "draw.overlay", seconds, path_nodes=len(path))
+        plt.close(fig)
+
+
+def environment():
+    """运行环境信息，随结果一起保存"""
+    try:
+        commit = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {"timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "commit": commit,
+            "python": platform.python_version(), "platform": platform.platform(), "cpus": os.cpu_count(),
+            "numpy": np.__version__, "scipy": scipy.__version__, "networkx": nx.__version__,
+            "matplotlib": matplotlib.__version__}
+
+
+def compare(results, baseline, threshold=REGRESSION_THRESHOLD):
+    """与基准结果逐项对比，返回耗时增加超过 threshold 的项目 [(规模, 项目, 基准 ms, 本次 ms)]"""
+    old = {(entry["size"], entry["name"]): entry["ms_per_op"] for entry in baseline["results"]}
+    regressions = []
+    for entry in results:
+        before = old.get((entry["size"], entry["name"]))
+        if before and entry["ms_per_op"] > before * (1 + threshold):
+            regressions.append((entry["size"], entry["name"], before, entry["ms_per_op"]))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校园导航规模基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="节点数（可多个）")
+    parser.add_argument("--data-dir", default="bench_data", help="合成路网的存放目录（已存在则复用）")
+    parser.add_argument("--out", default="bench.json", help="结果 JSON 文件")
+    parser.add_argument("--queries", type=int, default=50, help="每种搜索算法的查询次数")
+    parser.add_argument("--repeat", type=int, default=3, help="读取、建图等一次性操作取几次中的最短耗时")
+    parser.add_argument("--baseline", default=None, help="对比的基准结果 JSON 文件")
+    parser.add_argument("--threshold", type=float, default=REGRESSION_THRESHOLD, help="视为回退的耗时增加比例")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    # 服务器上通常没有中文字体，缺字警告逐个字形输出，既刷屏又拖慢绘制
+    warnings.filterwarnings("ignore", message="Glyph .* missing from font")
+    logging.getLogger("matplotlib.font_manager").setLevel(logging.ERROR)
+
+    run = BenchmarkRun(args.data_dir, queries=args.queries, repeat=args.repeat, seed=args.seed)
+    for size in args.sizes:
+        run.run_size(size)
+    report = {"environment": environment(), "results": run.results}
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    print(f"结果已写入 {args.out}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            regressions = compare(run.results, json.load(f), args.threshold)
+        for size, name, before, after in regressions:
+            print(f"性能回退: {size} 节点 {name} {before:.3f} -> {after:.3f} ms/次")
+        if not regressions:
+            print("与基准相比没有性能回退")
+
+
+if __name__ == "__main__":
+    main()
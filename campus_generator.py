@@ -0,0 +1,88 @@
+import argparse
+import os
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import coo_matrix
+from scipy.sparse.csgraph import minimum_spanning_tree
+from scipy.spatial import Delaunay
+
+
+# 合成校园路网：生成与 node.csv / edge.csv 格式相同的平面路网，用于规模测试（1 千 ~ 100 万节点）
+# 节点为带随机扰动的网格点（互不重合），取其 Delaunay 三角剖分（平面图）的最小生成树保证连通，
+# 再随机保留一部分其余的三角边，使平均度数约为 3；路径长度为像素距离乘以随机绕行系数（不小于 1）
+#
+# 用法：python campus_generator.py --nodes 100000 --out bench_data/campus_100000
+
+# 与主程序的地图尺寸一致（像素）
+MAP_WIDTH = 1609
+MAP_HEIGHT = 1287
+
+# 赋予类别的节点比例及可选类别（供最近设施查询使用）
+CATEGORY_RATIO = 0.02
+CATEGORIES = ["教学楼", "食堂", "校门", "体育", "景观", "住宿", "图书馆"]
+
+
+def generate(num_nodes, seed=0, width=MAP_WIDTH, height=MAP_HEIGHT, extra_edge_ratio=0.25):
+    """返回 (节点表, 路径表) 两个 DataFrame，列与 node.csv / edge.csv 相同
+
+    extra_edge_ratio 为最小生成树之外保留的三角边比例。
+    """
+    rng = np.random.default_rng(seed)
+    # 按地图长宽比排布网格，取前 num_nodes 个格点
+    cols = max(2, int(np.ceil(np.sqrt(num_nodes * width / height))))
+    rows = -(-num_nodes // cols)
+    step_x, step_y = width / cols, height / rows
+    row, col = np.divmod(np.arange(num_nodes), cols)
+    xs = (col + 0.5 + rng.uniform(-0.35, 0.35, num_nodes)) * step_x
+    ys = (row + 0.5 + rng.uniform(-0.35, 0.35, num_nodes)) * step_y
+    points = np.column_stack([xs, ys]).round(2)
+
+    # 三角剖分的全部边（去重）
+    simplices = Delaunay(points).simplices
+    pairs = np.concatenate([simplices[:, [0, 1]], simplices[:, [1, 2]], simplices[:, [0, 2]]])
+    pairs = np.unique(np.sort(pairs, axis=1), axis=0)
+    lengths = np.hypot(*(points[pairs[:, 0]] - points[pairs[:, 1]]).T)
+
+    # 最小生成树 + 随机保留的其余边
+    tree = minimum_spanning_tree(coo_matrix((lengths, (pairs[:, 0], pairs[:, 1])),
+                                            shape=(num_nodes, num_nodes))).tocoo()
+    in_tree = set(zip(np.minimum(tree.row, tree.col).tolist(), np.maximum(tree.row, tree.col).tolist()))
+    keep = np.array([(a, b) in in_tree for a, b in pairs.tolist()]) | (rng.random(len(pairs)) < extra_edge_ratio)
+    pairs, lengths = pairs[keep], lengths[keep]
+    lengths = np.maximum((lengths * rng.uniform(1.0, 1.3, len(lengths))).round(1), 0.1)
+
+    names = np.array([f"地点{i}" for i in range(num_nodes)], dtype=object)
+    categories = np.full(num_nodes, "", dtype=object)
+    chosen = rng.random(num_nodes) < CATEGORY_RATIO
+    categories[chosen] = rng.choice(CATEGORIES, int(chosen.sum()))
+    nodes = pd.DataFrame({"name": names, "x": points[:, 0], "y": points[:, 1],
+                          "introduction": [f"合成地点 {i}" for i in range(num_nodes)], "category": categories})
+    edges = pd.DataFrame({"x": names[pairs[:, 0]], "y": names[pairs[:, 1]], "length": lengths})
+    return nodes, edges
+
+
+def write_campus(out_dir, num_nodes, seed=0):
+    """生成路网并写入 out_dir/node.csv、out_dir/edge.csv，返回两个文件路径"""
+    os.makedirs(out_dir, exist_ok=True)
+    nodes, edges = generate(num_nodes, seed)
+    node_path = os.path.join(out_dir, "node.csv")
+    edge_path = os.path.join(out_dir, "edge.csv")
+    nodes.to_csv(node_path, index=False, encoding="utf-8-sig")
+    edges.to_csv(edge_path, index=False, encoding="utf-8-sig")
+    return node_path, edge_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成校园路网")
+    parser.add_argument("--nodes", type=int, default=10000, help="节点数")
+    parser.add_argument("--out", default="bench_data", help="输出目录")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    node_path, edge_path = write_campus(args.out, args.nodes, args.seed)
+    print(f"已生成 {node_path}、{edge_path}")
+
+
+if __name__ == "__main__":
+    main()
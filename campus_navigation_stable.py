@@ -1,17 +1,33 @@
 import networkx as nx
 import matplotlib.pyplot as plt
-import numpy as np
 import tkinter as tk
 from tkinter import ttk, simpledialog, messagebox, filedialog
 from matplotlib.backends.backend_tkagg import FigureCanvasTkAgg, NavigationToolbar2Tk
-from PIL import Image
-import matplotlib.image as mpimg
 import os
-import pandas as pd
+import sqlite3
+import time
+from datetime import date, datetime
+from history import EditJournal
+from map_store import MapStore
+from routing_engine import RoutingEngine, SEARCH_METHODS, format_length
+from map_renderer import MapRenderer
+from image_cache import load_resized_image
+from workers import TaskRunner
+from profiling import profiler
+from restrictions import CLOSED
 
 
 # 项目地址：https://github.com/lyukovsky/Campus-Navigation-System-for-JXNU
 
+# 楼层选择框中表示显示全部楼层的选项
+ALL_FLOORS = "全部楼层"
+# 性能调试面板的刷新间隔（毫秒）
+PROFILE_REFRESH_MS = 1000
+# 检查临时规则开始 / 结束时刻的间隔（毫秒）
+RESTRICTION_REFRESH_MS = 30000
+# 临时规则系数选择框中表示封闭的选项
+CLOSED_LABEL = "封闭"
+
 
 class CampusNavigation:
     def __init__(self):
@@ -28,6 +44,8 @@ class CampusNavigation:
         self.placing_new_node = False
         self.new_node_name = ""
         self.new_node_intro = ""
+        self.new_node_category = ""
+        self.new_node_floor = ""
 
         # 背景图片相关设置
         self.background_image = None
@@ -36,272 +54,379 @@ class CampusNavigation:
         self.target_width = 1609
         self.target_height = 1287
 
-        # ===== 新增：撤回/重做功能相关 =====
-        self.undo_stack = []  # 撤回栈：存储历史状态快照
-        self.redo_stack = []  # 重做栈：存储被撤回的状态快照
-
         # ===== 新增：导入功能相关 =====
         self.imported_node_path = ""  # 记录选中的node.csv路径
         self.imported_edge_path = ""  # 记录选中的edge.csv路径
 
-        # 尝试加载并处理背景图片
-        self._load_and_process_background()
-
-        # 创建主界面
-        self._create_main_interface()
+        # SQLite 地图数据库（可选）：文件存在时从中加载地图，每步编辑即时写入，无需手动保存；
+        # 由 CSV 创建：python map_store.py import node.csv edge.csv --db map.db
+        self.store_path = "map.db"
+        self.store = None
 
-        # 创建无向图
-        self.G = nx.Graph()
+        # 后台任务（路径计算、导入、保存、底图加载），结果经 root.after 回到界面线程
+        self.tasks = TaskRunner(self.root)
+        self.current_task = None
 
-        # 校园景点及其坐标
-        self.locations = {}
-        try:
-            df = pd.read_csv("node.csv")
-            for index, row in df.iterrows():
-                self.locations[row['name']] = (row['x'], row['y'])
-        except FileNotFoundError:
-            print(f"文件 {'node.csv'} 未找到。")
-
-        # 景点之间的路径及距离
-        self.paths = []  # 先初始化为空列表
+        # 尝试加载并处理背景图片（在后台进行，完成后再显示）
+        self._load_and_process_background()
 
-        try:
-            df = pd.read_csv("edge.csv")
-            for index, row in df.iterrows():
-                # 假设edge.csv有列：start, end, length 或类似的列名
-                # 根据实际情况调整列名
-                start_node = row['x']
-                end_node = row['y']
-                length = row['length']
-                self.paths.append((start_node, end_node, length))
-        except FileNotFoundError:
-            print(f"文件 {'edge.csv'} 未找到，使用默认路径数据。")
-            # 如果edge.csv不存在，使用默认路径数据（与原来硬编码的数据一致）
-            self.paths = [
-                ("青蓝门", "望城门", 300),
-                ("青蓝门", "洁琼楼", 250),
-                ("正大门", "正大坊", 100),
-                ("正大门", "校址纪念碑", 150),
-                ("望城门", "长胜门", 400),
-                ("望城门", "洁琼楼", 200),
-                ("长胜门", "惟义楼", 350),
-                ("惟义楼", "图书馆", 250),
-                ("惟义楼", "静湖", 200),
-                ("名达楼", "静湖", 250),
-                ("名达楼", "校址纪念碑", 150),
-                ("方荫楼", "校址纪念碑", 300),
-                ("方荫楼", "鹅湖湾", 250),
-                ("先骕楼", "图书馆", 250),
-                ("先骕楼", "方荫楼", 350),
-                ("先骕楼", "静湖", 300),
-                ("正大坊", "青蓝门", 450),
-                ("静湖", "校址纪念碑", 200),
-                ("鹅湖湾", "先骕楼", 400),
-                ("洁琼楼", "名达楼", 300),
-                # 推荐路线1新增节点间的路径（假设存在）
-                ("图书馆", "静湖", 200),
-                ("静湖", "校址纪念碑", 200),
-                ("校址纪念碑", "方荫楼", 300),
-                ("方荫楼", "音乐艺术广场", 150),
-                ("音乐艺术广场", "鹅湖湾", 200),
-                ("鹅湖湾", "白鹿会馆", 250),
-                ("白鹿会馆", "正大坊", 300),
-                # 推荐路线2新增节点间的路径（假设存在）
-                ("正大坊", "升旗台", 150),
-                ("升旗台", "校址纪念碑", 200),
-                ("校址纪念碑", "静湖", 250),
-                ("图书馆", "二食堂", 150),
-                ("二食堂", "风雨球场", 200),
-                ("风雨球场", "长胜门", 250)
-            ]
-        except Exception as e:
-            print(f"读取edge.csv文件时出错: {str(e)}，使用默认路径数据。")
-            # 如果读取出现其他错误，也使用默认路径数据
-            self.paths = [
-                ("青蓝门", "望城门", 300),
-                ("青蓝门", "洁琼楼", 250),
-                ("正大门", "正大坊", 100),
-                ("正大门", "校址纪念碑", 150),
-                ("望城门", "长胜门", 400),
-                ("望城门", "洁琼楼", 200),
-                ("长胜门", "惟义楼", 350),
-                ("惟义楼", "图书馆", 250),
-                ("惟义楼", "静湖", 200),
-                ("名达楼", "静湖", 250),
-                ("名达楼", "校址纪念碑", 150),
-                ("方荫楼", "校址纪念碑", 300),
-                ("方荫楼", "鹅湖湾", 250),
-                ("先骕楼", "图书馆", 250),
-                ("先骕楼", "方荫楼", 350),
-                ("先骕楼", "静湖", 300),
-                ("正大坊", "青蓝门", 450),
-                ("静湖", "校址纪念碑", 200),
-                ("鹅湖湾", "先骕楼", 400),
-                ("洁琼楼", "名达楼", 300),
-                # 推荐路线1新增节点间的路径（假设存在）
-                ("图书馆", "静湖", 200),
-                ("静湖", "校址纪念碑", 200),
-                ("校址纪念碑", "方荫楼", 300),
-                ("方荫楼", "音乐艺术广场", 150),
-                ("音乐艺术广场", "鹅湖湾", 200),
-                ("鹅湖湾", "白鹿会馆", 250),
-                ("白鹿会馆", "正大坊", 300),
-                # 推荐路线2新增节点间的路径（假设存在）
-                ("正大坊", "升旗台", 150),
-                ("升旗台", "校址纪念碑", 200),
-                ("校址纪念碑", "静湖", 250),
-                ("图书馆", "二食堂", 150),
-                ("二食堂", "风雨球场", 200),
-                ("风雨球场", "长胜门", 250)
-            ]
-
-        # 景点介绍
-        self.introductions = {}  # 先初始化为空字典
+        # 创建主界面
+        with profiler.span("startup.interface"):
+            self._create_main_interface()
 
-        try:
-            df = pd.read_csv("node.csv")
-            for index, row in df.iterrows():
-                name = row['name']
-                self.locations[name] = (row['x'], row['y'])  # 确保 location 也加载了
-                # 尝试从 'introduction' 列获取介绍，如果没有则尝试 'desc'
-                if 'introduction' in row:
-                    self.introductions[name] = row['introduction']
-                elif 'desc' in row:
-                    self.introductions[name] = row['desc']
-                else:
-                    # 如果 csv 里没有介绍列，给一个默认值，避免后续报错
-                    self.introductions[name] = "暂无介绍信息"
-        except FileNotFoundError:
-            print(f"警告：未找到 node.csv 文件，无法加载景点介绍。")
-            # 如果 node.csv 不存在，给所有已知景点一个默认介绍
-            for name in self.locations.keys():
-                self.introductions[name] = "暂无介绍信息（node.csv 未找到）"
-            # 为推荐路线中的新节点添加默认介绍
-            additional_nodes = ["音乐艺术广场", "白鹿会馆", "升旗台", "校址纪念碑", "二食堂", "风雨球场"]
-            for node in additional_nodes:
-                if node not in self.introductions:
-                    self.introductions[node] = "推荐路线景点，暂无详细介绍"
-
-        # 添加节点和边到图中
-        self._initialize_graph()
+        # 加载路网数据（节点、路径、介绍及图结构均由路网引擎维护）
+        with profiler.span("startup.load_network"):
+            self._load_network()
+        # 撤回/重做日志：每步只记录编辑本身及其逆向操作
+        self.history = EditJournal(self.engine)
+        if self.store is not None:
+            self.history.observers.append(self._record_edit)
 
         # 存储最短路径和选择的点
         self.shortest_path = []
         self.recommended_path = []  # 新增：存储推荐路线
+        self.facility_paths = []  # 最近设施查询结果（可能有多条）
+        self.alternative_paths = []  # 备选路线（不含最短的一条）
         self.start_node = None
         self.end_node = None
         self.selected_nodes = []
         self.selected_edge = None
 
-        # 首次启动时保存初始状态
-        self.save_state()
-
         # 创建Matplotlib图形
-        self.dpi = 100
-        self.fig, self.ax = plt.subplots(
-            figsize=(self.target_width / self.dpi, self.target_height / self.dpi),
-            dpi=self.dpi
-        )
-        self.canvas = FigureCanvasTkAgg(self.fig, master=self.display_frame)
-        self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
-
-        # 添加工具栏
-        self.toolbar = NavigationToolbar2Tk(self.canvas, self.display_frame)
-        self.toolbar.update()
+        with profiler.span("startup.figure"):
+            self.dpi = 100
+            self.fig, self.ax = plt.subplots(
+                figsize=(self.target_width / self.dpi, self.target_height / self.dpi),
+                dpi=self.dpi
+            )
+            self.canvas = FigureCanvasTkAgg(self.fig, master=self.display_frame)
+            self.canvas.get_tk_widget().pack(side=tk.TOP, fill=tk.BOTH, expand=1)
+            # 整图重绘在空闲时才真正执行（draw_idle），单独记录实际的绘制耗时
+            self.canvas.draw = profiler.traced("draw.canvas")(self.canvas.draw)
+
+            # 地图图元只创建一次，之后按需更新
+            self.renderer = MapRenderer(self.ax, self.target_width, self.target_height)
+            if self.use_background and self.background_image is not None:
+                self.renderer.set_background(self.background_image)
+            self.rendered_version = None  # 已绘制的路网版本
+            self.rendered_restrictions = None  # 已绘制的 (路网版本, 规则版本)
+
+            # 添加工具栏
+            self.toolbar = NavigationToolbar2Tk(self.canvas, self.display_frame)
+            self.toolbar.update()
 
         # 添加控制按钮
-        self._add_buttons()
+        with profiler.span("startup.controls"):
+            self._add_buttons()
 
         # 绘制初始图形
-        self.draw_graph()
+        with profiler.span("startup.first_draw"):
+            self.draw_graph()
+
+        # 临时规则到时自动生效 / 解除
+        self.root.after(RESTRICTION_REFRESH_MS, self._refresh_restrictions)
 
         # 连接点击事件
         self.canvas.mpl_connect('button_press_event', self.on_click)
+        self.root.protocol("WM_DELETE_WINDOW", self._on_close)
+
+    def _load_network(self):
+        """有地图数据库时从数据库加载，否则读取 CSV（经二进制快照加速）"""
+        if os.path.exists(self.store_path):
+            try:
+                self.store = MapStore(self.store_path)
+                if not self.store.is_empty():
+                    self.engine = RoutingEngine(None, use_distance_table=True, ch_path="map.ch.npz")
+                    self.engine.replace_data(*self.store.read())
+                    return
+            except sqlite3.Error as e:
+                messagebox.showerror("错误", f"读取地图数据库 {self.store_path} 失败: {str(e)}\n改为读取 CSV 文件")
+                self.store = None
+        self.engine = RoutingEngine("node.csv", "edge.csv", use_distance_table=True,
+                                    snapshot_path="map.snap", ch_path="map.ch.npz")
+        if self.store is not None:
+            # 空数据库：以 CSV 中的地图初始化
+            self.store.write_all(self.engine)
+
+    def _record_edit(self, ops):
+        """撤回日志的观察者：把本步编辑写入地图数据库；写入失败时停用数据库，改为手动保存 CSV"""
+        try:
+            self.store.record(self.engine, ops)
+        except sqlite3.Error as e:
+            print(f"写入地图数据库 {self.store_path} 失败: {str(e)}，已停用数据库，请使用“保存数据”保存为 CSV")
+            self.history.observers.remove(self._record_edit)
+            self.store = None
+
+    # ===== 后台任务 =====
+    def _engine_idle(self, quiet=False):
+        """路网数据正被后台任务使用时不允许其他操作"""
+        if self.tasks.busy:
+            if not quiet:
+                messagebox.showinfo("提示", f"正在{self.current_task.name}，请稍候或取消后再操作")
+            return False
+        return True
+
+    def _start_task(self, name, fn, *args, on_done=None, on_error=None, exclusive=True):
+        """提交后台任务并在任务栏显示进度；完成或失败后恢复任务栏"""
+        def finish(callback):
+            def handler(value):
+                if self.current_task is task:
+                    self._set_task_status(None)
+                if callback is not None:
+                    callback(value)
+            return handler
+
+        def traced(task, *args):
+            with profiler.span(f"task:{name}"):
+                return fn(task, *args)
+
+        task = self.tasks.submit(name, traced, *args, on_done=finish(on_done), on_error=finish(on_error),
+                                 on_progress=lambda fraction, message: self._set_task_status(task, fraction, message),
+                                 exclusive=exclusive)
+        self._set_task_status(task)
+        return task
+
+    def _set_task_status(self, task, fraction=None, message=""):
+        self.current_task = task
+        if not hasattr(self, "task_label"):
+            return  # 界面尚未创建
+        if task is None:
+            self.task_progress.stop()
+            self.task_progress.config(mode="determinate", value=0)
+            self.task_label.config(text="空闲")
+            self.cancel_button.config(state=tk.DISABLED)
+            return
+        self.task_label.config(text=f"{task.name}{'：' + message if message else '…'}")
+        self.cancel_button.config(state=tk.NORMAL)
+        if fraction is None:
+            if str(self.task_progress.cget("mode")) != "indeterminate":
+                self.task_progress.config(mode="indeterminate")
+                self.task_progress.start(15)
+        else:
+            self.task_progress.stop()
+            self.task_progress.config(mode="determinate", value=fraction * 100)
+
+    def cancel_task(self):
+        """取消当前任务：工作线程在下一个检查点退出"""
+        if self.current_task is not None:
+            self.current_task.cancel()
+            self.task_label.config(text=f"正在取消{self.current_task.name}…")
+            self.cancel_button.config(state=tk.DISABLED)
+
+            # 任务线程真正退出后再恢复任务栏
+            def wait_exit(task=self.current_task):
+                if task in self.tasks.tasks:
+                    self.root.after(50, wait_exit)
+                elif self.current_task is task:
+                    self._set_task_status(None)
+            wait_exit()
+
+    # ===== 性能调试 =====
+    def toggle_profiling(self):
+        profiler.enabled = self.profile_var.get()
+
+    def _refresh_profile(self):
+        """定时把耗时汇总与路径缓存统计刷新到调试面板（有新记录时才重建列表）"""
+        if hasattr(self, "engine"):
+            stats = self.engine.route_cache.stats()
+            self.cache_label.config(text=f"路径缓存: {stats['size']}/{stats['capacity']}  命中 {stats['hits']}  "
+                                         f"未命中 {stats['misses']}  淘汰 {stats['evictions']}")
+        if profiler.recorded != self.profile_shown:
+            self.profile_shown = profiler.recorded
+            self.profile_tree.delete(*self.profile_tree.get_children())
+            for name, count, _, mean, longest, _ in profiler.summary():
+                self.profile_tree.insert("", tk.END, text=name, values=(count, f"{mean:.1f}", f"{longest:.1f}"))
+        self.root.after(PROFILE_REFRESH_MS, self._refresh_profile)
+
+    def export_trace(self):
+        """导出 Chrome trace-event JSON，可在 chrome://tracing 或 Perfetto 中查看时间线"""
+        path = filedialog.asksaveasfilename(title="导出性能记录", initialfile="trace.json",
+                                            defaultextension=".json", filetypes=[("JSON文件", "*.json")])
+        if not path:
+            return
+        try:
+            count = profiler.export_chrome_trace(path)
+        except OSError as e:
+            messagebox.showerror("错误", f"导出失败：{str(e)}")
+            return
+        messagebox.showinfo("成功", f"已导出 {count} 条耗时记录到 {path}\n可在 chrome://tracing 或 Perfetto 中打开")
+
+    # ===== 临时封闭 =====
+    def _parse_time(self, text):
+        """时段输入转为时间戳：HH:MM 表示当天，也可为 YYYY-MM-DD HH:MM；留空返回 None"""
+        text = text.strip()
+        if not text:
+            return None
+        try:
+            return datetime.combine(date.today(), datetime.strptime(text, "%H:%M").time()).timestamp()
+        except ValueError:
+            pass
+        try:
+            return datetime.strptime(text, "%Y-%m-%d %H:%M").timestamp()
+        except ValueError:
+            raise ValueError(f"时间 {text} 的格式应为 HH:MM 或 YYYY-MM-DD HH:MM")
+
+    def add_restriction(self):
+        if not self._engine_idle():
+            return
+
+        if not self.selected_edge:
+            self.show_message("提示", "请先选择一条路径")
+            return
+
+        u, v = self.selected_edge
+        factor = self.restriction_factor_var.get().strip()
+        try:
+            try:
+                factor = CLOSED if factor == CLOSED_LABEL else float(factor)
+            except ValueError:
+                raise ValueError(f"系数应为“{CLOSED_LABEL}”或大于 0 的数字")
+            start = self._parse_time(self.restriction_start_var.get())
+            end = self._parse_time(self.restriction_end_var.get())
+            self.engine.add_restriction(u, v, factor, start, end)
+        except ValueError as e:
+            self.show_message("错误", str(e))
+            return
+
+        self._update_restriction_list()
+        self.draw_graph()
+
+    def remove_restriction(self):
+        if not self._engine_idle():
+            return
+        selection = self.restriction_listbox.curselection()
+        if not selection:
+            self.show_message("提示", "请先在列表中选择一条规则")
+            return
+        self.engine.remove_restriction(self.restriction_ids[selection[0]])
+        self._update_restriction_list()
+        self.draw_graph()
+
+    def clear_restrictions(self):
+        if not self._engine_idle():
+            return
+        self.engine.clear_restrictions()
+        self._update_restriction_list()
+        self.draw_graph()
+
+    def _update_restriction_list(self):
+        """规则列表：路径、系数与时段，生效中的规则以 ● 标出"""
+        now = time.time()
+
+        def moment(timestamp):
+            return "" if timestamp is None else time.strftime("%m-%d %H:%M", time.localtime(timestamp))
+
+        self.restriction_listbox.delete(0, tk.END)
+        self.restriction_ids = list(self.engine.restrictions.rules)
+        for rule in self.engine.restrictions.rules.values():
+            text = f"{'●' if rule.active(now) else '○'} {'-'.join(rule.edge)} "
+            text += CLOSED_LABEL if rule.closed else f"×{format_length(rule.factor)}"
+            if rule.start is not None or rule.end is not None:
+                text += f" {moment(rule.start)}~{moment(rule.end)}"
+            self.restriction_listbox.insert(tk.END, text)
+
+    def _refresh_restrictions(self):
+        """定时检查规则的开始与结束时刻，生效的规则变化时重绘（后台任务使用路网期间留到下一次检查）"""
+        if not self.tasks.busy and self.engine.refresh_restrictions():
+            self._update_restriction_list()
+            self.draw_graph()
+        self.root.after(RESTRICTION_REFRESH_MS, self._refresh_restrictions)
+
+    def _on_close(self):
+        self.tasks.shutdown()
+        if self.store is not None:
+            self.store.close()
+        self.root.destroy()
+
+    # ===== 路网数据（委托给路网引擎） =====
+    @property
+    def G(self):
+        return self.engine.G
+
+    @property
+    def locations(self):
+        return self.engine.locations
+
+    @property
+    def paths(self):
+        return self.engine.paths
+
+    @property
+    def introductions(self):
+        return self.engine.introductions
 
     # ===== 新增：撤回/重做核心方法 =====
-    def save_state(self):
-        """保存当前地图状态到撤回栈"""
-        state = {
-            "locations": self.locations.copy(),  # 节点坐标
-            "paths": self.paths.copy(),  # 路径信息
-            "introductions": self.introductions.copy(),  # 景点介绍
-            "G": nx.Graph(self.G)  # 图结构（深拷贝）
-        }
-        # 限制撤回栈最大长度（避免内存溢出）
-        if len(self.undo_stack) > 20:
-            self.undo_stack.pop(0)
-        self.undo_stack.append(state)
-        # 每次保存新状态，清空重做栈（重做仅针对最近撤回的操作）
-        self.redo_stack.clear()
-
-    def restore_state(self, state):
-        """从快照恢复地图状态"""
-        self.locations = state["locations"].copy()
-        self.paths = state["paths"].copy()
-        self.introductions = state["introductions"].copy()
-        self.G = nx.Graph(state["G"])  # 深拷贝恢复图
-        # 重置选中状态，重新绘制地图
+    def _after_history_change(self):
+        """撤回/重做后重置选中状态，重新绘制地图"""
         self.selected_nodes = []
         self.selected_edge = None
         self.shortest_path = []
         self.recommended_path = []
+        self.facility_paths = []
+        self.alternative_paths = []
         self.draw_graph()
 
     def undo(self):
         """撤回操作"""
-        if len(self.undo_stack) <= 1:  # 至少保留初始状态
+        if not self._engine_idle():
+            return
+        label = self.history.undo()
+        if label is None:
             messagebox.showinfo("提示", "已无可撤回的操作！")
             return
-        # 弹出最后一个状态（当前状态），存入重做栈
-        current_state = self.undo_stack.pop()
-        self.redo_stack.append(current_state)
-        # 恢复到上一个历史状态
-        last_state = self.undo_stack[-1]
-        self.restore_state(last_state)
-        messagebox.showinfo("提示", "已撤回上一步操作")
+        self._after_history_change()
+        messagebox.showinfo("提示", f"已撤回：{label}")
 
     def redo(self):
         """重做操作"""
-        if not self.redo_stack:
+        if not self._engine_idle():
+            return
+        label = self.history.redo()
+        if label is None:
             messagebox.showinfo("提示", "已无可重做的操作！")
             return
-        # 弹出重做栈最后一个状态，存入撤回栈
-        redo_state = self.redo_stack.pop()
-        self.undo_stack.append(redo_state)
-        # 恢复到重做状态
-        self.restore_state(redo_state)
-        messagebox.showinfo("提示", "已重做上一步操作")
+        self._after_history_change()
+        messagebox.showinfo("提示", f"已重做：{label}")
 
     # ===== 新增：保存/导入核心方法 =====
     def save_data(self):
-        """保存节点/路径到新CSV文件"""
-        try:
-            # 1. 保存节点文件 node_new.csv
-            node_data = []
-            for name, (x, y) in self.locations.items():
-                node_data.append({
-                    "name": name,
-                    "x": x,
-                    "y": y,
-                    "introduction": self.introductions.get(name, "暂无介绍")
-                })
-            node_df = pd.DataFrame(node_data)
-            node_df.to_csv("node_new.csv", index=False, encoding="utf-8-sig")
-
-            # 2. 保存路径文件 edge_new.csv
-            edge_data = []
-            for u, v, weight in self.paths:
-                edge_data.append({
-                    "x": u,  # 保持与原有edge.csv列名一致（start节点）
-                    "y": v,  # end节点
-                    "length": weight
-                })
-            edge_df = pd.DataFrame(edge_data)
-            edge_df.to_csv("edge_new.csv", index=False, encoding="utf-8-sig")
-
-            messagebox.showinfo("成功", "数据已保存！\n节点文件：node_new.csv\n路径文件：edge_new.csv")
-        except Exception as e:
-            messagebox.showerror("错误", f"保存失败：{str(e)}")
+        """保存数据：使用地图数据库时编辑已即时写入，否则导出为 CSV"""
+        if self.store is not None:
+            messagebox.showinfo("提示", f"所有修改已自动保存到 {self.store_path}\n如需 CSV 文件请使用“导出CSV”")
+            return
+        self.export_data()
+
+    def export_data(self):
+        """保存节点/路径到新CSV文件（后台执行）"""
+        if not self._engine_idle():
+            return
+
+        def work(task):
+            task.report(0.0, "写入 CSV")
+            with profiler.span("save.csv"):
+                self.engine.save_csv("node_new.csv", "edge_new.csv")
+            task.report(0.7, "写入快照")
+            with profiler.span("save.snapshot"):
+                self.engine.save_snapshot("map_new.snap")
+
+        self._start_task("保存数据", work,
+                         on_done=lambda _: messagebox.showinfo(
+                             "成功", "数据已保存！\n节点文件：node_new.csv\n路径文件：edge_new.csv\n快照文件：map_new.snap"),
+                         on_error=lambda e: messagebox.showerror("错误", f"保存失败：{str(e)}"))
+
+    def build_contraction(self):
+        """预处理收缩层次（后台执行），供“收缩层次 (CH)”搜索方式使用"""
+        if not self._engine_idle():
+            return
+
+        def work(task):
+            task.report(0.0, "收缩节点")
+            return self.engine.build_contraction(task)
+
+        self._start_task("构建收缩层次", work,
+                         on_done=lambda ch: messagebox.showinfo(
+                             "成功", f"收缩层次已构建并保存到 {self.engine.ch_path}\n捷径数：{ch.num_shortcuts}"),
+                         on_error=lambda e: messagebox.showerror("错误", f"构建失败：{str(e)}"))
 
     def select_node_file(self):
         """选择节点CSV文件"""
@@ -327,61 +452,33 @@ class CampusNavigation:
             messagebox.showwarning("提示", "请先选择节点文件和路径文件！")
             return
 
-        try:
-            # 1. 读取导入的节点数据
-            import_node_df = pd.read_csv(self.imported_node_path, encoding="utf-8-sig")
-            new_locations = {}
-            new_introductions = {}
-            for _, row in import_node_df.iterrows():
-                name = row["name"]
-                x = row["x"]
-                y = row["y"]
-                intro = row.get("introduction", row.get("desc", "暂无介绍"))
-                new_locations[name] = (x, y)
-                new_introductions[name] = intro
-
-            # 2. 读取导入的路径数据
-            import_edge_df = pd.read_csv(self.imported_edge_path, encoding="utf-8-sig")
-            new_paths = []
-            for _, row in import_edge_df.iterrows():
-                u = row["x"]  # 保持与原有列名一致
-                v = row["y"]
-                length = row["length"]
-                new_paths.append((u, v, length))
-
-            # 3. 处理导入逻辑（覆盖/合并）
-            if is_override:
-                # 覆盖模式：清空原有数据
-                self.locations = new_locations
-                self.introductions = new_introductions
-                self.paths = new_paths
-            else:
-                # 合并模式：保留原有数据，新增导入数据（去重）
-                # 合并节点（新节点覆盖同名旧节点）
-                self.locations.update(new_locations)
-                self.introductions.update(new_introductions)
-                # 合并路径（避免重复边）
-                existing_edges = set()
-                for u, v, _ in self.paths:
-                    # 无向边，统一存储为 (小, 大) 避免重复
-                    key = (u, v) if u < v else (v, u)
-                    existing_edges.add(key)
-                # 添加新路径（去重）
-                for u, v, length in new_paths:
-                    key = (u, v) if u < v else (v, u)
-                    if key not in existing_edges:
-                        self.paths.append((u, v, length))
-                        existing_edges.add(key)
-
-            # 4. 重新初始化图并刷新
-            self.G.clear()
-            self._initialize_graph()
+        if not self._engine_idle():
+            return
+
+        def work(task, node_path, edge_path):
+            task.report(0.0, "读取文件")
+            with profiler.span("import.read"):
+                locations, introductions, paths, categories, floors = self.engine.read_import(node_path, edge_path)
+            # 读取阶段可以取消；开始修改路网后不再中断
+            task.check()
+            task.report(0.4, "合并数据")
+            with profiler.span("import.merge", nodes=len(locations), edges=len(paths)):
+                self.history.perform("导入数据", ("replace_data" if is_override else "merge_data",
+                                                 (locations, introductions, paths, categories, floors)))
+            # 预先构建绘图用的图与查询用的 CSR，避免回到界面线程后再卡顿
+            task.report(0.6, "构建路网")
+            with profiler.span("import.build"):
+                self.engine.G
+                self.engine.csr()
+            return len(locations), len(paths)
+
+        def done(counts):
+            # 刷新显示
             self.reset()
-            self.save_state()  # 导入后保存状态（支持撤回）
-            messagebox.showinfo("成功", f"导入完成！\n新增节点：{len(new_locations)}个\n新增路径：{len(new_paths)}条")
+            messagebox.showinfo("成功", f"导入完成！\n新增节点：{counts[0]}个\n新增路径：{counts[1]}条")
 
-        except Exception as e:
-            messagebox.showerror("错误", f"导入失败：{str(e)}")
+        self._start_task("导入数据", work, self.imported_node_path, self.imported_edge_path, on_done=done,
+                         on_error=lambda e: messagebox.showerror("错误", f"导入失败：{str(e)}"))
 
     def open_import_window(self):
         """打开导入窗口"""
@@ -434,24 +531,32 @@ class CampusNavigation:
         ttk.Button(import_win, text="取消", command=import_win.destroy).pack(side=tk.RIGHT, padx=10, pady=10)
 
     def _load_and_process_background(self):
-        """加载并处理背景图片"""
-        try:
-            if not os.path.exists(self.background_path):
-                messagebox.showerror("错误",
-                                     f"未找到背景图片: {self.background_path}\n请确保图片在程序目录下的campus文件夹中")
-                self.use_background = False
-                return
+        """在后台加载并处理背景图片，完成后设置为底图"""
+        if not os.path.exists(self.background_path):
+            messagebox.showerror("错误",
+                                 f"未找到背景图片: {self.background_path}\n请确保图片在程序目录下的campus文件夹中")
+            self.use_background = False
+            return
 
-            with Image.open(self.background_path) as img:
-                resized_img = img.resize((self.target_width, self.target_height), Image.LANCZOS)
-                self.background_image = np.array(resized_img)
+        def work(task, path, width, height):
+            # 缩放结果缓存在磁盘上，只有图片或目标尺寸变化时才重新缩放
+            return load_resized_image(path, width, height)
 
+        def done(image):
+            self.background_image = image
+            if self.use_background:
+                self.renderer.set_background(image)
+                self.renderer.refresh()
             messagebox.showinfo("成功", f"背景图片加载成功，已调整为{self.target_width}x{self.target_height}像素")
 
-        except Exception as e:
+        def failed(e):
             messagebox.showerror("错误", f"加载背景图片失败: {str(e)}")
             self.use_background = False
 
+        # 不涉及路网数据，加载期间界面可照常操作
+        self._start_task("加载底图", work, self.background_path, self.target_width, self.target_height,
+                         on_done=done, on_error=failed, exclusive=False)
+
     def _create_main_interface(self):
         """创建主界面布局"""
         self.paned_window = ttk.PanedWindow(self.root, orient=tk.HORIZONTAL)
@@ -463,35 +568,40 @@ class CampusNavigation:
         self.display_frame = ttk.LabelFrame(self.paned_window, text="校园地图")
         self.paned_window.add(self.display_frame, weight=3)
 
-    def _initialize_graph(self):
-        """初始化图形数据"""
-        for node, pos in self.locations.items():
-            self.G.add_node(node, pos=pos)
-
-        # 为推荐路线中的新节点添加默认位置（如果不存在）
-        default_positions = {
-            "音乐艺术广场": (800, 500),
-            "白鹿会馆": (900, 600),
-            "升旗台": (400, 300),
-            "校址纪念碑": (500, 400),
-            "二食堂": (700, 600),
-            "风雨球场": (800, 700)
-        }
-        for node, pos in default_positions.items():
-            if node not in self.locations:
-                self.locations[node] = pos
-                self.G.add_node(node, pos=pos)
-
-        for u, v, weight in self.paths:
-            self.G.add_edge(u, v, weight=weight)
-
     def _add_buttons(self):
         """添加功能按钮"""
         # 导航功能区
         nav_frame = ttk.LabelFrame(self.control_frame, text="导航功能")
         nav_frame.pack(fill=tk.X, padx=5, pady=5)
 
+        # 显示楼层：多楼层地图只显示室外与所选楼层
+        floor_frame = ttk.Frame(nav_frame)
+        floor_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(floor_frame, text="显示楼层:").pack(side=tk.LEFT)
+        self.floor_var = tk.StringVar(value=ALL_FLOORS)
+        floor_box = ttk.Combobox(floor_frame, textvariable=self.floor_var, state="readonly", width=14)
+        floor_box.configure(postcommand=lambda: floor_box.configure(values=[ALL_FLOORS] + self.engine.floor_levels()))
+        floor_box.bind("<<ComboboxSelected>>", self.show_floor)
+        floor_box.pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # 搜索算法选择
+        method_frame = ttk.Frame(nav_frame)
+        method_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(method_frame, text="搜索算法:").pack(side=tk.LEFT)
+        self.method_var = tk.StringVar(value=SEARCH_METHODS["dijkstra"])
+        ttk.Combobox(method_frame, textvariable=self.method_var, values=list(SEARCH_METHODS.values()),
+                     state="readonly", width=14).pack(side=tk.RIGHT, fill=tk.X, expand=True)
+
+        # 路线数量：大于 1 时同时给出备选路线
+        count_frame = ttk.Frame(nav_frame)
+        count_frame.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(count_frame, text="路线数量:").pack(side=tk.LEFT)
+        self.route_count_var = tk.IntVar(value=1)
+        ttk.Spinbox(count_frame, from_=1, to=8, textvariable=self.route_count_var, width=3,
+                    state="readonly").pack(side=tk.RIGHT)
+
         ttk.Button(nav_frame, text="计算最短路径", command=self.calculate_shortest_path).pack(fill=tk.X, padx=5, pady=2)
+        ttk.Button(nav_frame, text="构建收缩层次", command=self.build_contraction).pack(fill=tk.X, padx=5, pady=2)
         ttk.Button(nav_frame, text="重置选择", command=self.reset).pack(fill=tk.X, padx=5, pady=2)
 
         # ===== 新增：撤回/重做按钮 =====
@@ -505,6 +615,8 @@ class CampusNavigation:
         save_import_frame.pack(fill=tk.X, padx=5, pady=2)
         ttk.Button(save_import_frame, text="保存数据", command=self.save_data).pack(side=tk.LEFT, fill=tk.X,
                                                                                     expand=True, padx=2)
+        ttk.Button(save_import_frame, text="导出CSV", command=self.export_data).pack(side=tk.LEFT, fill=tk.X,
+                                                                                   expand=True, padx=2)
         ttk.Button(save_import_frame, text="导入数据", command=self.open_import_window).pack(side=tk.RIGHT, fill=tk.X,
                                                                                              expand=True, padx=2)
 
@@ -524,6 +636,38 @@ class CampusNavigation:
         ttk.Button(edge_frame, text="修改路径信息", command=self.edit_edge).pack(fill=tk.X, padx=5, pady=2)
         ttk.Button(edge_frame, text="删除路径", command=self.delete_edge).pack(fill=tk.X, padx=5, pady=2)
 
+        # 临时封闭区：活动、施工期间封闭选中的路径或在某个时段内减速（长度乘以系数），不修改路网数据
+        restriction_frame = ttk.LabelFrame(self.control_frame, text="临时封闭")
+        restriction_frame.pack(fill=tk.X, padx=5, pady=5)
+        factor_row = ttk.Frame(restriction_frame)
+        factor_row.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(factor_row, text="系数:").pack(side=tk.LEFT)
+        self.restriction_factor_var = tk.StringVar(value=CLOSED_LABEL)
+        ttk.Combobox(factor_row, textvariable=self.restriction_factor_var, values=[CLOSED_LABEL, "1.5", "2", "3"],
+                     width=6).pack(side=tk.LEFT, fill=tk.X, expand=True)
+        # 时段：HH:MM（当天）或 YYYY-MM-DD HH:MM，留空表示不限
+        time_row = ttk.Frame(restriction_frame)
+        time_row.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(time_row, text="时段:").pack(side=tk.LEFT)
+        self.restriction_start_var = tk.StringVar()
+        ttk.Entry(time_row, textvariable=self.restriction_start_var, width=8).pack(side=tk.LEFT, fill=tk.X,
+                                                                                  expand=True)
+        ttk.Label(time_row, text="至").pack(side=tk.LEFT, padx=2)
+        self.restriction_end_var = tk.StringVar()
+        ttk.Entry(time_row, textvariable=self.restriction_end_var, width=8).pack(side=tk.LEFT, fill=tk.X,
+                                                                                expand=True)
+        ttk.Button(restriction_frame, text="限制选中路径", command=self.add_restriction).pack(fill=tk.X, padx=5,
+                                                                                         pady=2)
+        self.restriction_listbox = tk.Listbox(restriction_frame, height=3)
+        self.restriction_listbox.pack(fill=tk.X, padx=5, pady=2)
+        self.restriction_ids = []  # 列表各行对应的规则 ID
+        restriction_buttons = ttk.Frame(restriction_frame)
+        restriction_buttons.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Button(restriction_buttons, text="移除", command=self.remove_restriction).pack(side=tk.LEFT, fill=tk.X,
+                                                                                        expand=True, padx=2)
+        ttk.Button(restriction_buttons, text="全部解除", command=self.clear_restrictions).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+
         # 推荐路线区 - 新增
         self.recommend_frame = ttk.LabelFrame(self.control_frame, text="推荐路线")
         self.recommend_frame.pack(fill=tk.X, padx=5, pady=5)
@@ -549,6 +693,79 @@ class CampusNavigation:
                                                                                                               padx=5,
                                                                                                               pady=2)
 
+        # 游览路线规划区：依次添加想去的景点，由系统求最短的访问顺序
+        tour_frame = ttk.LabelFrame(self.control_frame, text="游览路线规划")
+        tour_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.tour_listbox = tk.Listbox(tour_frame, height=4)
+        self.tour_listbox.pack(fill=tk.X, padx=5, pady=2)
+        tour_buttons = ttk.Frame(tour_frame)
+        tour_buttons.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Button(tour_buttons, text="添加选中", command=self.add_tour_stops).pack(side=tk.LEFT, fill=tk.X,
+                                                                                  expand=True, padx=2)
+        ttk.Button(tour_buttons, text="移除", command=self.remove_tour_stop).pack(side=tk.LEFT, fill=tk.X,
+                                                                               expand=True, padx=2)
+        ttk.Button(tour_buttons, text="清空", command=lambda: self.tour_listbox.delete(0, tk.END)).pack(
+            side=tk.LEFT, fill=tk.X, expand=True, padx=2)
+        self.tour_round_trip_var = tk.BooleanVar(value=False)
+        ttk.Checkbutton(tour_frame, text="返回起点", variable=self.tour_round_trip_var).pack(anchor=tk.W, padx=5)
+        ttk.Button(tour_frame, text="规划游览路线", command=self.plan_tour).pack(fill=tk.X, padx=5, pady=2)
+
+        # 最近设施查询区
+        facility_frame = ttk.LabelFrame(self.control_frame, text="最近设施")
+        facility_frame.pack(fill=tk.X, padx=5, pady=5)
+        facility_row = ttk.Frame(facility_frame)
+        facility_row.pack(fill=tk.X, padx=5, pady=2)
+        ttk.Label(facility_row, text="类别:").pack(side=tk.LEFT)
+        self.facility_var = tk.StringVar(value="食堂")
+        facility_box = ttk.Combobox(facility_row, textvariable=self.facility_var, state="readonly", width=8)
+        # 类别随编辑变化，展开下拉框时再读取
+        facility_box.configure(postcommand=lambda: facility_box.configure(values=self.engine.category_names()))
+        facility_box.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        ttk.Label(facility_row, text="数量:").pack(side=tk.LEFT, padx=(5, 0))
+        self.facility_count_var = tk.IntVar(value=1)
+        ttk.Spinbox(facility_row, from_=1, to=10, textvariable=self.facility_count_var, width=3,
+                    state="readonly").pack(side=tk.LEFT)
+        ttk.Button(facility_frame, text="查找最近设施", command=self.find_nearest_facility).pack(fill=tk.X, padx=5,
+                                                                                              pady=2)
+
+        # 后台任务栏：进度与取消
+        task_frame = ttk.LabelFrame(self.control_frame, text="后台任务")
+        task_frame.pack(fill=tk.X, padx=5, pady=5)
+        self.task_label = ttk.Label(task_frame, text="空闲")
+        self.task_label.pack(fill=tk.X, padx=5, pady=2)
+        task_row = ttk.Frame(task_frame)
+        task_row.pack(fill=tk.X, padx=5, pady=2)
+        self.task_progress = ttk.Progressbar(task_row, mode="determinate", maximum=100)
+        self.task_progress.pack(side=tk.LEFT, fill=tk.X, expand=True)
+        self.cancel_button = ttk.Button(task_row, text="取消", command=self.cancel_task, state=tk.DISABLED)
+        self.cancel_button.pack(side=tk.RIGHT, padx=2)
+        # 按钮创建前已提交的任务（如底图加载）
+        self._set_task_status(self.current_task)
+
+        # 性能调试区：各操作的耗时汇总，可导出为 Chrome trace
+        debug_frame = ttk.LabelFrame(self.control_frame, text="性能调试")
+        debug_frame.pack(fill=tk.X, padx=5, pady=5)
+        debug_row = ttk.Frame(debug_frame)
+        debug_row.pack(fill=tk.X, padx=5, pady=2)
+        self.profile_var = tk.BooleanVar(value=profiler.enabled)
+        ttk.Checkbutton(debug_row, text="记录耗时", variable=self.profile_var,
+                        command=self.toggle_profiling).pack(side=tk.LEFT)
+        ttk.Button(debug_row, text="导出", width=5, command=self.export_trace).pack(side=tk.RIGHT, padx=2)
+        ttk.Button(debug_row, text="清空", width=5, command=profiler.clear).pack(side=tk.RIGHT, padx=2)
+        self.profile_tree = ttk.Treeview(debug_frame, columns=("count", "mean", "max"), height=5)
+        self.profile_tree.heading("#0", text="操作")
+        self.profile_tree.heading("count", text="次数")
+        self.profile_tree.heading("mean", text="平均ms")
+        self.profile_tree.heading("max", text="最大ms")
+        self.profile_tree.column("#0", width=120)
+        for column in ("count", "mean", "max"):
+            self.profile_tree.column(column, width=50, anchor=tk.E)
+        self.profile_tree.pack(fill=tk.X, padx=5, pady=2)
+        self.cache_label = ttk.Label(debug_frame, text="")
+        self.cache_label.pack(fill=tk.X, padx=5, pady=2)
+        self.profile_shown = None  # 面板上已显示的记录数
+        self._refresh_profile()
+
         # 信息显示区
         info_frame = ttk.LabelFrame(self.control_frame, text="信息")
         info_frame.pack(fill=tk.BOTH, expand=True, padx=5, pady=5)
@@ -559,114 +776,41 @@ class CampusNavigation:
                               "操作说明:\n- 单击节点选择起点(浅绿色)和终点(浅橙色)\n- 双击节点查看介绍\n- 选择两个节点可创建路径\n- 新增景点后在地图上点击放置位置\n- 项目地址：https://github.com/lyukovsky/Campus-Navigation-System-for-JXNU")
         self.info_text.config(state=tk.DISABLED)
 
+    @profiler.traced("draw_graph")
     def draw_graph(self):
-        self.ax.clear()
-
-        # 绘制背景图片（如有）
-        if self.use_background and self.background_image is not None:
-            self.ax.imshow(
-                self.background_image,
-                extent=[0, self.target_width, self.target_height, 0],
-                aspect='auto',
-                alpha=0.9
-            )
-
-        pos = nx.get_node_attributes(self.G, 'pos')
-
-        # 绘制所有边（灰色）
-        nx.draw_networkx_edges(self.G, pos, ax=self.ax, edge_color='#666666', width=1.5, alpha=0.6)
-
-        # 高亮选中的边
-        if self.selected_edge:
-            nx.draw_networkx_edges(self.G, pos, edgelist=[self.selected_edge], ax=self.ax,
-                                   edge_color='#9370DB', width=3, alpha=0.8)
-
-        # 高亮最短路径的边（橙色）
-        if self.shortest_path:
-            path_edges = list(zip(self.shortest_path[:-1], self.shortest_path[1:]))
-            nx.draw_networkx_edges(self.G, pos, edgelist=path_edges, ax=self.ax,
-                                   edge_color='#FF4500', width=2.5, alpha=0.9)
-
-        # 高亮推荐路线的边（紫色）
-        if self.recommended_path:
-            path_edges = list(zip(self.recommended_path[:-1], self.recommended_path[1:]))
-            nx.draw_networkx_edges(self.G, pos, edgelist=path_edges, ax=self.ax,
-                                   edge_color='#FF4500', width=3, alpha=0.9)
-
-        # 绘制普通节点（浅色）
-        all_nodes = set(self.locations.keys())
-        unselected_nodes = all_nodes - set(self.selected_nodes)
-
-        nx.draw_networkx_nodes(self.G, pos, nodelist=list(unselected_nodes),
-                               ax=self.ax, node_size=300, node_color='#E0F7FA',
-                               edgecolors='#26A69A', linewidths=1, alpha=0.6)
-
-        # 起点（浅绿色）、终点（浅橙色）节点
-        if self.selected_nodes:
-            nx.draw_networkx_nodes(self.G, pos, nodelist=[self.selected_nodes[0]],
-                                   ax=self.ax, node_size=400, node_color='#E8F5E9',
-                                   edgecolors='#43A047', linewidths=1.2, alpha=0.7)
-            if len(self.selected_nodes) > 1:
-                nx.draw_networkx_nodes(self.G, pos, nodelist=[self.selected_nodes[1]],
-                                       ax=self.ax, node_size=400, node_color='#FFF3E0',
-                                       edgecolors='#FB8C00', linewidths=1.2, alpha=0.7)
-
-        # 绘制节点标签
-        nx.draw_networkx_labels(self.G, pos, ax=self.ax, font_size=9,
-                                font_family="SimHei", font_weight='bold',
-                                bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=1.5))
-
-        # 显示最短路径权重
-        if self.shortest_path:
-            path_edges = list(zip(self.shortest_path[:-1], self.shortest_path[1:]))
-            path_edge_labels = {}
-            for u, v in path_edges:
-                weight = self.G.edges[u, v].get('weight', 'N/A')
-                path_edge_labels[(u, v)] = f"{weight}m"
-
-            if path_edge_labels:
-                nx.draw_networkx_edge_labels(
-                    self.G, pos, edge_labels=path_edge_labels,
-                    ax=self.ax, font_size=8, font_family="SimHei",
-                    bbox=dict(facecolor='white', edgecolor='none', alpha=0.8, pad=1)
-                )
-
-        # 显示推荐路线权重
-        if self.recommended_path:
-            path_edges = list(zip(self.recommended_path[:-1], self.recommended_path[1:]))
-            path_edge_labels = {}
-            for u, v in path_edges:
-                weight = self.G.edges[u, v].get('weight', 'N/A')
-                path_edge_labels[(u, v)] = f"{weight}m"
-
-            if path_edge_labels:
-                nx.draw_networkx_edge_labels(
-                    self.G, pos, edge_labels=path_edge_labels,
-                    ax=self.ax, font_size=8, font_family="SimHei",
-                    bbox=dict(facecolor='white', edgecolor='none', alpha=0.8, pad=1)
-                )
-
-        # 设置坐标轴等
-        self.ax.set_xlim(0, self.target_width)
-        self.ax.set_ylim(self.target_height, 0)
-        self.ax.set_title("校园导航系统" if not self.placing_new_node else f"请在地图上点击放置: {self.new_node_name}",
-                          fontsize=14, fontweight='bold', pad=10)
-        self.ax.spines['top'].set_visible(False)
-        self.ax.spines['right'].set_visible(False)
-        self.ax.tick_params(axis='both', which='major', labelsize=9)
-
-        self.canvas.draw()
+        # 路网结构或坐标变化时才更新路网、节点与标签
+        if self.rendered_version != self.engine.version:
+            with profiler.span("draw.set_graph", nodes=len(self.locations)):
+                self.renderer.set_graph(nx.get_node_attributes(self.G, 'pos'), self.G.edges(),
+                                        {name: self.engine.floor_level(name) for name in self.engine.floors})
+            self.rendered_version = self.engine.version
+        # 临时封闭与减速的路径：规则生效或失效、路网变化时更新
+        if self.rendered_restrictions != (self.engine.version, self.engine.restriction_version):
+            self.renderer.set_restrictions(*self.engine.restricted_edges())
+            self.rendered_restrictions = (self.engine.version, self.engine.restriction_version)
+
+        # 高亮图层：选中节点/边、最短路径、推荐路线及其权重（不触发整图重绘）
+        with profiler.span("draw.overlays"):
+            self.renderer.set_overlays(self.selected_nodes, self.selected_edge, self.shortest_path,
+                                       self.recommended_path,
+                                       lambda u, v: format_length(self.engine.effective_weight(u, v)),
+                                       self.facility_paths, self.alternative_paths)
+            self.renderer.set_title("校园导航系统" if not self.placing_new_node
+                                    else f"请在地图上点击放置: {self.new_node_name}")
+
+        # 只有静态图层变化时才整图重绘，否则通过 blitting 叠加高亮图层
+        with profiler.span("draw.refresh"):
+            self.renderer.refresh()
 
     def _place_new_node(self, x, y):
         """在指定像素坐标放置新景点"""
-        self.locations[self.new_node_name] = (x, y)
-        self.introductions[self.new_node_name] = self.new_node_intro
-        self.G.add_node(self.new_node_name, pos=(x, y))
+        self.history.perform(f"新增景点 {self.new_node_name}",
+                             ("add_node", (self.new_node_name, x, y, self.new_node_intro, self.new_node_category,
+                                           self.new_node_floor)))
 
         self.placing_new_node = False
         self.selected_nodes = [self.new_node_name]
         self.draw_graph()
-        self.save_state()  # 新增：保存状态
         messagebox.showinfo("成功", f"已新增景点: {self.new_node_name} (坐标: {int(x)}, {int(y)})")
 
     def calculate_shortest_path(self):
@@ -681,54 +825,158 @@ class CampusNavigation:
             self.show_message("提示", "起点和终点不能相同!")
             return
 
-        try:
-            self.shortest_path = nx.dijkstra_path(self.G, self.start_node, self.end_node, weight='weight')
-            path_length = nx.dijkstra_path_length(self.G, self.start_node, self.end_node, weight='weight')
+        if not self._engine_idle():
+            return
+
+        method = next(key for key, label in SEARCH_METHODS.items() if label == self.method_var.get())
+        count = self.route_count_var.get()
+
+        def work(task, start, end):
+            with profiler.span("route.search", method=method, count=count):
+                if count > 1:
+                    routes = self.engine.k_shortest_paths(start, end, count)
+                else:
+                    routes = [self.engine.shortest_path(start, end, method)]
+            task.check()  # 计算期间已取消则丢弃结果
+            return start, end, routes, self.engine.last_expanded, count == 1 and self.engine.last_cached
+
+        def done(result):
+            start, end, routes, expanded, cached = result
+            self.shortest_path, path_length = routes[0]
+            self.alternative_paths = [path for path, _ in routes[1:]]
             self.recommended_path = []  # 清除推荐路线
+            self.facility_paths = []
             self.draw_graph()
             path_str = " -> ".join(self.shortest_path)
-            self.show_message("最短路径结果",
-                              f"从 {self.start_node} 到 {self.end_node}\n路径: {path_str}\n总距离: {path_length}米")
-        except nx.NetworkXNoPath:
-            self.show_message("提示", f"从 {self.start_node} 到 {self.end_node} 没有可用路径!")
+            message = f"从 {start} 到 {end}\n路径: {path_str}\n总距离: {format_length(path_length)}米"
+            for i, (path, length) in enumerate(routes[1:], 2):
+                message += f"\n备选路线{i}: {' -> '.join(path)}\n总距离: {format_length(length)}米"
+            self.show_message("最短路径结果", message + ("\n（缓存结果）" if cached else f"\n扩展节点数: {expanded}"))
+
+        def failed(e):
+            if isinstance(e, nx.NetworkXNoPath):
+                self.show_message("提示", f"从 {self.start_node} 到 {self.end_node} 没有可用路径!")
+            else:
+                self.show_message("错误", f"路径计算失败: {str(e)}")
+
+        self._start_task("计算最短路径", work, self.start_node, self.end_node, on_done=done, on_error=failed)
 
     # 新增：显示推荐路线
     def show_recommended_route(self, route_num):
-        # 定义推荐路线
-        if route_num == 1:
-            route = ["青蓝门", "实验大楼", "名达楼", "惟义楼", "图书馆", "静湖", "校址纪念碑",
-                     "方荫楼", "音乐艺术广场", "鹅湖湾", "白鹿会馆", "正大坊", "青蓝门"]
-            route_name = "推荐路线1"
-        else:
-            route = ["正大门", "正大坊", "升旗台", "校址纪念碑", "静湖",
-                     "图书馆", "二食堂", "风雨球场", "长胜门"]
-            route_name = "推荐路线2"
-
-        # 计算路线总长度
-        total_length = 0
-        valid_route = True
-        for i in range(len(route) - 1):
-            u = route[i]
-            v = route[i + 1]
-            if not self.G.has_edge(u, v):
-                valid_route = False
-                messagebox.showerror("错误", f"路线中不存在 {u} 到 {v} 的路径")
-                break
-            total_length += self.G.edges[u, v]['weight']
-
-        if valid_route:
-            self.recommended_path = route
-            self.shortest_path = []  # 清除最短路径
-            self.selected_nodes = []  # 清除选中节点
+        if not self._engine_idle():
+            return
+
+        # 推荐路线定义在路网引擎中，与路由服务共用；途经景点的顺序由路线规划求出
+        try:
+            route_name, route, total_length = self.engine.recommended_route(route_num)
+        except (nx.NodeNotFound, nx.NetworkXNoPath) as e:
+            messagebox.showerror("错误", str(e))
+            return
+
+        self.recommended_path = route
+        self.shortest_path = []  # 清除最短路径
+        self.facility_paths = []
+        self.alternative_paths = []
+        self.selected_nodes = []  # 清除选中节点
+        self.draw_graph()
+        path_str = " -> ".join(route)
+        self.show_message(route_name, f"推荐路线:\n{path_str}\n总距离: {format_length(total_length)}米")
+
+    def add_tour_stops(self):
+        """把选中的景点加入游览列表（第一个景点为起点）"""
+        if not self.selected_nodes:
+            self.show_message("提示", "请先在地图上选择景点!")
+            return
+        stops = self.tour_listbox.get(0, tk.END)
+        for name in self.selected_nodes:
+            if name not in stops:
+                self.tour_listbox.insert(tk.END, name)
+
+    def remove_tour_stop(self):
+        for index in reversed(self.tour_listbox.curselection()):
+            self.tour_listbox.delete(index)
+
+    def plan_tour(self):
+        stops = list(self.tour_listbox.get(0, tk.END))
+        if len(stops) < 2:
+            self.show_message("提示", "请至少添加两个景点!")
+            return
+
+        if not self._engine_idle():
+            return
+
+        round_trip = self.tour_round_trip_var.get()
+
+        def work(task):
+            result = self.engine.plan_tour(stops, round_trip=round_trip)
+            task.check()
+            return result
+
+        def done(result):
+            order, path, total_length = result
+            self.recommended_path = path
+            self.shortest_path = []
+            self.facility_paths = []
+            self.alternative_paths = []
             self.draw_graph()
-            path_str = " -> ".join(route)
-            self.show_message(route_name, f"推荐路线:\n{path_str}\n总距离: {total_length}米")
+            self.show_message("游览路线", f"访问顺序:\n{' -> '.join(order)}\n完整路线:\n{' -> '.join(path)}"
+                                      f"\n总距离: {format_length(total_length)}米")
+
+        def failed(e):
+            if isinstance(e, (nx.NodeNotFound, nx.NetworkXNoPath)):
+                self.show_message("提示", str(e))
+            else:
+                self.show_message("错误", f"路线规划失败: {str(e)}")
+
+        self._start_task("规划游览路线", work, on_done=done, on_error=failed)
+
+    def find_nearest_facility(self):
+        """从选中的第一个景点出发，查找最近的若干个指定类别设施"""
+        if not self.selected_nodes:
+            self.show_message("提示", "请先选择出发景点!")
+            return
+
+        if not self._engine_idle():
+            return
+
+        start = self.selected_nodes[0]
+        category = self.facility_var.get()
+        count = self.facility_count_var.get()
+
+        def work(task):
+            results = self.engine.nearest_facilities(start, category, count)
+            task.check()
+            return results, self.engine.last_expanded
+
+        def done(result):
+            results, expanded = result
+            if not results:
+                self.show_message("提示", f"从 {start} 出发没有可到达的{category}!")
+                return
+            self.facility_paths = [path for _, path, _ in results]
+            self.alternative_paths = []
+            self.shortest_path = []
+            self.recommended_path = []
+            self.draw_graph()
+            lines = [f"{i}. {name}  {format_length(length)}米\n   {' -> '.join(path)}"
+                     for i, (name, path, length) in enumerate(results, 1)]
+            self.show_message("最近设施", f"从 {start} 出发最近的{category}:\n" + "\n".join(lines)
+                              + f"\n扩展节点数: {expanded}")
+
+        def failed(e):
+            self.show_message("错误", f"查询失败: {str(e)}")
+
+        self._start_task("查找最近设施", work, on_done=done, on_error=failed)
 
     def reset(self):
+        if not self._engine_idle():
+            return
         self.selected_nodes = []
         self.selected_edge = None
         self.shortest_path = []
         self.recommended_path = []  # 重置推荐路线
+        self.facility_paths = []
+        self.alternative_paths = []
         self.placing_new_node = False
         self.draw_graph()
 
@@ -749,23 +997,22 @@ class CampusNavigation:
         ttk.Label(msg_window, text=message, wraplength=250, padding=20).pack(expand=True)
         ttk.Button(msg_window, text="确定", command=msg_window.destroy).pack(pady=10)
 
+    @profiler.traced("on_click")
     def on_click(self, event):
         if event.inaxes != self.ax:
             return
+        # 后台任务使用路网数据期间忽略地图点击
+        if not self._engine_idle(quiet=True):
+            return
 
         # 如果正在放置新节点
         if self.placing_new_node:
             self._place_new_node(event.xdata, event.ydata)
             return
 
-        pos = nx.get_node_attributes(self.G, 'pos')
-        clicked_node = None
-
-        # 处理节点点击
-        for node, (x, y) in pos.items():
-            if np.sqrt((x - event.xdata) ** 2 + (y - event.ydata) ** 2) < 15:
-                clicked_node = node
-                break
+        # 处理节点点击：通过空间索引查找 15 像素内最近的节点
+        with profiler.span("pick.node"):
+            clicked_node = self.engine.nearest_node(event.xdata, event.ydata, 15, self.renderer.visible)
 
         if clicked_node:
             # 节点点击逻辑（保持不变）
@@ -797,21 +1044,9 @@ class CampusNavigation:
                 self.draw_graph()
 
     def _handle_double_click_on_edge(self, event):
-        pos = nx.get_node_attributes(self.G, 'pos')
-        min_dist = float('inf')
-        selected_edge = None
-        edge_u = edge_v = None
-
-        # 遍历所有边，判断鼠标位置是否双击在边上
-        for u, v, d in self.G.edges(data=True):
-            x1, y1 = pos[u]
-            x2, y2 = pos[v]
-            dist = self._point_to_line_distance(event.xdata, event.ydata, x1, y1, x2, y2)
-            if dist < 10:  # 双击检测范围，可调整
-                if dist < min_dist:
-                    min_dist = dist
-                    selected_edge = (u, v)
-                    edge_u, edge_v = u, v
+        # 通过线段索引查找双击位置 10 像素内最近的边
+        with profiler.span("pick.edge"):
+            selected_edge = self.engine.nearest_edge(event.xdata, event.ydata, 10, self._edge_shown)
 
         if selected_edge:
             u, v = selected_edge
@@ -820,18 +1055,9 @@ class CampusNavigation:
                               f"{u} 到 {v}\n长度: {weight}米")
 
     def _select_edge(self, event):
-        pos = nx.get_node_attributes(self.G, 'pos')
-        min_dist = float('inf')
-        selected = None
-
-        for u, v in self.G.edges():
-            x1, y1 = pos[u]
-            x2, y2 = pos[v]
-            dist = self._point_to_line_distance(event.xdata, event.ydata, x1, y1, x2, y2)
-            # 调整检测范围：8→10，更容易选中边
-            if dist < 10 and dist < min_dist:
-                min_dist = dist
-                selected = (u, v)
+        # 检测范围 10 像素，更容易选中边
+        with profiler.span("pick.edge"):
+            selected = self.engine.nearest_edge(event.xdata, event.ydata, 10, self._edge_shown)
 
         if selected:
             self.selected_nodes = []  # 选中边时清空节点选中状态
@@ -839,25 +1065,27 @@ class CampusNavigation:
         else:
             self.selected_edge = None  # 未选中边则清空
 
-    def _point_to_line_distance(self, x, y, x1, y1, x2, y2):
-        dx = x2 - x1
-        dy = y2 - y1
-
-        if dx == 0 and dy == 0:
-            return np.hypot(x - x1, y - y1)
-
-        t = ((x - x1) * dx + (y - y1) * dy) / (dx * dx + dy * dy)
-        t = max(0, min(1, t))
-
-        proj_x = x1 + t * dx
-        proj_y = y1 + t * dy
+    def _edge_shown(self, u, v):
+        """路径两端都在当前显示的楼层（或室外）时才可点击"""
+        return self.renderer.visible(u) and self.renderer.visible(v)
 
-        return np.hypot(x - proj_x, y - proj_y)
+    def show_floor(self, event=None):
+        """切换显示的楼层：只改变各楼层图元的可见性，不重建地图"""
+        if not self._engine_idle():
+            # 重绘需读取路网，任务结束前保持原来显示的楼层
+            self.floor_var.set(self.renderer.shown_level or ALL_FLOORS)
+            return
+        level = self.floor_var.get()
+        self.renderer.show_level(None if level == ALL_FLOORS else level)
+        self.draw_graph()
 
     def prepare_add_node(self):
+        if not self._engine_idle():
+            return
+
         dialog = tk.Toplevel(self.root)
         dialog.title("新增景点")
-        dialog.geometry("300x300")
+        dialog.geometry("300x420")
         dialog.transient(self.root)
         dialog.grab_set()
 
@@ -865,6 +1093,14 @@ class CampusNavigation:
         name_entry = ttk.Entry(dialog)
         name_entry.pack(fill=tk.X, padx=10, pady=5)
 
+        ttk.Label(dialog, text="景点类别（可留空）:").pack(anchor=tk.W, padx=10, pady=5)
+        category_box = ttk.Combobox(dialog, values=self.engine.category_names())
+        category_box.pack(fill=tk.X, padx=10, pady=5)
+
+        ttk.Label(dialog, text="所在楼层（楼宇/楼层，室外留空）:").pack(anchor=tk.W, padx=10, pady=5)
+        floor_box = ttk.Combobox(dialog, values=self.engine.floor_names())
+        floor_box.pack(fill=tk.X, padx=10, pady=5)
+
         ttk.Label(dialog, text="景点介绍:").pack(anchor=tk.W, padx=10, pady=5)
         intro_text = tk.Text(dialog, height=6, wrap=tk.WORD)
         intro_text.pack(fill=tk.X, padx=10, pady=5)
@@ -881,6 +1117,8 @@ class CampusNavigation:
 
             self.new_node_name = name
             self.new_node_intro = intro_text.get("1.0", tk.END).strip()
+            self.new_node_category = category_box.get().strip()
+            self.new_node_floor = floor_box.get().strip()
             self.placing_new_node = True
             dialog.destroy()
             self.draw_graph()
@@ -892,6 +1130,9 @@ class CampusNavigation:
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
 
     def edit_node(self):
+        if not self._engine_idle():
+            return
+
         if not self.selected_nodes or len(self.selected_nodes) != 1:
             self.show_message("提示", "请先选择一个景点")
             return
@@ -899,10 +1140,12 @@ class CampusNavigation:
         node = self.selected_nodes[0]
         current_pos = self.locations[node]
         current_intro = self.introductions.get(node, "")
+        current_category = self.engine.categories.get(node, "")
+        current_floor = self.engine.floors.get(node, "")
 
         dialog = tk.Toplevel(self.root)
         dialog.title(f"修改景点: {node}")
-        dialog.geometry("300x300")
+        dialog.geometry("300x420")
         dialog.transient(self.root)
         dialog.grab_set()
 
@@ -915,6 +1158,16 @@ class CampusNavigation:
         ttk.Label(dialog, text=f"X: {int(current_pos[0])}, Y: {int(current_pos[1])}").pack(anchor=tk.W, padx=10)
         ttk.Label(dialog, text="(点击地图可直接调整位置)").pack(anchor=tk.W, padx=10, pady=5)
 
+        ttk.Label(dialog, text="景点类别:").pack(anchor=tk.W, padx=10, pady=5)
+        category_box = ttk.Combobox(dialog, values=self.engine.category_names())
+        category_box.pack(fill=tk.X, padx=10, pady=5)
+        category_box.set(current_category)
+
+        ttk.Label(dialog, text="所在楼层（室外留空）:").pack(anchor=tk.W, padx=10, pady=5)
+        floor_box = ttk.Combobox(dialog, values=self.engine.floor_names())
+        floor_box.pack(fill=tk.X, padx=10, pady=5)
+        floor_box.set(current_floor)
+
         ttk.Label(dialog, text="景点介绍:").pack(anchor=tk.W, padx=10, pady=5)
         intro_text = tk.Text(dialog, height=4, wrap=tk.WORD)
         intro_text.pack(fill=tk.X, padx=10, pady=5)
@@ -930,15 +1183,20 @@ class CampusNavigation:
                 messagebox.showerror("错误", "该景点名称已存在")
                 return
 
+            # 重命名、修改介绍、类别与楼层作为一步记入撤回日志
+            ops = [("rename_node", (node, new_name))] if new_name != node else []
+            ops.append(("set_introduction", (new_name, intro_text.get("1.0", tk.END).strip())))
+            new_category = category_box.get().strip()
+            if new_category != current_category:
+                ops.append(("set_category", (new_name, new_category)))
+            new_floor = floor_box.get().strip()
+            if new_floor != current_floor:
+                ops.append(("set_floor", (new_name, new_floor)))
+            self.history.perform(f"编辑景点 {new_name}", *ops)
             if new_name != node:
-                self.locations[new_name] = self.locations.pop(node)
-                self.introductions[new_name] = self.introductions.pop(node)
-                self.G = nx.relabel_nodes(self.G, {node: new_name})
                 self.selected_nodes = [new_name]
 
-            self.introductions[new_name] = intro_text.get("1.0", tk.END).strip()
             self.draw_graph()
-            self.save_state()  # 新增：保存状态
             dialog.destroy()
             messagebox.showinfo("成功", f"已更新景点: {new_name}")
 
@@ -949,6 +1207,9 @@ class CampusNavigation:
         ttk.Button(button_frame, text="取消", command=dialog.destroy).pack(side=tk.RIGHT, padx=5)
 
     def delete_node(self):
+        if not self._engine_idle():
+            return
+
         if not self.selected_nodes or len(self.selected_nodes) != 1:
             self.show_message("提示", "请先选择一个景点")
             return
@@ -958,23 +1219,21 @@ class CampusNavigation:
         if not messagebox.askyesno("确认", f"确定要删除景点 '{node}' 吗?\n相关路径也将被删除"):
             return
 
-        del self.locations[node]
-        if node in self.introductions:
-            del self.introductions[node]
-
-        self.G.remove_node(node)
+        self.history.perform(f"删除景点 {node}", ("delete_node", (node,)))
         self.reset()
-        self.save_state()  # 新增：保存状态
         messagebox.showinfo("成功", f"已删除景点: {node}")
 
     def add_edge(self):
+        if not self._engine_idle():
+            return
+
         if len(self.selected_nodes) != 2:
             self.show_message("提示", "请先选择两个景点来创建路径")
             return
 
         u, v = self.selected_nodes
 
-        if self.G.has_edge(u, v):
+        if self.engine.has_edge(u, v):
             self.show_message("提示", f"{u} 和 {v} 之间已存在路径")
             return
 
@@ -987,19 +1246,20 @@ class CampusNavigation:
             self.show_message("错误", "请输入有效的数字")
             return
 
-        self.paths.append((u, v, distance))
-        self.G.add_edge(u, v, weight=distance)
+        self.history.perform(f"新增路径 {u}-{v}", ("add_edge", (u, v, distance)))
         self.draw_graph()
-        self.save_state()  # 新增：保存状态
         self.show_message("成功", f"已添加{u}到{v}的路径，长度: {distance}米")
 
     def edit_edge(self):
+        if not self._engine_idle():
+            return
+
         if not self.selected_edge:
             self.show_message("提示", "请先选择一条路径")
             return
 
         u, v = self.selected_edge
-        current_weight = self.G.edges[u, v]['weight']
+        current_weight = self.engine.edge_weight(u, v)
 
         try:
             new_distance = simpledialog.askfloat("修改路径长度",
@@ -1013,18 +1273,15 @@ class CampusNavigation:
             self.show_message("错误", "请输入有效的数字")
             return
 
-        self.G.edges[u, v]['weight'] = new_distance
-
-        for i, (a, b, w) in enumerate(self.paths):
-            if (a == u and b == v) or (a == v and b == u):
-                self.paths[i] = (u, v, new_distance)
-                break
+        self.history.perform(f"修改路径 {u}-{v}", ("edit_edge", (u, v, new_distance)))
 
         self.draw_graph()
-        self.save_state()  # 新增：保存状态
         self.show_message("成功", f"已更新{u}到{v}的路径长度为: {new_distance}米")
 
     def delete_edge(self):
+        if not self._engine_idle():
+            return
+
         if not self.selected_edge:
             self.show_message("提示", "请先选择一条路径")
             return
@@ -1034,15 +1291,9 @@ class CampusNavigation:
         if not messagebox.askyesno("确认", f"确定要删除{u}到{v}的路径吗?"):
             return
 
-        self.G.remove_edge(u, v)
-
-        for i, (a, b, w) in enumerate(self.paths):
-            if (a == u and b == v) or (a == v and b == u):
-                del self.paths[i]
-                break
+        self.history.perform(f"删除路径 {u}-{v}", ("delete_edge", (u, v)))
 
         self.reset()
-        self.save_state()  # 新增：保存状态
         self.show_message("成功", f"已删除{u}到{v}的路径")
 
     def run(self):
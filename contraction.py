@@ -0,0 +1,313 @@
+import argparse
+import hashlib
+import heapq
+import math
+import os
+import time
+
+import numpy as np
+
+
+# 收缩层次（Contraction Hierarchies）：预处理时按重要性从低到高依次「收缩」节点，
+# 必要时在其邻居间加入捷径边；查询时起点、终点各自只沿「通往更重要节点」的边做 Dijkstra，
+# 在大图上只需扩展几百个节点。层次结构与构建它的路网一一对应（以路网摘要校验），
+# 路网编辑后即失效，此时由路网引擎退回普通 Dijkstra。
+#
+# 用法：python contraction.py --nodes node.csv --edges edge.csv --out map.ch.npz [--bench 1000]
+
+# 见证搜索（判断是否需要捷径）最多确定的节点数：越大捷径越少，预处理越慢
+WITNESS_SETTLE_LIMIT = 50
+
+
+def graph_digest(csr):
+    """路网摘要：节点名表与 CSR 数组的哈希，用于判断层次结构是否对应当前路网"""
+    h = hashlib.blake2b(digest_size=16)
+    h.update("\0".join(map(str, csr.names)).encode("utf-8"))
+    for arr in (csr.offsets, csr.neighbors, csr.weights):
+        h.update(np.ascontiguousarray(arr).tobytes())
+    return h.hexdigest()
+
+
+class ContractionHierarchy:
+    """向上图：每个节点只保存指向重要性更高节点的边
+
+    捷径边 lo → hi 由被收缩的中间节点 m 的两条向上边 m → lo、m → hi 拼成，
+    children 记录这两条边的下标（原始边为 -1），展开路径时按下标递归，不需要查找。
+    """
+
+    def __init__(self, rank, offsets, targets, weights, children, digest):
+        self.rank = rank  # 节点 ID -> 收缩次序（越大越重要）
+        self.offsets = offsets  # 节点 i 的向上边为 [offsets[i], offsets[i + 1])
+        self.targets = targets
+        self.weights = weights
+        self.children = children  # 形状 (边数, 2)：[m → lo 的下标, m → hi 的下标]
+        self.digest = digest
+        self._lists = None
+
+    @property
+    def num_shortcuts(self):
+        return int(np.count_nonzero(self.children[:, 0] >= 0))
+
+    # ===== 预处理 =====
+    @classmethod
+    def build(cls, csr, task=None):
+        """由 CSR 路网构建；task 为后台任务句柄时汇报进度并响应取消"""
+        n = csr.num_nodes
+        offsets, neighbors, weights = csr.adjacency_lists()
+        inf = math.inf
+        # 尚未收缩的剩余图：adj[v] = {邻居: 长度}；捷径边的中间节点记在 middle 中
+        adj = [{} for _ in range(n)]
+        for v in range(n):
+            nbrs = adj[v]
+            for i in range(offsets[v], offsets[v + 1]):
+                w = neighbors[i]
+                if w != v and weights[i] < nbrs.get(w, inf):
+                    nbrs[w] = weights[i]
+        middle = {}
+        deleted = [0] * n  # 已收缩的邻居数，使收缩顺序在图中分布均匀
+
+        def shortcuts(v):
+            """收缩 v 需要加入的捷径 [(u, w, 长度)]：u、w 之间不经过 v 的路径都更长时才需要"""
+            nbrs = list(adj[v].items())
+            result = []
+            for index, (u, du) in enumerate(nbrs[:-1]):
+                targets = {w: du + dw for w, dw in nbrs[index + 1:]}
+                limit = max(targets.values())
+                dist = {u: 0.0}
+                heap = [(0.0, u)]
+                settled = 0
+                while heap:
+                    d, x = heapq.heappop(heap)
+                    if d > dist[x]:
+                        continue
+                    if d > limit or settled >= WITNESS_SETTLE_LIMIT:
+                        break
+                    settled += 1
+                    for y, dy in adj[x].items():
+                        nd = d + dy
+                        if y != v and nd < dist.get(y, inf):
+                            dist[y] = nd
+                            heapq.heappush(heap, (nd, y))
+                # 搜到的任一路径（不必是最短）不长于经过 v 的路径即为见证
+                result.extend((u, w, via) for w, via in targets.items() if dist.get(w, inf) > via)
+            return result
+
+        def estimate(v):
+            """估算收缩 v 需要的捷径数：只找两跳以内的见证路径（字典查找，不做搜索）"""
+            nbrs = list(adj[v].items())
+            count = 0
+            for index, (u, du) in enumerate(nbrs[:-1]):
+                adj_u = adj[u]
+                for w, dw in nbrs[index + 1:]:
+                    via = du + dw
+                    if adj_u.get(w, inf) <= via:
+                        continue
+                    adj_w = adj[w]
+                    if not any(x != v and dx + adj_w.get(x, inf) <= via for x, dx in adj_u.items()):
+                        count += 1
+            return count
+
+        def priority(v):
+            # 边差（估算的新增捷径数 - 删除的边数）+ 已收缩邻居数
+            return estimate(v) - len(adj[v]) + deleted[v]
+
+        # 优先级只用两跳见证估算（收缩每个节点要估算多次），真正收缩时才做有限的见证搜索
+        current = [priority(v) for v in range(n)]
+        queue = [(p, v) for v, p in enumerate(current)]
+        heapq.heapify(queue)
+        rank = [0] * n
+        up = [None] * n
+        order = 0
+        while queue:
+            p, v = heapq.heappop(queue)
+            if p != current[v] or up[v] is not None:
+                continue  # 过期的队列项
+            # 惰性更新：重新计算的优先级不再最小时放回队列
+            p = priority(v)
+            if queue and p > queue[0][0]:
+                current[v] = p
+                heapq.heappush(queue, (p, v))
+                continue
+
+            added = shortcuts(v)
+            rank[v] = order
+            order += 1
+            for u, w, d in added:
+                if d < adj[u].get(w, inf):
+                    adj[u][w] = adj[w][u] = d
+                    middle[(u, w) if u < w else (w, u)] = v
+            # 剩余邻居都比 v 晚收缩，即 v 的向上边
+            up[v] = [(u, d, middle.get((u, v) if u < v else (v, u), -1)) for u, d in adj[v].items()]
+            for u in adj[v]:
+                del adj[u][v]
+                deleted[u] += 1
+            # 邻居的优先级随之变化，立即重新计算
+            for u in adj[v]:
+                current[u] = priority(u)
+                heapq.heappush(queue, (current[u], u))
+            adj[v] = {}
+
+            if task is not None and order % 1000 == 0:
+                task.check()
+                task.report(order / n, f"收缩节点 {order}/{n}")
+
+        counts = [len(edges) for edges in up]
+        up_offsets = np.zeros(n + 1, dtype=np.int64)
+        np.cumsum(counts, out=up_offsets[1:])
+        starts = up_offsets.tolist()
+
+        def edge_index(m, u):
+            # m 的向上边很少，顺序查找即可
+            return starts[m] + next(i for i, edge in enumerate(up[m]) if edge[0] == u)
+
+        children = np.full((starts[-1], 2), -1, dtype=np.int32)
+        for v in range(n):
+            for i, (u, _, m) in enumerate(up[v]):
+                if m >= 0:
+                    children[starts[v] + i] = (edge_index(m, v), edge_index(m, u))
+        flat = [edge for edges in up for edge in edges]
+        return cls(np.asarray(rank, dtype=np.int32), up_offsets,
+                   np.array([u for u, _, _ in flat], dtype=np.int32),
+                   np.array([d for _, d, _ in flat], dtype=np.float64),
+                   children, graph_digest(csr))
+
+    # ===== 持久化 =====
+    def save(self, path):
+        """保存为 .npz（附带路网摘要）；先写临时文件再替换"""
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as f:
+            np.savez(f, rank=self.rank, offsets=self.offsets, targets=self.targets, weights=self.weights,
+                     children=self.children, digest=np.array(self.digest))
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(data["rank"], data["offsets"], data["targets"], data["weights"], data["children"],
+                       str(data["digest"]))
+
+    # ===== 查询 =====
+    def adjacency_lists(self):
+        """offsets / targets / weights / sources / children 的列表副本（首次查询时生成）"""
+        if self._lists is None:
+            # sources[i] 为第 i 条向上边的起点（较不重要的一端）
+            sources = np.repeat(np.arange(len(self.offsets) - 1), np.diff(self.offsets))
+            self._lists = (self.offsets.tolist(), self.targets.tolist(), self.weights.tolist(),
+                           sources.tolist(), self.children.tolist())
+        return self._lists
+
+    def query(self, source, target):
+        """返回 (路径 ID 列表, 总长度, 扩展节点数)；不可达时路径为 None
+
+        双向只沿向上边搜索，某一方向堆顶键值不小于当前最优值时该方向停止；
+        若存在更重要的邻居能以更短距离到达某节点，该节点不再向外松弛（stall-on-demand）。
+        """
+        if source == target:
+            return [source], 0.0, 0
+        offsets, targets, weights, sources, _ = self.adjacency_lists()
+        inf = math.inf
+        dist = ({source: 0.0}, {target: 0.0})
+        pred = ({source: -1}, {target: -1})
+        heaps = ([(0.0, source)], [(0.0, target)])
+        best = inf
+        meet = None
+        expanded = 0
+        while True:
+            side = None
+            for s in (0, 1):
+                if heaps[s] and heaps[s][0][0] < best and (side is None or heaps[s][0][0] < heaps[side][0][0]):
+                    side = s
+            if side is None:
+                break
+            d, x = heapq.heappop(heaps[side])
+            my_dist = dist[side]
+            if d > my_dist[x]:
+                continue
+            expanded += 1
+            other = dist[1 - side].get(x)
+            if other is not None and d + other < best:
+                best = d + other
+                meet = x
+            begin, end = offsets[x], offsets[x + 1]
+            if any(my_dist.get(targets[i], inf) + weights[i] < d for i in range(begin, end)):
+                continue
+            my_pred = pred[side]
+            for i in range(begin, end):
+                y = targets[i]
+                nd = d + weights[i]
+                if nd < my_dist.get(y, inf):
+                    my_dist[y] = nd
+                    my_pred[y] = i
+                    heapq.heappush(heaps[side], (nd, y))
+
+        if meet is None:
+            return None, inf, expanded
+        # 向上图中的路径：起点 → meet 沿边正向（向上），meet → 终点沿边反向（向下）
+        hops = []
+        i = pred[0][meet]
+        while i != -1:
+            hops.append((i, True))
+            i = pred[0][sources[i]]
+        hops.reverse()
+        i = pred[1][meet]
+        while i != -1:
+            hops.append((i, False))
+            i = pred[1][sources[i]]
+        path = [source]
+        self._unpack(hops, path)
+        return path, best, expanded
+
+    def _unpack(self, hops, path):
+        """把 [(向上边下标, 是否正向)] 依次展开为原始边，追加每条原始边的终点"""
+        _, targets, _, sources, children = self.adjacency_lists()
+        stack = hops[::-1]
+        while stack:
+            i, forward = stack.pop()
+            lo_child, hi_child = children[i]
+            if lo_child < 0:
+                path.append(targets[i] if forward else sources[i])
+            elif forward:
+                # lo → hi 即 lo → m（m → lo 反向）再 m → hi
+                stack.append((hi_child, True))
+                stack.append((lo_child, False))
+            else:
+                stack.append((lo_child, True))
+                stack.append((hi_child, False))
+
+
+def main():
+    from routing_engine import RoutingEngine
+
+    parser = argparse.ArgumentParser(description="构建收缩层次")
+    parser.add_argument("--nodes", default="node.csv", help="节点文件")
+    parser.add_argument("--edges", default="edge.csv", help="路径文件")
+    parser.add_argument("--out", default="map.ch.npz", help="输出文件")
+    parser.add_argument("--bench", type=int, default=0, help="构建后随机查询的次数（与 Dijkstra 对比）")
+    args = parser.parse_args()
+
+    engine = RoutingEngine(args.nodes, args.edges, ch_path=args.out)
+    csr = engine.csr()
+    begin = time.perf_counter()
+    ch = engine.build_contraction()
+    elapsed = time.perf_counter() - begin
+    print(f"节点 {csr.num_nodes}，路径 {csr.num_edges}，捷径 {ch.num_shortcuts}，构建耗时 {elapsed:.1f} 秒")
+
+    if args.bench:
+        rng = np.random.default_rng(0)
+        pairs = rng.integers(0, csr.num_nodes, size=(args.bench, 2)).tolist()
+        ch.adjacency_lists()  # 列表副本只生成一次，不计入查询耗时
+        begin = time.perf_counter()
+        results = [ch.query(s, t) for s, t in pairs]
+        ch_ms = (time.perf_counter() - begin) / len(pairs) * 1000
+        sample = pairs[:min(len(pairs), 50)]
+        begin = time.perf_counter()
+        reference = [csr.dijkstra(s, t) for s, t in sample]
+        dijkstra_ms = (time.perf_counter() - begin) / len(sample) * 1000
+        mismatches = sum(1 for (_, a, _), (_, b, _) in zip(results, reference) if not math.isclose(a, b))
+        expanded = np.mean([e for _, _, e in results])
+        print(f"CH 查询 {ch_ms:.3f} ms/次（平均扩展 {expanded:.0f} 个节点），Dijkstra {dijkstra_ms:.1f} ms/次，"
+              f"结果不一致 {mismatches}/{len(sample)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,392 @@
+import copy
+import heapq
+import math
+
+import numpy as np
+import pandas as pd
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra
+
+
+# 压缩稀疏行（CSR）格式的路网：节点名映射为连续整数 ID，邻接关系存放在连续的 NumPy 数组中
+
+# 每个 CSR 图最多缓存的终点最短距离树数量（大图上每棵占 O(V) 内存）
+TARGET_TREE_CACHE_SIZE = 8
+
+
+def intern_edges(names, edges):
+    """节点名 -> 整数 ID：返回 (节点名列表, 起点 ID 数组, 终点 ID 数组, 长度数组)
+
+    路径端点不在节点名列表中时按出现顺序追加（与 networkx 建图的节点顺序一致）。
+    """
+    names = list(names)
+    edges = list(edges)
+    starts = np.array([a for a, _, _ in edges], dtype=object)
+    ends = np.array([b for _, b, _ in edges], dtype=object)
+    w = np.array([length for _, _, length in edges], dtype=np.float64)
+
+    # 哈希表整体查找
+    index = pd.Index(names)
+    u = index.get_indexer(starts)
+    v = index.get_indexer(ends)
+    if len(edges) and (u.min() < 0 or v.min() < 0):
+        both = np.empty(2 * len(edges), dtype=object)
+        both[0::2] = starts
+        both[1::2] = ends
+        names += pd.unique(both[index.get_indexer(both) < 0]).tolist()
+        index = pd.Index(names)
+        u = index.get_indexer(starts)
+        v = index.get_indexer(ends)
+    return names, u, v, w
+
+
+def tree_affected(dist, pred, changes):
+    """最短路径树是否受路径长度变化的影响；dist / pred 为一棵树（一维）或按行排列的多棵树（二维，返回每行的标记）
+
+    changes 为 [(端点 ID a, 端点 ID b, 原长度, 新长度)]。变长（含封闭）只影响以该路径为树边的树，
+    变短（含解除封闭）只影响经该路径能缩短某一端距离的树；不受影响的树在变化后仍是最短路径树。
+    """
+    affected = np.zeros(dist.shape[:-1], dtype=bool)
+    for a, b, old, new in changes:
+        if new > old:
+            affected |= (pred[..., b] == a) | (pred[..., a] == b)
+        elif new < old:
+            affected |= (dist[..., a] + new < dist[..., b]) | (dist[..., b] + new < dist[..., a])
+    return affected
+
+
+class CSRGraph:
+    """只读无向图：offsets / neighbors / weights 三个连续数组 + 节点名表"""
+
+    def __init__(self, names, offsets, neighbors, weights):
+        self.names = list(names)  # ID -> 节点名
+        self.index = {name: i for i, name in enumerate(self.names)}  # 节点名 -> ID
+        self.offsets = offsets  # 节点 i 的邻接区间为 [offsets[i], offsets[i + 1])
+        self.neighbors = neighbors
+        self.weights = weights
+        # 与上述数组共享内存的稀疏矩阵视图，供 scipy.sparse.csgraph 使用
+        n = len(self.names)
+        self.matrix = csr_matrix((weights, neighbors, offsets), shape=(n, n), copy=False)
+        self._lists = None  # 逐点搜索（A* / 双向）使用的 Python 列表副本，首次使用时生成
+        self._target_trees = {}  # 终点 ID -> (各节点到终点的距离列表, 前驱数组)，K 条最短路径使用
+
+    @classmethod
+    def from_edges(cls, names, edges):
+        """由节点名列表和 (起点, 终点, 长度) 序列构建；重复边以最后一次出现的长度为准"""
+        return cls.from_arrays(*intern_edges(names, edges))
+
+    @classmethod
+    def from_arrays(cls, names, u, v, w):
+        """由整数端点数组构建 CSR 数组"""
+        n = len(names)
+        u = np.asarray(u, dtype=np.int32)
+        v = np.asarray(v, dtype=np.int32)
+        w = np.asarray(w, dtype=np.float64)
+
+        # 无向边去重：按 (小, 大) 端点归一化，保留最后一次出现
+        lo = np.minimum(u, v).astype(np.int64)
+        hi = np.maximum(u, v).astype(np.int64)
+        keys = lo * n + hi
+        _, last = np.unique(keys[::-1], return_index=True)
+        keep = np.sort(len(keys) - 1 - last)
+        u, v, w = u[keep], v[keep], w[keep]
+
+        # 每条无向边拆成两条有向弧，按起点稳定排序
+        src = np.concatenate([u, v])
+        dst = np.concatenate([v, u])
+        wts = np.concatenate([w, w])
+        order = np.argsort(src, kind="stable")
+        offsets = np.zeros(n + 1, dtype=np.int32)
+        np.cumsum(np.bincount(src, minlength=n), out=offsets[1:])
+        return cls(names, offsets, dst[order], wts[order])
+
+    def reweighted(self, changes):
+        """返回修改了部分路径长度的新图：changes 为 {(端点 ID a, 端点 ID b): 新长度}，inf 表示不可通行
+
+        节点 ID 与邻接结构不变（与原图共用数组），只复制并修补长度数组，耗时与路径数的复制成本相当。
+        """
+        weights = self.weights.copy()
+        lists = None if self._lists is None else list(self._lists[2])
+        for (a, b), w in changes.items():
+            for x, y in ((a, b), (b, a)):
+                begin = self.offsets[x]
+                for i in (begin + np.flatnonzero(self.neighbors[begin:self.offsets[x + 1]] == y)).tolist():
+                    weights[i] = w
+                    if lists is not None:
+                        lists[i] = w
+        graph = copy.copy(self)
+        graph.weights = weights
+        graph.matrix = csr_matrix((weights, self.neighbors, self.offsets), shape=self.matrix.shape, copy=False)
+        graph._lists = None if lists is None else (self._lists[0], self._lists[1], lists)
+        graph._target_trees = {}
+        return graph
+
+    @property
+    def num_nodes(self):
+        return len(self.names)
+
+    @property
+    def num_edges(self):
+        return len(self.neighbors) // 2
+
+    def dijkstra(self, source, target):
+        """单次 Dijkstra，返回 (路径 ID 列表, 总长度, 扩展节点数)；不可达时路径为 None
+
+        scipy 的实现会扫描整个连通分量，扩展节点数即可达节点数。
+        """
+        dist, pred = dijkstra(self.matrix, directed=True, indices=source, return_predecessors=True)
+        expanded = int(np.count_nonzero(np.isfinite(dist)))
+        length = dist[target]
+        if not np.isfinite(length):
+            return None, np.inf, expanded
+        return self.unwind(pred, target), float(length), expanded
+
+    def adjacency_lists(self):
+        """offsets / neighbors / weights 的列表副本：纯 Python 循环中按下标访问比 NumPy 标量快得多"""
+        if self._lists is None:
+            self._lists = (self.offsets.tolist(), self.neighbors.tolist(), self.weights.tolist())
+        return self._lists
+
+    def edge_length_ratio(self, xs, ys):
+        """所有路径「长度 / 像素直线距离」的最小值，用作像素→米的可采纳换算系数"""
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        src = np.repeat(np.arange(self.num_nodes), np.diff(self.offsets))
+        span = np.hypot(xs[src] - xs[self.neighbors], ys[src] - ys[self.neighbors])
+        mask = span > 0
+        if not mask.any():
+            return 0.0
+        return max(float(np.min(self.weights[mask] / span[mask])), 0.0)
+
+    def astar(self, source, target, xs, ys, scale):
+        """A* 搜索：启发函数为 scale × 到终点的像素直线距离，返回值同 dijkstra"""
+        offsets, neighbors, weights = self.adjacency_lists()
+        tx, ty = xs[target], ys[target]
+        hypot = math.hypot
+
+        dist = {source: 0.0}
+        pred = {source: -1}
+        closed = set()
+        heap = [(scale * hypot(xs[source] - tx, ys[source] - ty), 0.0, source)]
+        while heap:
+            _, d, x = heapq.heappop(heap)
+            if x in closed:
+                continue
+            closed.add(x)
+            if x == target:
+                return self._unwind_dict(pred, target), d, len(closed)
+            for i in range(offsets[x], offsets[x + 1]):
+                y = neighbors[i]
+                nd = d + weights[i]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    pred[y] = x
+                    heapq.heappush(heap, (nd + scale * hypot(xs[y] - tx, ys[y] - ty), nd, y))
+        return None, np.inf, len(closed)
+
+    def bidirectional(self, source, target, xs=None, ys=None, scale=0.0):
+        """双向搜索；给定坐标与 scale 时为双向 A*（平均势函数），否则为双向 Dijkstra
+
+        势函数 p(v) = (h_t(v) - h_s(v)) / 2 对两个方向同时一致，
+        因此当两侧堆顶键值之和不小于当前最优值时即可停止。
+        """
+        if source == target:
+            return [source], 0.0, 0
+        offsets, neighbors, weights = self.adjacency_lists()
+        if scale > 0:
+            sx, sy, tx, ty = xs[source], ys[source], xs[target], ys[target]
+            half = scale / 2
+
+            def potential(v):
+                return half * (math.hypot(xs[v] - tx, ys[v] - ty) - math.hypot(xs[v] - sx, ys[v] - sy))
+        else:
+            def potential(v):
+                return 0.0
+
+        # 下标 0 为正向（从起点出发），1 为反向（从终点出发）；反向键值使用 -p(v)
+        dist = ({source: 0.0}, {target: 0.0})
+        pred = ({source: -1}, {target: -1})
+        closed = (set(), set())
+        heaps = ([(potential(source), 0.0, source)], [(-potential(target), 0.0, target)])
+        best = math.inf
+        meet = None
+        expanded = 0
+        while heaps[0] and heaps[1]:
+            if heaps[0][0][0] + heaps[1][0][0] >= best:
+                break
+            side = 0 if heaps[0][0][0] <= heaps[1][0][0] else 1
+            sign = 1.0 if side == 0 else -1.0
+            _, d, x = heapq.heappop(heaps[side])
+            if x in closed[side]:
+                continue
+            closed[side].add(x)
+            expanded += 1
+            my_dist, other_dist, my_pred = dist[side], dist[1 - side], pred[side]
+            for i in range(offsets[x], offsets[x + 1]):
+                y = neighbors[i]
+                nd = d + weights[i]
+                if nd < my_dist.get(y, math.inf):
+                    my_dist[y] = nd
+                    my_pred[y] = x
+                    heapq.heappush(heaps[side], (nd + sign * potential(y), nd, y))
+                    if y in other_dist and nd + other_dist[y] < best:
+                        best = nd + other_dist[y]
+                        meet = y
+
+        if meet is None:
+            return None, np.inf, expanded
+        forward = self._unwind_dict(pred[0], meet)
+        x = pred[1][meet]
+        while x != -1:
+            forward.append(x)
+            x = pred[1][x]
+        return forward, best, expanded
+
+    def nearest_targets(self, source, targets, k=1):
+        """从 source 出发的单次 Dijkstra，依次确定距离最近的 k 个目标后立即停止
+
+        targets 为目标 ID 集合；返回 ([(目标 ID, 路径 ID 列表, 长度), ...] 按距离升序, 扩展节点数)。
+        """
+        offsets, neighbors, weights = self.adjacency_lists()
+        dist = {source: 0.0}
+        pred = {source: -1}
+        closed = set()
+        found = []
+        heap = [(0.0, source)]
+        while heap and len(found) < k:
+            d, x = heapq.heappop(heap)
+            if x in closed:
+                continue
+            closed.add(x)
+            if x in targets:
+                found.append((x, self._unwind_dict(pred, x), d))
+            for i in range(offsets[x], offsets[x + 1]):
+                y = neighbors[i]
+                nd = d + weights[i]
+                if nd < dist.get(y, math.inf):
+                    dist[y] = nd
+                    pred[y] = x
+                    heapq.heappush(heap, (nd, y))
+        return found, len(closed)
+
+    def target_tree(self, target):
+        """各节点到 target 的最短距离（列表）与前驱数组；结果缓存，同一终点的多次查询共用"""
+        if target not in self._target_trees:
+            if len(self._target_trees) >= TARGET_TREE_CACHE_SIZE:
+                del self._target_trees[next(iter(self._target_trees))]
+            dist, pred = dijkstra(self.matrix, directed=True, indices=target, return_predecessors=True)
+            self._target_trees[target] = (dist.tolist(), pred)
+        return self._target_trees[target]
+
+    def k_shortest_paths(self, source, target, k):
+        """Yen 算法求前 k 条无环最短路径，返回 ([(路径 ID 列表, 长度), ...] 按长度升序, 扩展节点数)
+
+        到终点的最短距离树只算一次：第一条路径直接从树上读出，
+        各偏离点的搜索以它为启发函数（删去节点和边只会让距离变长，因此可采纳且一致），
+        偏离后的走法未被禁止时几乎不需扩展额外节点。
+        每条路径只从它自己的偏离点开始向后生成候选（Lawler 改进）：偏离点之前的前缀与其父路径相同，
+        由这些前缀得到的候选在处理父路径时已经算过。
+        """
+        h, pred = self.target_tree(target)
+        if not math.isfinite(h[source]):
+            return [], 0
+        # 无向图中终点树的前驱即「朝终点走的下一步」
+        first = self.unwind(pred, source)[::-1]
+        paths = [(first, h[source])]
+        deviations = [0]  # 各路径相对其父路径的偏离位置
+        candidates = []
+        seen = {tuple(first)}
+        expanded = 0
+        while len(paths) < k:
+            prev, _ = paths[-1]
+            prefix = self._prefix_lengths(prev)
+            for i in range(deviations[-1], len(prev) - 1):
+                root = prev[:i + 1]
+                # 与已有路径共用同一段前缀时，禁止再走它们从偏离点出发的那条边
+                banned_arcs = {(p[i], p[i + 1]) for p, _ in paths if len(p) > i + 1 and p[:i + 1] == root}
+                spur, length, count = self._spur_search(prev[i], target, h, set(root[:-1]), banned_arcs)
+                expanded += count
+                if spur is None:
+                    continue
+                path = root[:-1] + spur
+                if tuple(path) not in seen:
+                    seen.add(tuple(path))
+                    heapq.heappush(candidates, (prefix[i] + length, path, i))
+            if not candidates:
+                break
+            length, path, deviation = heapq.heappop(candidates)
+            paths.append((path, length))
+            deviations.append(deviation)
+        return paths, expanded
+
+    def _prefix_lengths(self, path):
+        """路径各节点距起点的累计长度"""
+        offsets, neighbors, weights = self.adjacency_lists()
+        prefix = [0.0]
+        for x, y in zip(path[:-1], path[1:]):
+            prefix.append(prefix[-1] + min(weights[i] for i in range(offsets[x], offsets[x + 1])
+                                           if neighbors[i] == y))
+        return prefix
+
+    def _spur_search(self, source, target, h, banned_nodes, banned_arcs):
+        """避开指定节点与有向弧的 A* 搜索，h 为到终点的距离列表"""
+        offsets, neighbors, weights = self.adjacency_lists()
+        dist = {source: 0.0}
+        pred = {source: -1}
+        closed = set()
+        # 键值相同时优先扩展离起点更远的节点：启发函数是精确距离，这样会径直走向终点
+        heap = [(h[source], -0.0, source)]
+        inf = math.inf
+        while heap:
+            _, d, x = heapq.heappop(heap)
+            d = -d
+            if x in closed:
+                continue
+            closed.add(x)
+            if x == target:
+                return self._unwind_dict(pred, target), d, len(closed)
+            for i in range(offsets[x], offsets[x + 1]):
+                y = neighbors[i]
+                if y in banned_nodes or (x, y) in banned_arcs or h[y] == inf:
+                    continue
+                nd = d + weights[i]
+                if nd < dist.get(y, inf):
+                    dist[y] = nd
+                    pred[y] = x
+                    heapq.heappush(heap, (nd + h[y], -nd, y))
+        return None, inf, len(closed)
+
+    def shortest_path_trees(self, sources):
+        """从每个起点各做一次 Dijkstra（scipy 一次调用），返回 (dist, pred)，形状均为 (起点数, 节点数)"""
+        return dijkstra(self.matrix, directed=True, indices=np.asarray(sources, dtype=np.int32),
+                        return_predecessors=True)
+
+    def multi_source(self, sources):
+        """以一组节点为共同起点的单次 Dijkstra（scipy）
+
+        返回 (dist, pred, origin)：每个节点到最近起点的距离、前驱及该起点 ID（不可达为 -9999）。
+        无向图中沿前驱回溯得到的是「起点 → 该节点」的路径，反转即为该节点到最近起点的路径。
+        """
+        return dijkstra(self.matrix, directed=True, indices=np.asarray(sources, dtype=np.int32),
+                        return_predecessors=True, min_only=True)
+
+    @staticmethod
+    def _unwind_dict(pred, target):
+        path = []
+        x = target
+        while x != -1:
+            path.append(x)
+            x = pred[x]
+        path.reverse()
+        return path
+
+    @staticmethod
+    def unwind(pred, target):
+        """沿前驱数组回溯出路径（-9999 表示无前驱）"""
+        path = []
+        x = target
+        while x >= 0:
+            path.append(int(x))
+            x = pred[x]
+        path.reverse()
+        return path
@@ -0,0 +1,84 @@
+import numpy as np
+from scipy.sparse.csgraph import shortest_path
+
+from csr_graph import CSRGraph, tree_affected
+
+
+# 全源最短路径表：距离矩阵 + 前驱矩阵，任意起终点查询只需沿前驱回溯，耗时与路径长度成正比
+
+# 超过该节点数时不建表（矩阵大小为节点数的平方）
+DISTANCE_TABLE_MAX_NODES = 2000
+
+
+class DistanceTable:
+    """预计算的距离 / 前驱矩阵，支持新增节点、重命名、缩短路径和临时改变路径长度时的增量修补"""
+
+    def __init__(self, csr):
+        self.names = list(csr.names)
+        self.index = dict(csr.index)
+        self.dist, self.pred = shortest_path(csr.matrix, method="D", directed=True,
+                                             return_predecessors=True)
+
+    @classmethod
+    def build(cls, csr):
+        """节点数超过上限时返回 None，调用方回退到 Dijkstra"""
+        if csr.num_nodes > DISTANCE_TABLE_MAX_NODES:
+            return None
+        return cls(csr)
+
+    def lookup(self, source, target):
+        """返回 (路径节点列表, 总长度)；不可达时返回 (None, inf)"""
+        s = self.index[source]
+        t = self.index[target]
+        length = self.dist[s, t]
+        if not np.isfinite(length):
+            return None, np.inf
+        return [self.names[i] for i in CSRGraph.unwind(self.pred[s], t)], float(length)
+
+    # ===== 增量修补 =====
+    def add_node(self, name):
+        """新增孤立节点：扩展一行一列"""
+        n = len(self.names)
+        self.names.append(name)
+        self.index[name] = n
+        self.dist = np.pad(self.dist, ((0, 1), (0, 1)), constant_values=np.inf)
+        self.dist[n, n] = 0.0
+        self.pred = np.pad(self.pred, ((0, 1), (0, 1)), constant_values=-9999)
+
+    def rename_node(self, old, new):
+        i = self.index.pop(old)
+        self.names[i] = new
+        self.index[new] = i
+
+    def shorten_edge(self, u, v, weight):
+        """新增路径或路径变短：只可能让经过该边的最短路变短，O(n²) 向量化修补"""
+        a = self.index[u]
+        b = self.index[v]
+        dist = self.dist
+        # 经 a→b 或 b→a 的候选距离（均基于修补前的矩阵）
+        via_ab = dist[:, a][:, None] + weight + dist[b, :][None, :]
+        via_ba = dist[:, b][:, None] + weight + dist[a, :][None, :]
+        use_ab = (via_ab < dist) & (via_ab <= via_ba)
+        use_ba = (via_ba < dist) & ~use_ab
+
+        # i→…→a→b→…→j 上 j 的前驱：j == b 时为 a，否则沿用 b 出发时 j 的前驱
+        pred_b = self.pred[b].copy()
+        pred_b[b] = a
+        pred_a = self.pred[a].copy()
+        pred_a[a] = b
+
+        self.dist = np.where(use_ab, via_ab, np.where(use_ba, via_ba, dist))
+        self.pred = np.where(use_ab, pred_b[None, :], np.where(use_ba, pred_a[None, :], self.pred))
+
+    def repair(self, csr, changes):
+        """路径长度临时变化（封闭、减速及解除）后只重算受影响的行，返回重算的行数
+
+        csr 为变化后的路网，changes 同 tree_affected；节点编号与表不一致时返回 None，由调用方丢弃重建。
+        """
+        if csr.names != self.names:
+            return None
+        rows = np.flatnonzero(tree_affected(self.dist, self.pred, changes))
+        if len(rows):
+            self.dist[rows], self.pred[rows] = shortest_path(csr.matrix, method="D", directed=True, indices=rows,
+                                                             return_predecessors=True)
+        return len(rows)
@@ -0,0 +1,136 @@
+import heapq
+import math
+
+import numpy as np
+from scipy.sparse.csgraph import dijkstra
+
+
+# 多楼宇 / 多楼层路网：节点的楼层标签形如「图书馆/2F」（楼宇/楼层），室外节点没有楼层标签
+# 每栋楼宇是一个子图，与楼外相连的节点（门、连廊等）为门户节点；楼梯、电梯连接同一楼宇的不同楼层。
+# 预处理时在每栋楼内部求出门户之间的最短距离，组成覆盖图（室外路网 + 各楼门户间的直达边）；
+# 查询只需展开起点、终点所在楼宇的内部，途经的其他楼宇只走门户间的直达边，结果与全图 Dijkstra 相同。
+
+FLOOR_SEPARATOR = "/"
+
+
+def split_floor(label):
+    """楼层标签 -> (楼宇, 楼层)；没有分隔符时整个标签为楼宇名、楼层为空"""
+    building, _, level = str(label).partition(FLOOR_SEPARATOR)
+    return building.strip(), level.strip()
+
+
+class FloorOverlay:
+    """楼宇门户覆盖图：cell[i] 为节点 i 所在楼宇的下标（室外为 -1）"""
+
+    def __init__(self, csr, buildings, cell, exits, trees):
+        self.csr = csr
+        self.buildings = buildings  # 楼宇下标 -> 楼宇名
+        self.cell = cell
+        self.exits = exits  # 门户 ID -> [(邻居 ID, 长度, 经过的楼宇下标或 -1)]：楼外的路径与楼内直达边
+        self.trees = trees  # 楼宇下标 -> (楼内节点 ID 数组, {门户 ID: 行号}, 楼内前驱矩阵)
+
+    @property
+    def num_portals(self):
+        return len(self.exits)
+
+    @classmethod
+    def build(cls, csr, floors):
+        """由 CSR 路网与 {景点: 楼层标签} 构建"""
+        n = csr.num_nodes
+        buildings = []
+        building_index = {}
+        cell = np.full(n, -1, dtype=np.int64)
+        for name, label in floors.items():
+            node = csr.index.get(name)
+            building = split_floor(label)[0]
+            if node is None or not building:
+                continue
+            if building not in building_index:
+                building_index[building] = len(buildings)
+                buildings.append(building)
+            cell[node] = building_index[building]
+
+        # 门户：有路径通往其他楼宇或室外的楼内节点
+        src = np.repeat(np.arange(n), np.diff(csr.offsets))
+        crossing = cell[src] != cell[csr.neighbors]
+        portal = np.zeros(n, dtype=bool)
+        portal[src[crossing & (cell[src] >= 0)]] = True
+
+        exits = {}
+        for i in np.flatnonzero(crossing & portal[src]).tolist():
+            exits.setdefault(int(src[i]), []).append((int(csr.neighbors[i]), float(csr.weights[i]), -1))
+        trees = {}
+        # 按楼宇分组，每栋楼只在其内部子图上从各门户做一次 Dijkstra（scipy 一次调用）
+        order = np.argsort(cell, kind="stable")
+        bounds = np.searchsorted(cell[order], np.arange(len(buildings) + 1))
+        for b in range(len(buildings)):
+            members = order[bounds[b]:bounds[b + 1]]
+            rows = np.flatnonzero(portal[members])
+            if len(rows) == 0:
+                continue
+            dist, pred = dijkstra(csr.matrix[members][:, members], directed=True, indices=rows,
+                                  return_predecessors=True)
+            gates = members[rows].tolist()
+            for k, p in enumerate(gates):
+                exits[p].extend((q, float(dist[k, rows[j]]), b) for j, q in enumerate(gates)
+                                if j != k and np.isfinite(dist[k, rows[j]]))
+            trees[b] = (members, {p: k for k, p in enumerate(gates)}, pred)
+        return cls(csr, buildings, cell.tolist(), exits, trees)
+
+    def query(self, source, target):
+        """返回 (路径 ID 列表, 总长度, 扩展节点数)；不可达时路径为 None
+
+        起点、终点所在楼宇与室外节点沿原始路径扩展，其他楼宇的门户只沿 exits 扩展。
+        """
+        offsets, neighbors, weights = self.csr.adjacency_lists()
+        cell, exits = self.cell, self.exits
+        inf = math.inf
+        open_cells = {cell[source], cell[target], -1}
+        dist = {source: 0.0}
+        pred = {source: (-1, -1)}
+        heap = [(0.0, source)]
+        expanded = 0
+        while heap:
+            d, x = heapq.heappop(heap)
+            if d > dist[x]:
+                continue
+            expanded += 1
+            if x == target:
+                break
+            if cell[x] in open_cells:
+                arcs = [(neighbors[i], weights[i], -1) for i in range(offsets[x], offsets[x + 1])]
+            else:
+                arcs = exits[x]
+            for y, w, via in arcs:
+                nd = d + w
+                if nd < dist.get(y, inf):
+                    dist[y] = nd
+                    pred[y] = (x, via)
+                    heapq.heappush(heap, (nd, y))
+        else:
+            return None, inf, expanded
+
+        path = [target]
+        x = target
+        while True:
+            prev, via = pred[x]
+            if prev == -1:
+                break
+            if via >= 0:
+                path.extend(self._inside(via, prev, x)[::-1][1:-1])
+            path.append(prev)
+            x = prev
+        path.reverse()
+        return path, dist[target], expanded
+
+    def _inside(self, b, p, q):
+        """楼宇 b 内门户 p 到 q 的最短路径（节点 ID 列表，含两端）"""
+        members, rows, pred = self.trees[b]
+        row = pred[rows[p]]
+        local = int(np.searchsorted(members, q))
+        path = []
+        while local >= 0:
+            path.append(int(members[local]))
+            local = row[local]
+        path.reverse()
+        return path
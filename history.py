@@ -0,0 +1,67 @@
+from collections import deque
+
+from profiling import profiler
+
+
+# 撤回/重做日志：每一步只记录本次编辑的正向操作与逆向操作，不复制整张地图
+# 操作的形式为 (方法名, 参数元组)，作用于路网引擎；引擎的编辑方法返回自身的逆向操作列表
+# 观察者（如 SQLite 地图存储）在每步编辑、撤回、重做之后收到本步实际执行的操作列表
+
+# 最多保留的撤回步数
+MAX_HISTORY = 5000
+
+
+class EditJournal:
+    """编辑日志：撤回栈与重做栈中每项为 (说明, 正向操作列表, 逆向操作列表)"""
+
+    def __init__(self, target, max_steps=MAX_HISTORY):
+        self.target = target
+        self.undo_stack = deque(maxlen=max_steps)
+        self.redo_stack = []
+        self.observers = []  # 回调函数 observer(ops)
+
+    def _apply(self, ops):
+        """依次执行操作并通知观察者，返回合并后的逆向操作（逆序排列）"""
+        inverses = [getattr(self.target, name)(*args) or [] for name, args in ops]
+        for observer in list(self.observers):
+            observer(ops)
+        return [op for inverse in reversed(inverses) for op in inverse]
+
+    def perform(self, label, *ops):
+        """执行一次编辑（可由多个操作组成）并记入日志"""
+        ops = list(ops)
+        with profiler.span("journal.perform", label=label):
+            inverse = self._apply(ops)
+        self.undo_stack.append((label, ops, inverse))
+        # 新的编辑使重做栈失效
+        self.redo_stack.clear()
+
+    def can_undo(self):
+        return bool(self.undo_stack)
+
+    def can_redo(self):
+        return bool(self.redo_stack)
+
+    def undo(self):
+        """撤回一步，返回该步的说明；没有可撤回的操作时返回 None"""
+        if not self.undo_stack:
+            return None
+        label, ops, inverse = self.undo_stack.pop()
+        with profiler.span("journal.undo", label=label):
+            self._apply(inverse)
+        self.redo_stack.append((label, ops, inverse))
+        return label
+
+    def redo(self):
+        """重做一步，返回该步的说明；没有可重做的操作时返回 None"""
+        if not self.redo_stack:
+            return None
+        label, ops, inverse = self.redo_stack.pop()
+        with profiler.span("journal.redo", label=label):
+            self._apply(ops)
+        self.undo_stack.append((label, ops, inverse))
+        return label
+
+    def clear(self):
+        self.undo_stack.clear()
+        self.redo_stack.clear()
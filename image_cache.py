@@ -0,0 +1,68 @@
+import glob
+import hashlib
+import os
+
+import numpy as np
+from PIL import Image
+
+
+# 底图缓存：缩放后的图片以 uint8 .npy 形式保存在磁盘上，启动时以内存映射方式读取
+# 缓存文件名包含目标尺寸和源文件哈希，源图片或尺寸变化时才重新缩放
+
+CACHE_DIR = ".map_cache"
+
+
+def _file_digest(path):
+    sha1 = hashlib.sha1()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            sha1.update(chunk)
+    return sha1.hexdigest()[:16]
+
+
+def load_resized_image(path, width, height, cache_dir=CACHE_DIR):
+    """返回缩放为 width×height 的图片数组（只读内存映射；缓存无法写入时返回内存中的数组）
+
+    缓存文件损坏或不完整时视为没有缓存：删除后由源图片重新生成。
+    """
+    stem = os.path.splitext(os.path.basename(path))[0]
+    prefix = os.path.join(cache_dir, f"{stem}_{width}x{height}_")
+    cache_path = prefix + _file_digest(path) + ".npy"
+
+    if os.path.exists(cache_path):
+        try:
+            return np.load(cache_path, mmap_mode="r")
+        except (OSError, ValueError, EOFError) as e:
+            print(f"读取底图缓存 {cache_path} 失败: {str(e)}，重新生成缓存。")
+            _remove_quietly(cache_path)
+
+    with Image.open(path) as img:
+        resized = np.asarray(img.resize((width, height), Image.LANCZOS), dtype=np.uint8)
+
+    # 先写临时文件再替换，避免中断时留下不完整的缓存
+    tmp_path = cache_path + ".tmp"
+    try:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(tmp_path, "wb") as f:
+            np.save(f, resized)
+        os.replace(tmp_path, cache_path)
+
+        # 清理同一图片、同一尺寸的旧缓存
+        for stale in glob.glob(glob.escape(prefix) + "*.npy"):
+            if stale != cache_path:
+                os.remove(stale)
+    except OSError as e:
+        # 目录只读、磁盘已满等：不使用缓存，仍然显示底图
+        print(f"写入底图缓存 {cache_path} 失败: {str(e)}")
+        if os.path.exists(tmp_path):
+            _remove_quietly(tmp_path)
+        return resized
+
+    return np.load(cache_path, mmap_mode="r")
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
@@ -0,0 +1,132 @@
+import json
+import os
+import struct
+
+import numpy as np
+import pandas as pd
+
+
+# 地图数据读写：每个 CSV 只读取一次，按列整体转换，不逐行遍历
+
+DEFAULT_INTRODUCTION = "暂无介绍信息"
+
+
+def read_nodes(path, default_intro=DEFAULT_INTRODUCTION):
+    """读取节点 CSV（name, x, y[, introduction | desc][, category][, floor]），
+    返回 (names, xs, ys, intros, categories, floors)
+
+    没有 category / floor 列或该列为空时类别 / 楼层为空字符串（楼层为空即室外节点）。
+    """
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    names = df["name"].tolist()
+    xs = df["x"].tolist()
+    ys = df["y"].tolist()
+    # 优先使用 'introduction' 列，其次 'desc'，都没有则使用默认介绍
+    if "introduction" in df.columns:
+        intros = df["introduction"].tolist()
+    elif "desc" in df.columns:
+        intros = df["desc"].tolist()
+    else:
+        intros = [default_intro] * len(names)
+    return names, xs, ys, intros, _string_column(df, "category"), _string_column(df, "floor")
+
+
+def _string_column(df, column):
+    """可选的字符串列：缺失或为空的项为空字符串"""
+    if column not in df.columns:
+        return [""] * len(df)
+    return df[column].fillna("").astype(str).str.strip().tolist()
+
+
+def read_edges(path):
+    """读取路径 CSV（x 起点, y 终点, length 长度），返回 (起点, 终点, 长度) 列表"""
+    df = pd.read_csv(path, encoding="utf-8-sig")
+    return list(zip(df["x"].tolist(), df["y"].tolist(), df["length"].tolist()))
+
+
+# ===== 二进制快照 =====
+# 文件布局：魔数(8 字节) + 头部长度(uint32) + JSON 头部 + 按 64 字节对齐的数组区
+# 数组区：节点名表、介绍表、类别表、楼层表（以 \0 分隔的 UTF-8 字节串）、坐标数组、路径端点 ID 与长度数组
+# 读取时整个文件以内存映射方式打开，数组直接引用映射区域，无需逐行解析
+
+SNAPSHOT_MAGIC = b"CNAVSNP1"
+SNAPSHOT_ALIGN = 64
+
+
+def csv_fingerprint(*paths):
+    """CSV 文件的 (大小, 修改时间)，用于判断快照是否过期；文件不存在时返回 None"""
+    try:
+        return [[os.path.getsize(p), os.stat(p).st_mtime_ns] for p in paths]
+    except OSError:
+        return None
+
+
+def _join_strings(values):
+    return "\0".join("" if isinstance(v, float) and np.isnan(v) else str(v) for v in values).encode("utf-8")
+
+
+STRING_SECTIONS = ("names", "intros", "categories", "floors")
+
+
+def save_snapshot(path, names, xs, ys, intros, edge_u, edge_v, edge_w, source=None, categories=None, floors=None):
+    """写入快照；edge_u / edge_v 为节点名表中的下标，无坐标节点的 x / y 为 NaN"""
+    if categories is None:
+        categories = [""] * len(names)
+    if floors is None:
+        floors = [""] * len(names)
+    arrays = {
+        "names": np.frombuffer(_join_strings(names), dtype=np.uint8),
+        "intros": np.frombuffer(_join_strings(intros), dtype=np.uint8),
+        "categories": np.frombuffer(_join_strings(categories), dtype=np.uint8),
+        "floors": np.frombuffer(_join_strings(floors), dtype=np.uint8),
+        "x": np.asarray(xs, dtype=np.float64),
+        "y": np.asarray(ys, dtype=np.float64),
+        "edge_u": np.asarray(edge_u, dtype=np.int32),
+        "edge_v": np.asarray(edge_v, dtype=np.int32),
+        "edge_w": np.asarray(edge_w, dtype=np.float64),
+    }
+    sections = {}
+    offset = 0
+    for key, arr in arrays.items():
+        sections[key] = {"dtype": arr.dtype.str, "length": len(arr), "offset": offset}
+        offset += -(-arr.nbytes // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+    header = json.dumps({"count": len(names), "source": source, "sections": sections}).encode("utf-8")
+    start = -(-(len(SNAPSHOT_MAGIC) + 4 + len(header)) // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+
+    # 先写临时文件再替换，避免中断时留下不完整的快照
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        f.write(SNAPSHOT_MAGIC)
+        f.write(struct.pack("<I", len(header)))
+        f.write(header)
+        for key, arr in arrays.items():
+            f.seek(start + sections[key]["offset"])
+            f.write(arr.tobytes())
+        f.truncate(start + offset)
+    os.replace(tmp_path, path)
+
+
+def read_snapshot_header(path):
+    with open(path, "rb") as f:
+        if f.read(len(SNAPSHOT_MAGIC)) != SNAPSHOT_MAGIC:
+            raise ValueError(f"{path} 不是地图快照文件")
+        (length,) = struct.unpack("<I", f.read(4))
+        return json.loads(f.read(length).decode("utf-8")), length
+
+
+def load_snapshot(path):
+    """读取快照，返回字典：names、intros、categories、floors 为字符串列表，其余为映射到文件的只读数组"""
+    header, length = read_snapshot_header(path)
+    start = -(-(len(SNAPSHOT_MAGIC) + 4 + length) // SNAPSHOT_ALIGN) * SNAPSHOT_ALIGN
+    data = np.memmap(path, dtype=np.uint8, mode="r")
+
+    result = {"source": header["source"]}
+    for key, section in header["sections"].items():
+        dtype = np.dtype(section["dtype"])
+        begin = start + section["offset"]
+        result[key] = data[begin:begin + section["length"] * dtype.itemsize].view(dtype)
+    count = header["count"]
+    for key in STRING_SECTIONS:
+        if key in result:
+            result[key] = result[key].tobytes().decode("utf-8").split("\0") if count else []
+    return result
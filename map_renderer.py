@@ -0,0 +1,317 @@
+import numpy as np
+from matplotlib.collections import LineCollection
+
+
+# 保留模式地图绘制：底图、路网、节点、标签只创建一次，之后只更新颜色、可见性与高亮图层
+# 静态图层渲染后缓存为位图，选中与路径等高亮图层通过 blitting 叠加绘制，点击时无需整图重绘
+# 多楼层地图中每个楼层的路径与节点各为一组图元，切换显示的楼层只改变可见性，不重建图元
+
+
+# 各图层的绘制次序（与原先逐层调用 networkx 绘图函数的先后一致）
+Z_BACKGROUND = 0
+Z_EDGES = 1
+Z_RESTRICTED = 1.05
+Z_SELECTED_EDGE = 1.1
+Z_ALTERNATIVES = 1.15
+Z_SHORTEST = 1.2
+Z_RECOMMENDED = 1.3
+Z_FACILITY = 1.4
+Z_NODES = 2
+Z_MARKERS = 2.1
+Z_LABELS = 3
+Z_EDGE_LABELS = 3.1
+
+NODE_STYLE = dict(s=300, c='#E0F7FA', edgecolors='#26A69A', linewidths=1, alpha=0.6)
+# 备选路线的颜色（依次使用，路线多于颜色数时循环）
+ALTERNATIVE_COLORS = ['#8E24AA', '#00897B', '#3949AB', '#6D4C41', '#C0CA33', '#D81B60']
+LABEL_STYLE = dict(fontsize=9, family="SimHei", fontweight='bold', ha='center', va='center', clip_on=True,
+                   bbox=dict(facecolor='white', edgecolor='none', alpha=0.7, pad=1.5))
+
+
+class MapRenderer:
+    """在给定 Axes 上维护地图的全部图元"""
+
+    def __init__(self, ax, width, height):
+        self.ax = ax
+        self.width = width
+        self.height = height
+
+        self.background = None
+        self.node_names = []  # 节点绘制顺序
+        self.node_index = {}
+        self.positions = {}
+        self.levels = {}  # 节点名 -> 楼层（室外节点不在其中）
+        self.shown_level = None  # 显示的楼层，None 表示全部
+        self.level_layers = {}  # 楼层 -> (路径线段集合, 节点散点)
+        self.connector_edges = []  # 跨楼层的路径（楼梯、电梯、出入口），两端都显示时才绘制
+        self.labels = {}  # 节点名 -> Text
+        self.edge_labels = []  # 路径权重标签（对象池，多余的隐藏）
+        self.overlay_labels = []  # 高亮图层上重绘的节点标签（对象池）
+        self.title = None
+
+        # 静态图层：路网、节点
+        self.edge_lines = self._add_lines('#666666', 1.5, 0.6, Z_EDGES)
+        self.nodes = ax.scatter(np.empty(0), np.empty(0), zorder=Z_NODES, **NODE_STYLE)
+        self.connector_lines = self._add_lines('#666666', 1.5, 0.6, Z_EDGES)
+        self.connector_lines.set_linestyle((0, (2, 2)))
+        # 临时封闭（红色虚线）与限时减速（琥珀色）的路径，属于静态图层
+        self.restricted_edges = ([], [])  # (封闭的路径, 减速的路径)
+        self.closed_lines = self._add_lines('#D32F2F', 3, 0.8, Z_RESTRICTED)
+        self.closed_lines.set_linestyle((0, (3, 2)))
+        self.slowed_lines = self._add_lines('#F9A825', 3, 0.8, Z_RESTRICTED)
+
+        # 高亮图层（animated，不参与整图绘制，由 blitting 叠加）
+        self.selected_edge_lines = self._add_lines('#9370DB', 3, 0.8, Z_SELECTED_EDGE)
+        self.shortest_lines = self._add_lines('#FF4500', 2.5, 0.9, Z_SHORTEST)
+        self.recommended_lines = self._add_lines('#FF4500', 3, 0.9, Z_RECOMMENDED)
+        self.facility_lines = self._add_lines('#1E88E5', 2.5, 0.9, Z_FACILITY)
+        self.alternative_lines = []  # 每条备选路线一个线段集合（对象池，多余的隐藏）
+        # 高亮路径经过的节点在路径之上重绘，保持原有的层次
+        self.path_nodes = ax.scatter(np.empty(0), np.empty(0), zorder=Z_NODES, animated=True, **NODE_STYLE)
+        self.start_marker = ax.scatter(np.empty(0), np.empty(0), s=400, c='#E8F5E9', edgecolors='#43A047',
+                                       linewidths=1.2, alpha=0.7, zorder=Z_MARKERS, animated=True)
+        self.end_marker = ax.scatter(np.empty(0), np.empty(0), s=400, c='#FFF3E0', edgecolors='#FB8C00',
+                                     linewidths=1.2, alpha=0.7, zorder=Z_MARKERS, animated=True)
+        for lines in (self.selected_edge_lines, self.shortest_lines, self.recommended_lines, self.facility_lines):
+            lines.set_animated(True)
+
+        # blitting：静态图层位图缓存，整图重绘（缩放、平移、窗口大小变化）后自动更新
+        self.static_image = None
+        self.static_dirty = True
+        self.canvas = ax.figure.canvas
+        self.canvas.mpl_connect('draw_event', self._on_draw)
+
+        # 坐标轴只设置一次
+        ax.set_xlim(0, width)
+        ax.set_ylim(height, 0)
+        ax.spines['top'].set_visible(False)
+        ax.spines['right'].set_visible(False)
+        # 与 networkx 绘图函数的默认行为一致：隐藏刻度
+        ax.tick_params(axis='both', which='both', bottom=False, left=False,
+                       labelbottom=False, labelleft=False, labelsize=9)
+
+    def _add_lines(self, color, width, alpha, zorder):
+        lines = LineCollection([], colors=color, linewidths=width, alpha=alpha, zorder=zorder)
+        self.ax.add_collection(lines)
+        return lines
+
+    # ===== 静态图层 =====
+    def set_background(self, image):
+        """设置底图（仅在图片变化时调用）"""
+        if self.background is not None:
+            self.background.remove()
+            self.background = None
+        if image is not None:
+            self.background = self.ax.imshow(image, extent=[0, self.width, self.height, 0],
+                                             aspect='auto', alpha=0.9, zorder=Z_BACKGROUND)
+            # imshow 会改动坐标范围，恢复为地图尺寸
+            self.ax.set_xlim(0, self.width)
+            self.ax.set_ylim(self.height, 0)
+        self.static_dirty = True
+
+    def set_graph(self, positions, edges, levels=None):
+        """路网结构或坐标变化后更新路网、节点与标签图元；levels 为 {节点名: 楼层}，室外节点不在其中"""
+        self.positions = dict(positions)
+        self.node_names = list(self.positions)
+        self.node_index = {name: i for i, name in enumerate(self.node_names)}
+        self.levels = {name: level for name, level in (levels or {}).items() if level and name in self.positions}
+
+        # 两端在同一楼层（或都在室外）的路径归入该楼层，其余为跨楼层路径
+        layer_edges = {}
+        self.connector_edges = []
+        for u, v in edges:
+            level = self.levels.get(u, "")
+            if level == self.levels.get(v, ""):
+                layer_edges.setdefault(level, []).append((u, v))
+            else:
+                self.connector_edges.append((u, v))
+        layer_nodes = {}
+        for name in self.node_names:
+            layer_nodes.setdefault(self.levels.get(name, ""), []).append(self.positions[name])
+
+        for level in list(self.level_layers):
+            if level not in layer_nodes and level not in layer_edges:
+                for artist in self.level_layers.pop(level):
+                    artist.remove()
+        for level in dict.fromkeys([""] + list(layer_nodes) + list(layer_edges)):
+            if level:
+                if level not in self.level_layers:
+                    self.level_layers[level] = (
+                        self._add_lines('#666666', 1.5, 0.6, Z_EDGES),
+                        self.ax.scatter(np.empty(0), np.empty(0), zorder=Z_NODES, **NODE_STYLE))
+                lines, nodes = self.level_layers[level]
+            else:
+                lines, nodes = self.edge_lines, self.nodes
+            lines.set_segments(self._segments(layer_edges.get(level, [])))
+            points = layer_nodes.get(level)
+            nodes.set_offsets(np.array(points, dtype=float) if points else np.empty((0, 2)))
+
+        # 标签：复用已有 Text，只增删变化的部分
+        for name in list(self.labels):
+            if name not in self.positions:
+                self.labels.pop(name).remove()
+        for name, (x, y) in self.positions.items():
+            label = self.labels.get(name)
+            if label is None:
+                self.labels[name] = self.ax.text(x, y, name, zorder=Z_LABELS, **LABEL_STYLE)
+            else:
+                label.set_position((x, y))
+        self._apply_level()
+
+    def show_level(self, level):
+        """只显示室外与指定楼层（None 表示全部楼层）；只改变各楼层图元的可见性"""
+        if level != self.shown_level:
+            self.shown_level = level
+            self._apply_level()
+
+    def visible(self, name):
+        """节点当前是否显示"""
+        level = self.levels.get(name)
+        return level is None or self.shown_level is None or level == self.shown_level
+
+    def _apply_level(self):
+        for level, artists in self.level_layers.items():
+            for artist in artists:
+                artist.set_visible(self.shown_level is None or level == self.shown_level)
+        for name, level in self.levels.items():
+            self.labels[name].set_visible(self.shown_level is None or level == self.shown_level)
+        self.connector_lines.set_segments(self._segments(
+            [(u, v) for u, v in self.connector_edges if self.visible(u) and self.visible(v)]))
+        self._apply_restrictions()
+        self.static_dirty = True
+
+    def set_restrictions(self, closed, slowed):
+        """更新临时封闭与限时减速的路径（规则生效或失效时调用）"""
+        self.restricted_edges = (list(closed), list(slowed))
+        self._apply_restrictions()
+        self.static_dirty = True
+
+    def _apply_restrictions(self):
+        for lines, edges in zip((self.closed_lines, self.slowed_lines), self.restricted_edges):
+            lines.set_segments(self._segments([(u, v) for u, v in edges if self.visible(u) and self.visible(v)]))
+
+    def _segments(self, edges):
+        """(u, v) 序列转换为线段坐标；缺少坐标的边跳过"""
+        positions = self.positions
+        return [(positions[u], positions[v]) for u, v in edges if u in positions and v in positions]
+
+    # ===== 动态图层 =====
+    def set_overlays(self, selected_nodes, selected_edge, shortest_path, recommended_path, weight_of,
+                     facility_paths=(), alternative_paths=()):
+        """更新选中节点、选中边、最短路径、推荐路线、最近设施路径与备选路线；weight_of(u, v) 返回路径长度"""
+        self._set_marker(self.start_marker, selected_nodes[0] if selected_nodes else None)
+        self._set_marker(self.end_marker, selected_nodes[1] if len(selected_nodes) > 1 else None)
+
+        self.selected_edge_lines.set_segments(self._segments([selected_edge] if selected_edge else []))
+        shortest_edges = list(zip(shortest_path[:-1], shortest_path[1:]))
+        recommended_edges = list(zip(recommended_path[:-1], recommended_path[1:]))
+        self.shortest_lines.set_segments(self._segments(shortest_edges))
+        self.recommended_lines.set_segments(self._segments(recommended_edges))
+        # 多条设施路径共享起点，公共路段只画一次、只标注一次长度
+        facility_edges = list(dict.fromkeys(edge for path in facility_paths for edge in zip(path[:-1], path[1:])))
+        self.facility_lines.set_segments(self._segments(facility_edges))
+        self._set_alternatives(alternative_paths)
+
+        # 高亮路径经过的节点及选中节点：在路径之上重绘节点与标签
+        covered = list(dict.fromkeys(
+            [name for name in list(shortest_path) + list(recommended_path) + list(selected_edge or ())
+             + [name for path in list(facility_paths) + list(alternative_paths) for name in path]
+             if name in self.positions] +
+            [name for name in selected_nodes if name in self.positions]))
+        path_names = [name for name in covered if name not in selected_nodes]
+        self.path_nodes.set_offsets(np.array([self.positions[name] for name in path_names], dtype=float)
+                                    if path_names else np.empty((0, 2)))
+        self._set_overlay_labels(covered)
+
+        self._set_edge_labels([(u, v, weight_of(u, v)) for u, v in shortest_edges + recommended_edges + facility_edges])
+
+    def _set_alternatives(self, paths):
+        """备选路线各用一种颜色的虚线绘制，位于最短路径之下"""
+        while len(self.alternative_lines) < len(paths):
+            color = ALTERNATIVE_COLORS[len(self.alternative_lines) % len(ALTERNATIVE_COLORS)]
+            lines = self._add_lines(color, 2.5, 0.8, Z_ALTERNATIVES)
+            lines.set_linestyle((0, (4, 2)))
+            lines.set_animated(True)
+            self.alternative_lines.append(lines)
+        for lines, path in zip(self.alternative_lines, paths):
+            lines.set_segments(self._segments(list(zip(path[:-1], path[1:]))))
+            lines.set_visible(True)
+        for lines in self.alternative_lines[len(paths):]:
+            lines.set_visible(False)
+
+    def _set_overlay_labels(self, names):
+        while len(self.overlay_labels) < len(names):
+            self.overlay_labels.append(self.ax.text(0, 0, "", zorder=Z_LABELS, animated=True, **LABEL_STYLE))
+        for label, name in zip(self.overlay_labels, names):
+            label.set_position(self.positions[name])
+            label.set_text(name)
+            label.set_visible(True)
+        for label in self.overlay_labels[len(names):]:
+            label.set_visible(False)
+
+    def _set_marker(self, marker, name):
+        if name is not None and name in self.positions:
+            marker.set_offsets([self.positions[name]])
+        else:
+            marker.set_offsets(np.empty((0, 2)))
+
+    def _set_edge_labels(self, labelled_edges):
+        """在路径中点显示长度，文字方向与路径一致"""
+        labelled_edges = [(u, v, w) for u, v, w in labelled_edges if u in self.positions and v in self.positions]
+        while len(self.edge_labels) < len(labelled_edges):
+            self.edge_labels.append(self.ax.text(
+                0, 0, "", fontsize=8, family="SimHei", ha='center', va='center',
+                rotation_mode='anchor', zorder=Z_EDGE_LABELS, clip_on=True, animated=True,
+                bbox=dict(facecolor='white', edgecolor='none', alpha=0.8, pad=1)))
+
+        for label, (u, v, weight) in zip(self.edge_labels, labelled_edges):
+            (x1, y1), (x2, y2) = self.positions[u], self.positions[v]
+            mid = np.array([[(x1 + x2) / 2, (y1 + y2) / 2]])
+            angle = self.ax.transData.transform_angles(
+                np.array([np.degrees(np.arctan2(y2 - y1, x2 - x1))]), mid)[0]
+            # 保持文字正向
+            if angle > 90:
+                angle -= 180
+            elif angle < -90:
+                angle += 180
+            label.set_position(mid[0])
+            label.set_rotation(angle)
+            label.set_text(f"{weight}m")
+            label.set_visible(True)
+        for label in self.edge_labels[len(labelled_edges):]:
+            label.set_visible(False)
+
+    def set_title(self, title):
+        if title != self.title:
+            self.title = title
+            self.ax.set_title(title, fontsize=14, fontweight='bold', pad=10)
+            self.static_dirty = True
+
+    # ===== 刷新 =====
+    def overlay_artists(self):
+        """按绘制次序返回高亮图层的图元"""
+        return ([self.selected_edge_lines]
+                + [lines for lines in self.alternative_lines if lines.get_visible()]
+                + [self.shortest_lines, self.recommended_lines, self.facility_lines,
+                   self.path_nodes, self.start_marker, self.end_marker]
+                + [label for label in self.overlay_labels if label.get_visible()]
+                + [label for label in self.edge_labels if label.get_visible()])
+
+    def _on_draw(self, event):
+        """整图绘制完成：缓存静态图层位图，再叠加高亮图层"""
+        self.static_image = self.canvas.copy_from_bbox(self.ax.figure.bbox)
+        self.static_dirty = False
+        self._draw_overlays()
+
+    def _draw_overlays(self):
+        for artist in self.overlay_artists():
+            self.ax.draw_artist(artist)
+
+    def refresh(self):
+        """静态图层有变化时整图重绘，否则恢复缓存位图并只绘制高亮图层"""
+        if self.static_dirty or self.static_image is None:
+            self.canvas.draw_idle()
+            return
+        self.canvas.restore_region(self.static_image)
+        self._draw_overlays()
+        self.canvas.blit(self.ax.figure.bbox)
@@ -0,0 +1,174 @@
+import argparse
+import os
+import sqlite3
+import threading
+
+from profiling import profiler
+from routing_engine import RoutingEngine, edge_key
+
+
+# SQLite 地图存储（可选）：节点、路径、介绍保存在单个数据库文件中，作为编辑的工作副本
+# 撤回日志每执行一步（编辑、撤回、重做）就在一个小事务中写入受影响的行：景点编辑只改写该景点及其相连的路径，
+# 路径编辑只改写该路径，写入量与编辑大小成正比，与地图规模无关；已提交的编辑在程序崩溃后不会丢失。
+# 导入数据等整体替换地图的操作整表重写。CSV 仍是交换格式：可由 CSV 初始化数据库，也可把数据库导出为 CSV。
+#
+# 用法：python map_store.py import node.csv edge.csv --db map.db
+#       python map_store.py export node_new.csv edge_new.csv --db map.db
+
+# 以下操作整体替换地图数据，整表重写
+BULK_OPS = {"replace_data", "merge_data", "revert_merge"}
+# 以下操作的前两个参数为路径两端，只改写该路径
+EDGE_OPS = {"add_edge", "edit_edge", "delete_edge"}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS nodes (
+    name TEXT PRIMARY KEY,
+    x, y,
+    introduction,  -- NULL 表示没有介绍
+    category TEXT NOT NULL DEFAULT '',
+    floor TEXT NOT NULL DEFAULT ''
+);
+CREATE TABLE IF NOT EXISTS edges (
+    a TEXT NOT NULL,  -- edge_key 排序后的两端，作为主键
+    b TEXT NOT NULL,
+    u TEXT NOT NULL,  -- 原始方向的两端（导出 CSV 时保持原样）
+    v TEXT NOT NULL,
+    length,
+    PRIMARY KEY (a, b)
+);
+CREATE INDEX IF NOT EXISTS edges_b ON edges (b);
+"""
+
+
+def _plain(value):
+    """NumPy 标量转为 Python 内置类型（sqlite3 不接受 numpy.int64 等）"""
+    return value.item() if hasattr(value, "item") else value
+
+
+class MapStore:
+    """SQLite 地图数据库；连接可在后台任务线程中使用（由锁串行化）"""
+
+    def __init__(self, path):
+        self.path = path
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        # WAL 模式：每次提交只追加写入改动的页；程序崩溃后下次打开时自动恢复到最后一次提交
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+        self.lock = threading.Lock()
+        self.writes = 0  # 已提交的事务数
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def is_empty(self):
+        with self.lock:
+            return self.conn.execute("SELECT NOT EXISTS (SELECT 1 FROM nodes)").fetchone()[0] == 1
+
+    def read(self):
+        """返回 (坐标字典, 介绍字典, 路径列表, 类别字典, 楼层字典)，与 RoutingEngine.read_import 相同"""
+        with self.lock:
+            nodes = self.conn.execute(
+                "SELECT name, x, y, introduction, category, floor FROM nodes ORDER BY rowid").fetchall()
+            paths = self.conn.execute("SELECT u, v, length FROM edges ORDER BY rowid").fetchall()
+        locations = {name: (x, y) for name, x, y, _, _, _ in nodes}
+        introductions = {name: intro for name, _, _, intro, _, _ in nodes if intro is not None}
+        categories = {name: category for name, _, _, _, category, _ in nodes if category}
+        floors = {name: floor for name, _, _, _, _, floor in nodes if floor}
+        return locations, introductions, paths, categories, floors
+
+    def write_all(self, engine):
+        """整表重写为 engine 的当前地图（初始化或导入时使用）"""
+        with profiler.span("store.write_all", nodes=len(engine.locations)), self.lock, self.conn:
+            self._write_all(engine)
+            self.writes += 1
+
+    def record(self, engine, ops):
+        """撤回日志的观察者：在一个事务中写入 ops 涉及的景点与路径在 engine 中的当前状态"""
+        nodes = set()
+        edges = set()
+        bulk = False
+        for name, args in ops:
+            if name in BULK_OPS:
+                bulk = True
+            elif name in EDGE_OPS:
+                edges.add(edge_key(args[0], args[1]))
+            elif name == "rename_node":
+                nodes.update(args[:2])
+            else:
+                nodes.add(args[0])
+
+        with profiler.span("store.record", nodes=len(nodes), edges=len(edges), bulk=bulk), self.lock, self.conn:
+            if bulk:
+                self._write_all(engine)
+            else:
+                for name in nodes:
+                    self._write_node(engine, name)
+                for a, b in edges:
+                    self._write_edge(engine, a, b)
+            self.writes += 1
+
+    def _write_all(self, engine):
+        self.conn.execute("DELETE FROM nodes")
+        self.conn.execute("DELETE FROM edges")
+        self.conn.executemany("INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?)", (
+            (name, _plain(x), _plain(y), engine.introductions.get(name), engine.categories.get(name, ""),
+             engine.floors.get(name, "")) for name, (x, y) in engine.locations.items()))
+        self.conn.executemany("INSERT INTO edges VALUES (?, ?, ?, ?, ?)", (
+            key + (u, v, _plain(w)) for key, (u, v, w) in engine.edges.items()))
+
+    def _write_node(self, engine, name):
+        """写入景点及其相连的全部路径（景点已删除时一并删除）"""
+        if name in engine.locations:
+            x, y = engine.locations[name]
+            self.conn.execute(
+                "INSERT INTO nodes VALUES (?, ?, ?, ?, ?, ?) ON CONFLICT (name) DO UPDATE SET "
+                "x = excluded.x, y = excluded.y, introduction = excluded.introduction, "
+                "category = excluded.category, floor = excluded.floor",
+                (name, _plain(x), _plain(y), engine.introductions.get(name), engine.categories.get(name, ""),
+                 engine.floors.get(name, "")))
+        else:
+            self.conn.execute("DELETE FROM nodes WHERE name = ?", (name,))
+        self.conn.execute("DELETE FROM edges WHERE a = ? OR b = ?", (name, name))
+        if name in engine.locations:
+            incident = [engine.edges[edge_key(name, other)] for other in engine.G[name]]
+            self.conn.executemany("INSERT INTO edges VALUES (?, ?, ?, ?, ?)",
+                                  (edge_key(u, v) + (u, v, _plain(w)) for u, v, w in incident))
+
+    def _write_edge(self, engine, a, b):
+        edge = engine.edges.get((a, b))
+        if edge is None:
+            self.conn.execute("DELETE FROM edges WHERE a = ? AND b = ?", (a, b))
+        else:
+            u, v, w = edge
+            self.conn.execute("INSERT INTO edges VALUES (?, ?, ?, ?, ?) ON CONFLICT (a, b) DO UPDATE SET "
+                              "u = excluded.u, v = excluded.v, length = excluded.length", (a, b, u, v, _plain(w)))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite 地图数据库与 CSV 互相转换")
+    parser.add_argument("command", choices=["import", "export"], help="import：CSV 写入数据库；export：数据库导出为 CSV")
+    parser.add_argument("node_csv")
+    parser.add_argument("edge_csv")
+    parser.add_argument("--db", default="map.db", help="数据库文件")
+    args = parser.parse_args()
+
+    if args.command == "import":
+        engine = RoutingEngine(args.node_csv, args.edge_csv)
+        store = MapStore(args.db)
+        store.write_all(engine)
+        print(f"已写入 {args.db}：景点 {len(engine.locations)} 个，路径 {len(engine.edges)} 条")
+    else:
+        if not os.path.exists(args.db):
+            parser.error(f"数据库 {args.db} 不存在")
+        store = MapStore(args.db)
+        engine = RoutingEngine(None)
+        engine.replace_data(*store.read(), add_defaults=False)
+        engine.save_csv(args.node_csv, args.edge_csv)
+        print(f"已导出 {args.node_csv}、{args.edge_csv}：景点 {len(engine.locations)} 个，路径 {len(engine.edges)} 条")
+    store.close()
+
+
+if __name__ == "__main__":
+    main()
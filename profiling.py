@@ -0,0 +1,140 @@
+import functools
+import json
+import os
+import threading
+import time
+from collections import deque
+
+
+# 性能剖析：在界面操作、后台任务与编辑日志上记录耗时区间（span），
+# 调试面板中按名称汇总查看，也可导出为 Chrome trace-event JSON（chrome://tracing 或 Perfetto 打开），
+# 用于区分“地图卡顿”究竟来自绘制、路径计算还是文件读写
+# 未启用时 span() 直接返回同一个空上下文管理器、traced() 包装的函数直接调用原函数，开销只有一次属性判断
+#
+# 用法：
+#     from profiling import profiler
+#     with profiler.span("route.search", method="astar"):
+#         ...
+# 设置环境变量 CAMPUS_PROFILE=1 时启动即开始记录（可记录启动各阶段）
+
+# 最多保留的区间数，超出后丢弃最早的记录
+MAX_SPANS = 100000
+
+
+class _NullSpan:
+    """未启用时使用的空区间"""
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+
+_NULL_SPAN = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "args", "begin")
+
+    def __init__(self, profiler, name, args):
+        self.profiler = profiler
+        self.name = name
+        self.args = args
+
+    def __enter__(self):
+        self.begin = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, *exc):
+        self.profiler._record(self.name, self.begin, time.perf_counter_ns() - self.begin, self.args)
+        return False
+
+
+class Profiler:
+    """区间记录器：spans 中每项为 (名称, 开始时刻 ns, 时长 ns, 线程 ID, 参数字典)"""
+
+    def __init__(self, enabled=False, max_spans=MAX_SPANS):
+        self.enabled = enabled
+        self.spans = deque(maxlen=max_spans)
+        self.recorded = 0  # 累计记录数，面板据此判断是否需要刷新
+        self.origin = time.perf_counter_ns()
+        self.thread_names = {}
+        self._lock = threading.Lock()
+
+    def span(self, name, **args):
+        """with profiler.span(名称, **参数): ... 记录一段耗时"""
+        if not self.enabled:
+            return _NULL_SPAN
+        return _Span(self, name, args)
+
+    def traced(self, name):
+        """装饰器：记录每次调用的耗时"""
+        def decorate(fn):
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return fn(*args, **kwargs)
+                with _Span(self, name, {}):
+                    return fn(*args, **kwargs)
+            return wrapper
+        return decorate
+
+    def _record(self, name, begin, duration, args):
+        thread = threading.current_thread()
+        with self._lock:
+            self.thread_names.setdefault(thread.ident, thread.name)
+            self.spans.append((name, begin, duration, thread.ident, args))
+            self.recorded += 1
+
+    def clear(self):
+        with self._lock:
+            self.spans.clear()
+            self.recorded += 1
+
+    def summary(self):
+        """按名称汇总：[(名称, 次数, 合计 ms, 平均 ms, 最大 ms, 最近一次 ms)]，按合计耗时降序"""
+        with self._lock:
+            spans = list(self.spans)
+        totals = {}
+        for name, _, duration, _, _ in spans:
+            entry = totals.get(name)
+            if entry is None:
+                totals[name] = [1, duration, duration, duration]
+            else:
+                entry[0] += 1
+                entry[1] += duration
+                entry[2] = max(entry[2], duration)
+                entry[3] = duration
+        rows = [(name, count, total / 1e6, total / count / 1e6, longest / 1e6, last / 1e6)
+                for name, (count, total, longest, last) in totals.items()]
+        rows.sort(key=lambda row: row[2], reverse=True)
+        return rows
+
+    def chrome_trace(self):
+        """Chrome trace-event 格式的字典（时间单位为微秒，每个区间一个 "X" 事件）"""
+        with self._lock:
+            spans = list(self.spans)
+            thread_names = dict(self.thread_names)
+        pid = os.getpid()
+        events = [{"name": "process_name", "ph": "M", "pid": pid, "args": {"name": "校园导航系统"}}]
+        events += [{"name": "thread_name", "ph": "M", "pid": pid, "tid": tid, "args": {"name": name}}
+                   for tid, name in thread_names.items()]
+        events += [{"name": name, "cat": name.split(".", 1)[0], "ph": "X", "pid": pid, "tid": tid,
+                    "ts": (begin - self.origin) / 1000, "dur": duration / 1000, "args": args}
+                   for name, begin, duration, tid, args in spans]
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def export_chrome_trace(self, path):
+        """写出 Chrome trace-event JSON 文件，返回导出的区间数"""
+        trace = self.chrome_trace()
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(trace, f, ensure_ascii=False, default=str)
+        os.replace(tmp_path, path)
+        return sum(1 for event in trace["traceEvents"] if event["ph"] == "X")
+
+
+# 全局记录器：各模块共用，调试面板可随时开关
+profiler = Profiler(enabled=bool(os.environ.get("CAMPUS_PROFILE")))
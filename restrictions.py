@@ -0,0 +1,89 @@
+import json
+import math
+from datetime import datetime
+
+
+# 临时封闭与限时减速：活动、施工期间某些路径暂时不可通行，或在某个时段内通行变慢（长度乘以系数）
+# 每条规则作用于一条路径、在 [开始, 结束) 时段内生效（时间为时间戳，None 表示不限）；
+# 同一路径上同时生效的规则系数相乘，封闭规则生效时路径不可通行。规则不修改路网数据，也不记入撤回日志。
+# 路网引擎在生效的规则变化时只修补受影响的查询结构（见 RoutingEngine.refresh_restrictions）
+
+# 封闭路径的系数
+CLOSED = math.inf
+
+
+class Restriction:
+    """一条规则：edge 为 edge_key 规范化的路径两端"""
+
+    def __init__(self, edge, factor=CLOSED, start=None, end=None, note=""):
+        self.edge = edge
+        self.factor = factor
+        self.start = start
+        self.end = end
+        self.note = note
+
+    @property
+    def closed(self):
+        return self.factor == CLOSED
+
+    def active(self, now):
+        return (self.start is None or self.start <= now) and (self.end is None or now < self.end)
+
+
+class RestrictionSet:
+    """全部规则及当前生效的合计系数"""
+
+    def __init__(self):
+        self.rules = {}  # 规则 ID -> Restriction
+        self.active = {}  # 路径 -> 生效中的合计系数（没有生效规则的路径不在其中）
+        self._next_id = 1
+
+    def __len__(self):
+        return len(self.rules)
+
+    def add(self, rule):
+        rule_id = self._next_id
+        self._next_id += 1
+        self.rules[rule_id] = rule
+        return rule_id
+
+    def remove(self, rule_id):
+        return self.rules.pop(rule_id)
+
+    def factors(self, now):
+        """now 时刻各路径的合计系数"""
+        factors = {}
+        for rule in self.rules.values():
+            if rule.active(now):
+                factors[rule.edge] = factors.get(rule.edge, 1.0) * rule.factor
+        return factors
+
+    def next_change(self, now):
+        """now 之后最近一次有规则开始或结束的时刻；没有时返回 None"""
+        times = [t for rule in self.rules.values() for t in (rule.start, rule.end) if t is not None and t > now]
+        return min(times) if times else None
+
+    def update(self, now):
+        """按 now 时刻重新计算生效的系数，返回 {路径: (原系数, 新系数)}，只含有变化的路径"""
+        factors = self.factors(now)
+        changes = {edge: (self.active.get(edge, 1.0), factor) for edge, factor in factors.items()
+                   if self.active.get(edge, 1.0) != factor}
+        changes.update((edge, (factor, 1.0)) for edge, factor in self.active.items() if edge not in factors)
+        self.active = factors
+        return changes
+
+
+def _timestamp(text):
+    return None if text in (None, "") else datetime.fromisoformat(text).timestamp()
+
+
+def read_restrictions(path):
+    """读取规则文件，返回 [(起点, 终点, 系数, 开始时间戳, 结束时间戳, 说明)]
+
+    文件为 JSON 列表，每项形如 {"from": "青蓝门", "to": "图书馆", "factor": 2, "start": "2025-12-20T08:00",
+    "end": "2025-12-20T12:00", "note": "运动会"}；省略 factor 表示封闭，省略 start / end 表示不限。
+    """
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    return [(entry["from"], entry["to"], float(entry.get("factor", CLOSED)), _timestamp(entry.get("start")),
+             _timestamp(entry.get("end")), entry.get("note", "")) for entry in entries]
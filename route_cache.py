@@ -0,0 +1,76 @@
+import threading
+from collections import OrderedDict
+
+
+# 路径结果缓存：(起点, 终点, 搜索方式) -> (路径, 长度) 的 LRU 缓存
+# 导览机上的查询集中在少数热门起终点（校门到图书馆、食堂、宿舍），重复查询直接返回，不访问路网。
+# 缓存以路网版本号为标记：路网引擎的任何编辑都会递增版本号，版本变化后的第一次访问清空全部缓存项。
+
+# 默认最多缓存的查询结果数
+ROUTE_CACHE_SIZE = 256
+
+
+class RouteCache:
+    """有界 LRU 缓存，带命中 / 未命中 / 淘汰 / 失效统计；可被路由服务的多个线程同时使用"""
+
+    def __init__(self, capacity=ROUTE_CACHE_SIZE):
+        self.capacity = capacity
+        self.version = None  # 缓存内容对应的路网版本
+        self._entries = OrderedDict()  # 键 -> (路径, 长度)，最近使用的在末尾
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0  # 因容量不足淘汰的缓存项
+        self.invalidations = 0  # 因路网变化清空缓存的次数
+
+    def __len__(self):
+        return len(self._entries)
+
+    def _check_version(self, version):
+        if version != self.version:
+            if self._entries:
+                self._entries.clear()
+                self.invalidations += 1
+            self.version = version
+
+    def get(self, key, version):
+        """返回缓存的 (路径, 长度)；没有或已过期时返回 None"""
+        with self._lock:
+            self._check_version(version)
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+    def put(self, key, version, path, length):
+        if self.capacity <= 0:
+            return
+        with self._lock:
+            self._check_version(version)
+            self._entries[key] = (tuple(path), length)
+            self._entries.move_to_end(key)
+            if len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def discard(self, predicate):
+        """删除 predicate(路径) 为真的缓存项，返回删除的项数"""
+        with self._lock:
+            stale = [key for key, (path, _) in self._entries.items() if predicate(path)]
+            for key in stale:
+                del self._entries[key]
+        return len(stale)
+
+    def stats(self):
+        """统计信息字典"""
+        lookups = self.hits + self.misses
+        return {"size": len(self._entries), "capacity": self.capacity, "hits": self.hits, "misses": self.misses,
+                "evictions": self.evictions, "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else None}
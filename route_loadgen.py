@@ -0,0 +1,111 @@
+import argparse
+import http.client
+import json
+import random
+import threading
+import time
+from urllib.parse import quote, urlparse
+
+import numpy as np
+
+
+# 路由服务压测工具：多个并发客户端（每个一个长连接）随机请求最短路径，统计吞吐量与延迟分位数
+#
+# 用法：python route_loadgen.py --url http://127.0.0.1:8000 --concurrency 16 --duration 10
+
+
+def _get(conn, path):
+    conn.request("GET", path)
+    response = conn.getresponse()
+    body = response.read()
+    return response.status, body
+
+
+def _client(host, port, paths, deadline, max_requests, latencies, errors, seed):
+    rng = random.Random(seed)
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    count = 0
+    try:
+        while time.perf_counter() < deadline and (max_requests is None or count < max_requests):
+            path = rng.choice(paths)
+            begin = time.perf_counter()
+            try:
+                status, _ = _get(conn, path)
+            except (OSError, http.client.HTTPException):
+                errors.append(path)
+                conn.close()
+                conn = http.client.HTTPConnection(host, port, timeout=30)
+                continue
+            latencies.append(time.perf_counter() - begin)
+            if status >= 500:
+                errors.append(path)
+            count += 1
+    finally:
+        conn.close()
+
+
+def run(url, concurrency=8, duration=10.0, requests=None, endpoint="route", method="dijkstra", seed=0):
+    """压测 url 上的路由服务，返回统计结果字典
+
+    requests 给定时每个客户端发送该数量的请求（不受 duration 限制）。
+    """
+    parsed = urlparse(url)
+    host, port = parsed.hostname, parsed.port or 80
+
+    # 从服务端取景点列表，预先生成请求路径
+    conn = http.client.HTTPConnection(host, port, timeout=30)
+    status, body = _get(conn, "/nodes")
+    conn.close()
+    if status != 200:
+        raise RuntimeError(f"获取景点列表失败: HTTP {status}")
+    nodes = json.loads(body)["nodes"]
+    rng = random.Random(seed)
+    paths = [f"/{endpoint}?from={quote(a)}&to={quote(b)}&method={method}"
+             for a, b in (rng.sample(nodes, 2) for _ in range(1000))]
+
+    latencies = []  # list.append 在多线程下是原子的
+    errors = []
+    deadline = time.perf_counter() + (duration if requests is None else float("inf"))
+    threads = [threading.Thread(target=_client,
+                                args=(host, port, paths, deadline, requests, latencies, errors, seed + i))
+               for i in range(concurrency)]
+    begin = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - begin
+
+    result = {"url": url, "endpoint": endpoint, "method": method, "concurrency": concurrency,
+              "requests": len(latencies), "errors": len(errors), "seconds": elapsed,
+              "throughput": len(latencies) / elapsed if elapsed > 0 else 0.0}
+    if latencies:
+        ms = np.array(latencies) * 1000
+        result.update(p50_ms=float(np.percentile(ms, 50)), p99_ms=float(np.percentile(ms, 99)),
+                      max_ms=float(ms.max()))
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校园路由服务压测")
+    parser.add_argument("--url", default="http://127.0.0.1:8000")
+    parser.add_argument("--concurrency", type=int, default=8, help="并发客户端数")
+    parser.add_argument("--duration", type=float, default=10.0, help="压测时长（秒）")
+    parser.add_argument("--requests", type=int, default=None, help="每个客户端的请求数（给定时忽略 --duration）")
+    parser.add_argument("--endpoint", default="route", choices=["route", "length"])
+    parser.add_argument("--method", default="dijkstra")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    result = run(args.url, args.concurrency, args.duration, args.requests, args.endpoint, args.method)
+    if args.json:
+        print(json.dumps(result, ensure_ascii=False, indent=2))
+        return
+    print(f"请求数: {result['requests']}  错误: {result['errors']}  耗时: {result['seconds']:.2f} 秒")
+    print(f"吞吐量: {result['throughput']:.1f} 请求/秒")
+    if result["requests"]:
+        print(f"延迟: p50 {result['p50_ms']:.2f} ms  p99 {result['p99_ms']:.2f} ms  最大 {result['max_ms']:.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+import networkx as nx
+
+from restrictions import CLOSED, read_restrictions
+from routing_engine import RoutingEngine, RECOMMENDED_ROUTES, SEARCH_METHODS, format_length
+
+
+# 校园路由 HTTP 服务：启动时加载一次路网，之后以 JSON 形式提供查询（仅依赖标准库与路网引擎）
+#
+#   GET /route?from=青蓝门&to=图书馆[&method=astar]   最短路径（与界面“计算最短路径”一致；method=ch 使用收缩层次）
+#   GET /length?from=青蓝门&to=图书馆[&method=astar]  最短路径长度
+#   GET /alternatives?from=青蓝门&to=图书馆&k=3        前 k 条无环最短路径（备选路线）
+#   GET /recommended?id=1                              推荐路线（与界面“推荐路线”一致）
+#   GET /nearest?from=青蓝门&category=食堂[&k=3]       最近的 k 个该类设施及路径
+#   GET /node?name=图书馆                              景点坐标、介绍、类别、楼层及相邻路径
+#   GET /nodes                                         全部景点名称
+#   GET /stats                                         路径结果缓存的命中 / 未命中 / 淘汰统计及临时规则数
+#
+# 用法：python route_server.py --port 8000 [--ch map.ch.npz] [--restrictions closures.json]
+# 临时封闭与限时减速规则（格式见 restrictions.read_restrictions）在各自的时段内自动生效
+
+
+# 备选路线接口单次请求最多返回的路线数
+MAX_ALTERNATIVES = 10
+
+
+class RouteService:
+    """把路网引擎的查询包装为 JSON 响应：返回 (HTTP 状态码, 响应对象)"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        # 路网在服务期间不修改（只有临时规则按时段生效）；查询会写 last_expanded，加锁保证各请求读到自己的值
+        self.lock = threading.Lock()
+        # 预先构建查询结构，避免首个请求承担构建开销
+        engine.csr()
+        if engine.use_distance_table:
+            engine.distance_table()
+        engine.geometry()
+        if engine.ch_path is not None:
+            ch = engine.contraction()
+            if ch is None and engine.restrictions.active:
+                print("临时规则生效期间 method=ch 退回 Dijkstra，规则全部解除后恢复使用收缩层次")
+            elif ch is None:
+                print(f"收缩层次 {engine.ch_path} 不存在或与路网不符，method=ch 将退回 Dijkstra")
+            else:
+                ch.adjacency_lists()
+
+    def handle(self, path, params):
+        handler = {
+            "/route": self.route,
+            "/length": self.length,
+            "/alternatives": self.alternatives,
+            "/recommended": self.recommended,
+            "/nearest": self.nearest,
+            "/node": self.node,
+            "/nodes": self.nodes,
+            "/stats": self.stats,
+        }.get(path)
+        if handler is None:
+            return 404, {"error": f"未知接口 {path}"}
+        try:
+            return 200, handler(params)
+        except (KeyError, ValueError) as e:
+            return 400, {"error": e.args[0] if e.args else str(e)}
+        except (nx.NodeNotFound, nx.NetworkXNoPath) as e:
+            return 404, {"error": str(e)}
+
+    @staticmethod
+    def _param(params, name):
+        values = params.get(name)
+        if not values or not values[0]:
+            raise KeyError(f"缺少参数 {name}")
+        return values[0]
+
+    @classmethod
+    def _positive_int(cls, params, name, default=None):
+        """正整数参数；省略时取 default（为 None 时为必填参数）"""
+        value = cls._param(params, name) if default is None else (params.get(name) or [str(default)])[0]
+        try:
+            number = int(value)
+        except ValueError:
+            number = 0
+        if number < 1:
+            raise ValueError(f"{name} 必须为正整数")
+        return number
+
+    def _search(self, params):
+        start = self._param(params, "from")
+        end = self._param(params, "to")
+        method = params.get("method", ["dijkstra"])[0]
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"不支持的搜索算法 {method}，可选: {', '.join(SEARCH_METHODS)}")
+        with self.lock:
+            self.engine.refresh_restrictions()
+            path, length = self.engine.shortest_path(start, end, method)
+            expanded = self.engine.last_expanded
+            cached = self.engine.last_cached
+        return start, end, method, path, length, expanded, cached
+
+    def route(self, params):
+        start, end, method, path, length, expanded, cached = self._search(params)
+        return {"from": start, "to": end, "method": method, "path": path, "length": length,
+                "length_text": f"{format_length(length)}米", "expanded": expanded, "cached": cached}
+
+    def length(self, params):
+        start, end, method, _, length, _, _ = self._search(params)
+        return {"from": start, "to": end, "method": method, "length": length}
+
+    def alternatives(self, params):
+        start = self._param(params, "from")
+        end = self._param(params, "to")
+        k = self._positive_int(params, "k", 3)
+        if k > MAX_ALTERNATIVES:
+            raise ValueError(f"k 必须在 1~{MAX_ALTERNATIVES} 之间")
+        with self.lock:
+            self.engine.refresh_restrictions()
+            routes = self.engine.k_shortest_paths(start, end, k)
+            expanded = self.engine.last_expanded
+        return {"from": start, "to": end, "expanded": expanded,
+                "routes": [{"path": path, "length": length, "length_text": f"{format_length(length)}米"}
+                           for path, length in routes]}
+
+    def recommended(self, params):
+        route_num = self._positive_int(params, "id")
+        if route_num not in RECOMMENDED_ROUTES:
+            raise ValueError(f"推荐路线 {route_num} 不存在，可选: {', '.join(map(str, RECOMMENDED_ROUTES))}")
+        with self.lock:
+            self.engine.refresh_restrictions()
+            route_name, route, total_length = self.engine.recommended_route(route_num)
+        return {"id": route_num, "name": route_name, "path": route, "length": total_length,
+                "length_text": f"{format_length(total_length)}米"}
+
+    def nearest(self, params):
+        start = self._param(params, "from")
+        category = self._param(params, "category")
+        k = self._positive_int(params, "k", 1)
+        with self.lock:
+            self.engine.refresh_restrictions()
+            results = self.engine.nearest_facilities(start, category, k)
+            expanded = self.engine.last_expanded
+        return {"from": start, "category": category, "expanded": expanded,
+                "facilities": [{"name": name, "path": path, "length": length,
+                                "length_text": f"{format_length(length)}米"} for name, path, length in results]}
+
+    def node(self, params):
+        name = self._param(params, "name")
+        if name not in self.engine.locations:
+            raise nx.NodeNotFound(f"景点 {name} 不存在")
+        x, y = self.engine.locations[name]
+        with self.lock:
+            self.engine.refresh_restrictions()
+            neighbors = [self._neighbor(name, other, length) for other, length in self.engine.neighbors(name)]
+        return {"name": name, "x": x, "y": y,
+                "introduction": self.engine.introductions.get(name, "无介绍信息"),
+                "category": self.engine.categories.get(name, ""),
+                "floor": self.engine.floors.get(name, ""),
+                "neighbors": neighbors}
+
+    def _neighbor(self, name, other, length):
+        """相邻路径：原始长度，以及临时规则（封闭时 factor 为 null）"""
+        factor = self.engine.restriction_factor(name, other)
+        return {"name": other, "length": length, "closed": factor == CLOSED,
+                "factor": None if factor == CLOSED else factor}
+
+    def nodes(self, params):
+        return {"nodes": list(self.engine.locations)}
+
+    def stats(self, params):
+        with self.lock:
+            self.engine.refresh_restrictions()
+        return {"route_cache": self.engine.route_cache.stats(), "version": self.engine.version,
+                "restrictions": {"rules": len(self.engine.restrictions),
+                                 "active_edges": len(self.engine.restrictions.active)}}
+
+
+class RouteRequestHandler(BaseHTTPRequestHandler):
+    # HTTP/1.1 长连接：同一客户端的连续请求复用连接
+    protocol_version = "HTTP/1.1"
+    # 响应头与正文分两次写出，关闭 Nagle 算法避免与客户端延迟确认叠加出约 40ms 的等待
+    disable_nagle_algorithm = True
+    service = None  # 由 make_server 设置
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        status, body = self.service.handle(url.path, parse_qs(url.query))
+        try:
+            # inf / nan 不是合法的 JSON，出现时报错而不是输出 Infinity
+            data = json.dumps(body, ensure_ascii=False, allow_nan=False, default=_to_json).encode("utf-8")
+        except ValueError as e:
+            status = 500
+            data = json.dumps({"error": f"响应无法序列化: {str(e)}"}, ensure_ascii=False).encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format, *args):
+        # 不逐条打印请求日志（高并发时输出本身会成为瓶颈）
+        pass
+
+
+def _to_json(value):
+    """NumPy 标量等转为 Python 内置类型"""
+    if hasattr(value, "item"):
+        return value.item()
+    raise TypeError(f"无法序列化 {type(value).__name__}")
+
+
+def make_server(engine, host="127.0.0.1", port=8000):
+    """创建（未启动的）多线程 HTTP 服务；port 为 0 时由系统分配端口"""
+    handler = type("BoundRouteRequestHandler", (RouteRequestHandler,), {"service": RouteService(engine)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="校园路由 HTTP 服务")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--nodes", default="node.csv", help="节点文件")
+    parser.add_argument("--edges", default="edge.csv", help="路径文件")
+    parser.add_argument("--snapshot", default="map.snap", help="二进制快照文件，空字符串表示不使用")
+    parser.add_argument("--no-table", action="store_true", help="不预计算全源最短路径表")
+    parser.add_argument("--ch", default="", help="收缩层次文件（由 contraction.py 构建），供 method=ch 使用")
+    parser.add_argument("--restrictions", default="", help="临时封闭与限时减速规则文件（JSON）")
+    args = parser.parse_args()
+
+    engine = RoutingEngine(args.nodes, args.edges, use_distance_table=not args.no_table,
+                           snapshot_path=args.snapshot or None, ch_path=args.ch or None)
+    if args.restrictions:
+        try:
+            for u, v, factor, start, end, note in read_restrictions(args.restrictions):
+                engine.add_restriction(u, v, factor, start, end, note)
+        except (OSError, KeyError, ValueError) as e:
+            parser.error(f"读取临时规则 {args.restrictions} 失败: {str(e)}")
+    server = make_server(engine, args.host, args.port)
+    print(f"路由服务已启动: http://{args.host}:{server.server_port}/ （景点 {len(engine.locations)} 个，"
+          f"路径 {len(engine.edges)} 条）")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,984 @@
+import os
+import time
+from itertools import chain
+
+import networkx as nx
+import numpy as np
+import pandas as pd
+
+from contraction import ContractionHierarchy, graph_digest
+from csr_graph import CSRGraph, intern_edges, tree_affected
+from distance_table import DistanceTable
+from floors import FloorOverlay, split_floor
+from map_io import (read_nodes, read_edges, csv_fingerprint, save_snapshot, load_snapshot,
+                    read_snapshot_header)
+from restrictions import CLOSED, Restriction, RestrictionSet
+from route_cache import RouteCache, ROUTE_CACHE_SIZE
+from spatial_index import PointGrid, SegmentGrid
+from tour_planner import plan_order
+
+
+# 校园路网引擎：不依赖 Tkinter / Matplotlib，可在无显示环境的服务器上直接使用
+# 项目地址：https://github.com/lyukovsky/Campus-Navigation-System-for-JXNU
+
+
+# edge.csv 不存在或读取失败时使用的默认路径数据
+DEFAULT_PATHS = [
+    ("青蓝门", "望城门", 300),
+    ("青蓝门", "洁琼楼", 250),
+    ("正大门", "正大坊", 100),
+    ("正大门", "校址纪念碑", 150),
+    ("望城门", "长胜门", 400),
+    ("望城门", "洁琼楼", 200),
+    ("长胜门", "惟义楼", 350),
+    ("惟义楼", "图书馆", 250),
+    ("惟义楼", "静湖", 200),
+    ("名达楼", "静湖", 250),
+    ("名达楼", "校址纪念碑", 150),
+    ("方荫楼", "校址纪念碑", 300),
+    ("方荫楼", "鹅湖湾", 250),
+    ("先骕楼", "图书馆", 250),
+    ("先骕楼", "方荫楼", 350),
+    ("先骕楼", "静湖", 300),
+    ("正大坊", "青蓝门", 450),
+    ("静湖", "校址纪念碑", 200),
+    ("鹅湖湾", "先骕楼", 400),
+    ("洁琼楼", "名达楼", 300),
+    # 推荐路线1新增节点间的路径（假设存在）
+    ("图书馆", "静湖", 200),
+    ("静湖", "校址纪念碑", 200),
+    ("校址纪念碑", "方荫楼", 300),
+    ("方荫楼", "音乐艺术广场", 150),
+    ("音乐艺术广场", "鹅湖湾", 200),
+    ("鹅湖湾", "白鹿会馆", 250),
+    ("白鹿会馆", "正大坊", 300),
+    # 推荐路线2新增节点间的路径（假设存在）
+    ("正大坊", "升旗台", 150),
+    ("升旗台", "校址纪念碑", 200),
+    ("校址纪念碑", "静湖", 250),
+    ("图书馆", "二食堂", 150),
+    ("二食堂", "风雨球场", 200),
+    ("风雨球场", "长胜门", 250)
+]
+
+# 推荐路线中的节点若缺失坐标，使用以下默认位置
+DEFAULT_POSITIONS = {
+    "音乐艺术广场": (800, 500),
+    "白鹿会馆": (900, 600),
+    "升旗台": (400, 300),
+    "校址纪念碑": (500, 400),
+    "二食堂": (700, 600),
+    "风雨球场": (800, 700)
+}
+
+# 推荐路线：编号 -> (名称, [起点, 途经景点..., 终点])；途经景点的访问顺序由路线规划求出，首尾相同即为环游
+RECOMMENDED_ROUTES = {
+    1: ("推荐路线1", ["青蓝门", "实验大楼", "名达楼", "惟义楼", "图书馆", "静湖", "校址纪念碑",
+                     "方荫楼", "音乐艺术广场", "鹅湖湾", "白鹿会馆", "正大坊", "青蓝门"]),
+    2: ("推荐路线2", ["正大门", "正大坊", "升旗台", "校址纪念碑", "静湖",
+                     "图书馆", "二食堂", "风雨球场", "长胜门"]),
+}
+
+# 路线规划最多缓存的单源最短路径树数量
+LEG_CACHE_SIZE = 64
+
+# 可选的最短路径搜索方式
+SEARCH_METHODS = {
+    "dijkstra": "Dijkstra",
+    "astar": "A*",
+    "bidirectional": "双向 Dijkstra",
+    "bidirectional_astar": "双向 A*",
+    "ch": "收缩层次 (CH)",
+    "overlay": "楼宇门户覆盖图",
+}
+
+
+def edge_key(u, v):
+    """无向路径的规范键：两端点按大小排序"""
+    return (u, v) if u < v else (v, u)
+
+
+def _category_dict(names, categories):
+    """景点 -> 类别（或楼层标签），去掉空值"""
+    return {name: category for name, category in zip(names, categories) if category}
+
+
+def format_length(length):
+    """距离显示：整数米不带小数"""
+    length = float(length)
+    return str(int(length)) if length.is_integer() else f"{length:.1f}"
+
+
+class RoutingEngine:
+    """校园路网：节点坐标、景点介绍、路径数据及最短路径查询"""
+
+    def __init__(self, node_path="node.csv", edge_path="edge.csv", use_distance_table=False,
+                 snapshot_path=None, ch_path=None, route_cache_size=ROUTE_CACHE_SIZE):
+        # 无向图（供编辑与绘图使用），加载后首次访问时才批量构建
+        self._G = nx.Graph()
+        self.locations = {}  # 景点 -> (x, y) 像素坐标
+        self.edges = {}  # edge_key(起点, 终点) -> (起点, 终点, 长度)，路径的唯一存储
+        self.introductions = {}  # 景点 -> 介绍
+        self.categories = {}  # 景点 -> 类别（食堂、校门、图书馆等），没有类别的景点不在其中
+        self.floors = {}  # 景点 -> 楼层标签（「楼宇/楼层」，如 图书馆/2F），室外景点不在其中
+        self._csr = None  # 查询用的 CSR 图，编辑后惰性重建
+        # 可选的全源最短路径表：适合路网小、查询频繁的场景（如自助导览机）
+        self.use_distance_table = use_distance_table
+        self._table = None
+        self._geometry = None  # (csr, xs, ys, 像素→米系数)，A* 启发函数使用
+        self._facility_tables = {}  # 类别 -> (csr, dist, pred, origin)，最近设施查询使用
+        self._legs = (None, {})  # (csr, {起点 ID: (dist, pred)})，路线规划缓存的单源最短路径树
+        self._overlay = (None, None)  # (csr, FloorOverlay)，楼宇门户覆盖图，楼层标签变化时丢弃
+        # 收缩层次：预处理结果保存在 ch_path，按需读取；路网编辑后与之不符时查询退回 Dijkstra
+        self.ch_path = ch_path
+        self._ch_file = None  # 从 ch_path 读到（或刚构建）的层次结构，只读一次
+        self._ch = (None, None)  # (csr, 与之对应的层次结构或 None)
+        self.last_expanded = 0  # 最近一次查询扩展的节点数
+        self.last_cached = False  # 最近一次最短路径查询是否直接取自缓存
+        self.version = 0  # 路网版本号，任何编辑都会递增
+        # 最短路径结果的 LRU 缓存，以 version 为标记，路网编辑后自动失效；容量为 0 时不缓存
+        self.route_cache = RouteCache(route_cache_size)
+        # 临时封闭与限时减速规则：只影响查询用的 CSR 图（G、edges 中仍为原始长度）
+        self.restrictions = RestrictionSet()
+        self.restriction_version = 0  # 生效的规则每变化一次递增（界面据此重绘封闭路径）
+        self._restrictions_due = None  # 下一次有规则开始或结束的时刻
+        # 节点坐标 / 路径线段的空间索引，用于点击命中检测；首次查询时才批量构建
+        self.node_index = PointGrid()
+        self.edge_index = SegmentGrid()
+        self._spatial_ready = False
+
+        if node_path is not None:
+            self.load(node_path, edge_path, snapshot_path)
+
+    @property
+    def paths(self):
+        """(起点, 终点, 长度) 列表，按加入顺序；由 edges 派生"""
+        return list(self.edges.values())
+
+    @paths.setter
+    def paths(self, paths):
+        # 重复路径以最后一次出现的长度为准，位置保持首次出现处（与建图结果一致）
+        self.edges = {edge_key(u, v): (u, v, w) for u, v, w in paths}
+
+    # ===== 数据加载 =====
+    def load(self, node_path="node.csv", edge_path="edge.csv", snapshot_path=None):
+        """加载节点与路径，并重建图
+
+        给定 snapshot_path 时：快照与 CSV 一致则直接读取快照，否则解析 CSV 后重新写出快照。
+        """
+        fingerprint = csv_fingerprint(node_path, edge_path) if snapshot_path is not None else None
+        if fingerprint is not None and os.path.exists(snapshot_path):
+            try:
+                if read_snapshot_header(snapshot_path)[0]["source"]["csv"] == fingerprint:
+                    self.load_snapshot(snapshot_path)
+                    return
+            except (OSError, ValueError, KeyError, TypeError) as e:
+                print(f"读取快照 {snapshot_path} 失败: {str(e)}，改为读取 CSV 文件。")
+
+        self._load_csv(node_path, edge_path)
+        if fingerprint is not None:
+            try:
+                self.save_snapshot(snapshot_path, source=fingerprint)
+            except OSError as e:
+                print(f"写入快照 {snapshot_path} 失败: {str(e)}")
+
+    def _load_csv(self, node_path, edge_path):
+        self.locations = {}
+        self.introductions = {}
+        self.categories = {}
+        self.floors = {}
+        self.paths = []
+
+        node_found = True
+        try:
+            # node.csv 只读取一次，同时得到坐标、介绍、类别与楼层
+            names, xs, ys, intros, categories, floors = read_nodes(node_path)
+            self.locations = dict(zip(names, zip(xs, ys)))
+            self.introductions = dict(zip(names, intros))
+            self.categories = _category_dict(names, categories)
+            self.floors = _category_dict(names, floors)
+        except FileNotFoundError:
+            node_found = False
+            print(f"文件 {node_path} 未找到，无法加载景点坐标与介绍。")
+
+        try:
+            self.paths = read_edges(edge_path)
+        except FileNotFoundError:
+            print(f"文件 {edge_path} 未找到，使用默认路径数据。")
+            self.paths = list(DEFAULT_PATHS)
+        except Exception as e:
+            print(f"读取{edge_path}文件时出错: {str(e)}，使用默认路径数据。")
+            self.paths = list(DEFAULT_PATHS)
+
+        if not node_found:
+            # 为推荐路线中的节点添加默认介绍
+            for node in DEFAULT_POSITIONS:
+                if node not in self.introductions:
+                    self.introductions[node] = "推荐路线景点，暂无详细介绍"
+
+        self._initialize_graph()
+
+    def _initialize_graph(self):
+        """locations / paths 整体替换后调用：图与空间索引延后到首次使用时批量构建"""
+        # 为推荐路线中的新节点添加默认位置（如果不存在）
+        for node, pos in DEFAULT_POSITIONS.items():
+            if node not in self.locations:
+                self.locations[node] = pos
+        self._reset_graph()
+
+    def _reset_graph(self):
+        self._G = None
+        self._spatial_ready = False
+        self._invalidate()
+
+    @property
+    def G(self):
+        """networkx 图；只有编辑和绘图需要，无界面的查询服务不会触发构建"""
+        if self._G is None:
+            G = nx.Graph()
+            G.add_nodes_from((node, {'pos': pos}) for node, pos in self.locations.items())
+            G.add_weighted_edges_from(self.edges.values())
+            self._G = G
+        return self._G
+
+    @G.setter
+    def G(self, graph):
+        self._G = graph
+
+    def _ensure_spatial_index(self):
+        """批量构建节点与路径的空间索引"""
+        if self._spatial_ready:
+            return
+        names = list(self.locations)
+        coords = np.array([self.locations[name] for name in names], dtype=np.float64).reshape(-1, 2)
+        self.node_index.load(names, coords[:, 0], coords[:, 1])
+
+        # 端点缺少坐标的路径不登记
+        row = {name: i for i, name in enumerate(names)}
+        edges = [(u, v) for u, v, _ in self.edges.values() if u in row and v in row]
+        ends = np.array([(row[u], row[v]) for u, v in edges], dtype=np.int64).reshape(-1, 2)
+        self.edge_index.load(edges, np.hstack([coords[ends[:, 0]], coords[ends[:, 1]]]))
+        self._spatial_ready = True
+
+    # 以下增量维护只在索引已构建时进行，否则留待首次查询时整体构建
+    def _index_node(self, name):
+        if self._spatial_ready:
+            x, y = self.locations[name]
+            self.node_index.insert(name, x, y)
+
+    def _unindex_node(self, name):
+        if self._spatial_ready:
+            self.node_index.remove(name)
+
+    def _index_edge(self, u, v):
+        """登记路径线段；端点缺少坐标时不登记"""
+        if self._spatial_ready and u in self.locations and v in self.locations:
+            self.edge_index.insert(u, v, self.locations[u], self.locations[v])
+
+    def _unindex_edge(self, u, v):
+        if self._spatial_ready and (u, v) in self.edge_index:
+            self.edge_index.remove(u, v)
+
+    def _invalidate(self):
+        """路网发生变化，丢弃派生的查询结构"""
+        self.version += 1
+        self._csr = None
+        self._table = None
+
+    def _edge_changed(self, u, v, old_weight, new_weight):
+        """路径新增或长度变化：变短时增量修补距离表，变长时丢弃"""
+        self.version += 1
+        self._csr = None
+        if self._table is None:
+            return
+        # 有生效规则的路径，查询使用的是乘以系数后的长度
+        factor = self.restrictions.active.get(edge_key(u, v), 1.0)
+        if factor != 1.0:
+            old_weight = None if old_weight is None else old_weight * factor
+            new_weight = new_weight * factor
+        if old_weight is None or new_weight <= old_weight:
+            self._table.shorten_edge(u, v, new_weight)
+        else:
+            self._table = None
+
+    def csr(self):
+        """返回当前路网的 CSR 表示（必要时重建）"""
+        if self._csr is None:
+            self._csr = self._restricted(CSRGraph.from_edges(self.locations, self.edges.values()))
+        return self._csr
+
+    def _restricted(self, csr, restore=False):
+        """按生效中的规则调整 CSR 图中路径的长度；restore 为真时反过来恢复为原始长度（节点 ID 不变）"""
+        changes = {}
+        for key, factor in self.restrictions.active.items():
+            if key in self.edges:
+                u, v, w = self.edges[key]
+                changes[(csr.index[u], csr.index[v])] = w if restore else w * factor
+        return csr.reweighted(changes) if changes else csr
+
+    def geometry(self):
+        """返回与 CSR 节点 ID 对齐的坐标列表及像素→米换算系数
+
+        系数取所有路径「长度 / 像素直线距离」的最小值，保证启发函数不高估（可采纳且一致）；
+        存在无坐标节点时系数为 0，A* 退化为 Dijkstra。
+        """
+        csr = self.csr()
+        if self._geometry is None or self._geometry[0] is not csr:
+            xs, ys = [], []
+            missing = False
+            for name in csr.names:
+                pos = self.locations.get(name)
+                if pos is None:
+                    missing = True
+                    pos = (0.0, 0.0)
+                xs.append(float(pos[0]))
+                ys.append(float(pos[1]))
+            scale = 0.0 if missing else csr.edge_length_ratio(xs, ys)
+            self._geometry = (csr, xs, ys, scale)
+        return self._geometry[1:]
+
+    def contraction(self):
+        """返回与当前路网一致的收缩层次；尚未构建、路网已编辑（摘要不符）或有生效的临时规则时返回 None
+
+        层次结构按不计临时规则的路网构建：规则生效期间 method="ch" 退回 Dijkstra，规则全部解除后恢复使用。
+        """
+        csr = self.csr()
+        if self._ch[0] is not csr:
+            if self._ch_file is None and self.ch_path is not None and os.path.exists(self.ch_path):
+                try:
+                    self._ch_file = ContractionHierarchy.load(self.ch_path)
+                except (OSError, KeyError, ValueError) as e:
+                    print(f"读取收缩层次 {self.ch_path} 失败: {str(e)}")
+                    self.ch_path = None
+            ch = self._ch_file
+            if ch is not None and (self.restrictions.active or ch.digest != graph_digest(csr)):
+                ch = None
+            self._ch = (csr, ch)
+        return self._ch[1]
+
+    def build_contraction(self, task=None):
+        """由当前路网构建收缩层次，给定 ch_path 时写入文件；task 为后台任务句柄
+
+        按原始长度构建，不计生效中的临时规则（否则规则解除后层次结构与路网不符）。
+        """
+        csr = self.csr()
+        ch = ContractionHierarchy.build(self._restricted(csr, restore=True), task)
+        if self.ch_path is not None:
+            ch.save(self.ch_path)
+        self._ch_file = ch
+        self._ch = (csr, None if self.restrictions.active else ch)
+        return ch
+
+    def overlay(self):
+        """返回当前路网的楼宇门户覆盖图（必要时重建）"""
+        csr = self.csr()
+        if self._overlay[0] is not csr:
+            self._overlay = (csr, FloorOverlay.build(csr, self.floors))
+        return self._overlay[1]
+
+    def floor_names(self):
+        """已有的楼层标签（按首次出现的顺序）"""
+        return list(dict.fromkeys(self.floors.values()))
+
+    def floor_levels(self):
+        """各楼宇出现过的楼层（按首次出现的顺序），供按楼层显示使用"""
+        return list(dict.fromkeys(level for level in (split_floor(label)[1] for label in self.floors.values())
+                                  if level))
+
+    def floor_level(self, name):
+        """景点所在的楼层；室外景点为空字符串"""
+        return split_floor(self.floors[name])[1] if name in self.floors else ""
+
+    def distance_table(self):
+        """返回全源最短路径表（必要时重建）；路网过大时返回 None"""
+        if self._table is None:
+            self._table = DistanceTable.build(self.csr())
+        return self._table
+
+    def read_import(self, node_path, edge_path):
+        """读取外部节点/路径文件，返回 (坐标字典, 介绍字典, 路径列表, 类别字典, 楼层字典)，不修改当前地图"""
+        names, xs, ys, intros, categories, floors = read_nodes(node_path, default_intro="暂无介绍")
+        return (dict(zip(names, zip(xs, ys))), dict(zip(names, intros)), read_edges(edge_path),
+                _category_dict(names, categories), _category_dict(names, floors))
+
+    def replace_data(self, locations, introductions, paths, categories=None, floors=None, add_defaults=True):
+        """覆盖导入：整体替换地图数据（复制一份，调用方的容器可继续保留）"""
+        # 旧的容器随即被替换、不再修改，逆向操作直接引用即可
+        inverse = [("replace_data", (self.locations, self.introductions, self.edges.values(), self.categories,
+                                     self.floors, False))]
+        self.locations = dict(locations)
+        self.introductions = dict(introductions)
+        self.categories = dict(categories or {})
+        self.floors = dict(floors or {})
+        self.paths = paths
+        if add_defaults:
+            self._initialize_graph()
+        else:
+            self._reset_graph()
+        return inverse
+
+    def merge_data(self, locations, introductions, paths, categories=None, floors=None):
+        """合并导入：新节点覆盖同名旧节点，路径去重后追加"""
+        # 逆向操作只需记住被覆盖的旧值（介绍为 None 表示原先没有）、新增的节点和追加的路径
+        previous = {name: (self.locations[name], self.introductions.get(name), self.categories.get(name),
+                           self.floors.get(name))
+                    for name in locations if name in self.locations}
+        # 合并后会补回缺失的推荐路线默认节点，撤回时一并去掉
+        added = [name for name in dict.fromkeys(chain(locations, DEFAULT_POSITIONS)) if name not in self.locations]
+        appended = []
+
+        self.locations.update(locations)
+        self.introductions.update(introductions)
+        # 导入文件中没有类别（楼层）的同名景点不再保留旧类别（楼层）
+        for name in locations:
+            self.categories.pop(name, None)
+            self.floors.pop(name, None)
+        self.categories.update(categories or {})
+        self.floors.update(floors or {})
+        for u, v, length in paths:
+            # 已有的路径保持不变
+            key = edge_key(u, v)
+            if key not in self.edges:
+                self.edges[key] = (u, v, length)
+                appended.append(key)
+        self._initialize_graph()
+        return [("revert_merge", (added, previous, appended))]
+
+    def revert_merge(self, added, previous, appended):
+        """撤回合并导入"""
+        for name in added:
+            self.locations.pop(name, None)
+            self.introductions.pop(name, None)
+            self.categories.pop(name, None)
+            self.floors.pop(name, None)
+        for name, (pos, intro, category, floor) in previous.items():
+            self.locations[name] = pos
+            if intro is None:
+                self.introductions.pop(name, None)
+            else:
+                self.introductions[name] = intro
+            if category is None:
+                self.categories.pop(name, None)
+            else:
+                self.categories[name] = category
+            if floor is None:
+                self.floors.pop(name, None)
+            else:
+                self.floors[name] = floor
+        for key in appended:
+            self.edges.pop(key, None)
+        self._reset_graph()
+
+    def save_snapshot(self, path, source=None):
+        """写出二进制快照（节点名表、坐标、介绍、路径数组）"""
+        names, u, v, w = intern_edges(self.locations, self.paths)
+        located = len(self.locations)
+        xs = np.full(len(names), np.nan)
+        ys = np.full(len(names), np.nan)
+        if located:
+            coords = np.array(list(self.locations.values()), dtype=np.float64)
+            xs[:located] = coords[:, 0]
+            ys[:located] = coords[:, 1]
+        intros = [self.introductions.get(name, "") for name in names[:located]] + [""] * (len(names) - located)
+        categories = [self.categories.get(name, "") for name in names]
+        floors = [self.floors.get(name, "") for name in names]
+        save_snapshot(path, names, xs, ys, intros, u, v, w, categories=categories, floors=floors, source={
+            "csv": source,
+            "located": located,
+            # 有坐标但没有介绍的节点（如补充的推荐路线默认节点），读回时不补空介绍
+            "no_intro": [name for name in self.locations if name not in self.introductions],
+            # CSV 中的整数坐标 / 长度读回时仍为整数
+            "integer_coords": bool(np.all(np.mod(xs[:located], 1) == 0) and np.all(np.mod(ys[:located], 1) == 0)),
+            "integer_weights": bool(np.all(np.mod(w, 1) == 0)),
+        })
+
+    def load_snapshot(self, path):
+        """读取二进制快照；CSR 图直接由快照中的数组构建"""
+        snap = load_snapshot(path)
+        info = snap["source"]
+        located = info["located"]
+        names = np.array(snap["names"], dtype=object)
+        xs, ys, w = snap["x"][:located], snap["y"][:located], snap["edge_w"]
+        if info["integer_coords"]:
+            xs, ys = xs.astype(np.int64), ys.astype(np.int64)
+        weights = w.astype(np.int64) if info["integer_weights"] else w
+
+        self.locations = dict(zip(snap["names"][:located], zip(xs.tolist(), ys.tolist())))
+        self.introductions = dict(zip(snap["names"][:located], snap["intros"][:located]))
+        for name in info["no_intro"]:
+            del self.introductions[name]
+        self.categories = _category_dict(snap["names"], snap.get("categories", ()))
+        self.floors = _category_dict(snap["names"], snap.get("floors", ()))
+        self.paths = list(zip(names[snap["edge_u"]].tolist(), names[snap["edge_v"]].tolist(), weights.tolist()))
+        self._initialize_graph()
+        self._csr = self._restricted(CSRGraph.from_arrays(snap["names"], snap["edge_u"], snap["edge_v"], w))
+
+    def save_csv(self, node_path="node_new.csv", edge_path="edge_new.csv"):
+        """保存节点/路径到 CSV 文件"""
+        node_data = []
+        for name, (x, y) in self.locations.items():
+            node_data.append({
+                "name": name,
+                "x": x,
+                "y": y,
+                "introduction": self.introductions.get(name, "暂无介绍"),
+                "category": self.categories.get(name, ""),
+                "floor": self.floors.get(name, "")
+            })
+        pd.DataFrame(node_data).to_csv(node_path, index=False, encoding="utf-8-sig")
+
+        edge_data = []
+        for u, v, weight in self.paths:
+            edge_data.append({
+                "x": u,  # 保持与原有edge.csv列名一致（start节点）
+                "y": v,  # end节点
+                "length": weight
+            })
+        pd.DataFrame(edge_data).to_csv(edge_path, index=False, encoding="utf-8-sig")
+
+    # ===== 查询 =====
+    def shortest_path(self, start, end, method="dijkstra"):
+        """返回 (路径节点列表, 总长度)；无路可达时抛出 nx.NetworkXNoPath
+
+        method 取 SEARCH_METHODS 中的键；扩展节点数记录在 last_expanded。
+        """
+        if method not in SEARCH_METHODS:
+            raise ValueError(f"未知的搜索方式: {method}")
+        # 重复查询直接返回缓存结果，不访问路网
+        key = (start, end, method)
+        cached = self.route_cache.get(key, self.version)
+        self.last_cached = cached is not None
+        if cached is not None:
+            self.last_expanded = 0
+            return list(cached[0]), cached[1]
+
+        csr = self.csr()
+        for node in (start, end):
+            if node not in csr.index:
+                raise nx.NodeNotFound(f"景点 {node} 不存在")
+
+        table = self.distance_table() if self.use_distance_table and method == "dijkstra" else None
+        if table is not None:
+            path, length = table.lookup(start, end)
+            self.last_expanded = 0
+        else:
+            s, t = csr.index[start], csr.index[end]
+            if method == "dijkstra":
+                ids, length, expanded = csr.dijkstra(s, t)
+            elif method == "bidirectional":
+                ids, length, expanded = csr.bidirectional(s, t)
+            elif method == "ch":
+                ch = self.contraction()
+                ids, length, expanded = ch.query(s, t) if ch is not None else csr.dijkstra(s, t)
+            elif method == "overlay":
+                ids, length, expanded = self.overlay().query(s, t)
+            else:
+                xs, ys, scale = self.geometry()
+                if method == "astar":
+                    ids, length, expanded = csr.astar(s, t, xs, ys, scale)
+                else:
+                    ids, length, expanded = csr.bidirectional(s, t, xs, ys, scale)
+            self.last_expanded = expanded
+            path = None if ids is None else [csr.names[i] for i in ids]
+        if path is None:
+            raise nx.NetworkXNoPath(f"从 {start} 到 {end} 没有可用路径")
+        self.route_cache.put(key, self.version, path, length)
+        return path, length
+
+    def k_shortest_paths(self, start, end, k):
+        """返回前 k 条无环最短路径 [(路径节点列表, 总长度), ...]，按长度升序；无路可达时抛出 nx.NetworkXNoPath
+
+        与所选搜索方式无关，均使用 Yen 算法（到终点的距离树在同一路网上缓存复用）。
+        """
+        csr = self.csr()
+        for node in (start, end):
+            if node not in csr.index:
+                raise nx.NodeNotFound(f"景点 {node} 不存在")
+        paths, self.last_expanded = csr.k_shortest_paths(csr.index[start], csr.index[end], k)
+        if not paths:
+            raise nx.NetworkXNoPath(f"从 {start} 到 {end} 没有可用路径")
+        return [([csr.names[i] for i in ids], length) for ids, length in paths]
+
+    def path_length(self, start, end, method="dijkstra"):
+        """返回两点间最短路径长度"""
+        return self.shortest_path(start, end, method)[1]
+
+    def recommended_route(self, route_num):
+        """返回 (路线名称, 途经景点, 总长度)；途经景点中已被删除的跳过，景点间不连通时抛出 nx.NetworkXNoPath"""
+        route_name, route = RECOMMENDED_ROUTES[route_num]
+        start, end = route[0], route[-1]
+        stops = [start] + [name for name in route[1:-1] if name in self.locations and name not in (start, end)]
+        if end == start:
+            _, path, total_length = self.plan_tour(stops, round_trip=True)
+        else:
+            _, path, total_length = self.plan_tour(stops + [end], fixed_end=True)
+        return route_name, path, total_length
+
+    def _leg_trees(self, ids):
+        """各起点的单源最短路径树 {ID: (dist, pred)}；路网不变时复用，缺少的在一次调用中补算"""
+        csr = self.csr()
+        if self._legs[0] is not csr:
+            self._legs = (csr, {})
+        trees = self._legs[1]
+        missing = [i for i in dict.fromkeys(ids) if i not in trees]
+        if missing:
+            dist, pred = csr.shortest_path_trees(missing)
+            trees.update((i, (dist[row], pred[row])) for row, i in enumerate(missing))
+            # 大图上每棵树占 O(V) 内存，只保留最近使用的一部分
+            for i in list(trees)[:max(0, len(trees) - max(LEG_CACHE_SIZE, len(ids)))]:
+                if i not in ids:
+                    del trees[i]
+        self.last_expanded = sum(int(np.count_nonzero(np.isfinite(trees[i][0]))) for i in missing)
+        return {i: trees[i] for i in ids}
+
+    def plan_tour(self, stops, round_trip=False, fixed_end=False):
+        """游览路线规划：从 stops[0] 出发经过全部景点，返回 (访问顺序, 完整路径, 总长度)
+
+        round_trip 为 True 时最后回到起点；fixed_end 为 True 时以 stops[-1] 为终点，否则终点不限。
+        """
+        stops = list(dict.fromkeys(stops))
+        csr = self.csr()
+        for name in stops:
+            if name not in csr.index:
+                raise nx.NodeNotFound(f"景点 {name} 不存在")
+        if not stops:
+            return [], [], 0.0
+        ids = [csr.index[name] for name in stops]
+        trees = self._leg_trees(ids)
+        dist = np.array([trees[i][0][ids] for i in ids])
+        if not np.isfinite(dist).all():
+            a, b = np.argwhere(~np.isfinite(dist))[0]
+            raise nx.NetworkXNoPath(f"{stops[a]} 与 {stops[b]} 之间没有路径")
+
+        end = 0 if round_trip else (len(stops) - 1 if fixed_end and len(stops) > 1 else None)
+        order = plan_order(dist, end)
+        path = [ids[0]]
+        for a, b in zip(order[:-1], order[1:]):
+            path += CSRGraph.unwind(trees[ids[a]][1], ids[b])[1:]
+        total_length = float(sum(dist[a, b] for a, b in zip(order[:-1], order[1:])))
+        return [stops[i] for i in order], [csr.names[i] for i in path], total_length
+
+    def neighbors(self, node):
+        """返回与景点直接相连的 [(景点, 路径长度), ...]；长度为原始长度，临时规则的系数见 restriction_factor"""
+        csr = self.csr()
+        if node not in csr.index:
+            raise nx.NodeNotFound(f"景点 {node} 不存在")
+        i = csr.index[node]
+        others = [csr.names[j] for j in csr.neighbors[csr.offsets[i]:csr.offsets[i + 1]].tolist()]
+        return [(other, float(self.edge_weight(node, other))) for other in others]
+
+    def category_names(self):
+        """已有的景点类别（按首次出现的顺序）"""
+        return list(dict.fromkeys(self.categories.values()))
+
+    def facilities(self, category):
+        return [name for name, c in self.categories.items() if c == category]
+
+    def _facility_table(self, category):
+        """某类别全部设施为共同起点的单次多源 Dijkstra 结果，路网或类别变化后重建"""
+        csr = self.csr()
+        cached = self._facility_tables.get(category)
+        if cached is None or cached[0] is not csr:
+            sources = [csr.index[name] for name in self.facilities(category) if name in csr.index]
+            if not sources:
+                raise nx.NodeNotFound(f"没有类别为 {category} 的景点")
+            cached = (csr,) + tuple(csr.multi_source(sources))
+            self._facility_tables[category] = cached
+        return cached
+
+    def nearest_facilities(self, node, category, k=1):
+        """返回距景点最近的 k 个该类设施 [(设施, 路径节点列表, 总长度), ...]，按距离升序
+
+        k == 1 时查多源 Dijkstra 预计算表（同一类别只需一次搜索，之后每次查询只回溯路径）；
+        k > 1 时从起点做一次 Dijkstra，确定 k 个设施后即停止。
+        """
+        csr = self.csr()
+        if node not in csr.index:
+            raise nx.NodeNotFound(f"景点 {node} 不存在")
+        s = csr.index[node]
+        if k == 1:
+            _, dist, pred, origin = self._facility_table(category)
+            self.last_expanded = 0
+            if not np.isfinite(dist[s]):
+                return []
+            # 前驱表指向设施一侧，回溯得到「该节点 → 设施」的路径
+            path = CSRGraph.unwind(pred, s)[::-1]
+            return [(csr.names[path[-1]], [csr.names[i] for i in path], float(dist[s]))]
+
+        targets = {csr.index[name] for name in self.facilities(category) if name in csr.index}
+        if not targets:
+            raise nx.NodeNotFound(f"没有类别为 {category} 的景点")
+        found, self.last_expanded = csr.nearest_targets(s, targets, k)
+        return [(csr.names[t], [csr.names[i] for i in ids], length) for t, ids, length in found]
+
+    def nearest_node(self, x, y, radius=15, accept=None):
+        """返回距像素坐标 (x, y) 小于 radius 的最近景点，没有则返回 None；accept 用于排除不显示的景点"""
+        self._ensure_spatial_index()
+        return self.node_index.nearest(x, y, radius, accept)
+
+    def nearest_edge(self, x, y, radius=10, accept=None):
+        """返回距像素坐标 (x, y) 小于 radius 的最近路径 (u, v)，没有则返回 None"""
+        self._ensure_spatial_index()
+        return self.edge_index.nearest(x, y, radius, accept)
+
+    def has_node(self, node):
+        return node in self.locations
+
+    def has_edge(self, u, v):
+        return edge_key(u, v) in self.edges
+
+    def edge_weight(self, u, v):
+        return self.edges[edge_key(u, v)][2]
+
+    # ===== 临时封闭与限时减速 =====
+    def add_restriction(self, u, v, factor=CLOSED, start=None, end=None, note=""):
+        """为路径添加临时规则，返回规则 ID
+
+        factor 为长度系数（CLOSED 表示封闭），start / end 为生效时段的时间戳（秒，None 表示不限）。
+        """
+        if not self.has_edge(u, v):
+            raise ValueError(f"路径 {u}-{v} 不存在")
+        if not factor > 0:
+            raise ValueError("系数必须大于 0")
+        if start is not None and end is not None and end <= start:
+            raise ValueError("结束时间必须晚于开始时间")
+        rule_id = self.restrictions.add(Restriction(edge_key(u, v), factor, start, end, note))
+        self.refresh_restrictions(force=True)
+        return rule_id
+
+    def remove_restriction(self, rule_id):
+        self.restrictions.remove(rule_id)
+        self.refresh_restrictions(force=True)
+
+    def clear_restrictions(self):
+        self.restrictions.rules.clear()
+        self.refresh_restrictions(force=True)
+
+    def restriction_factor(self, u, v):
+        """路径当前生效的合计系数（没有生效规则时为 1.0，封闭为 CLOSED）"""
+        return self.restrictions.active.get(edge_key(u, v), 1.0)
+
+    def effective_weight(self, u, v):
+        """查询使用的路径长度（乘以生效规则的系数，封闭为 inf）"""
+        weight = self.edge_weight(u, v)
+        factor = self.restriction_factor(u, v)
+        return weight if factor == 1.0 else weight * factor
+
+    def restricted_edges(self):
+        """生效中的规则涉及的路径：(封闭的 [(u, v)], 减速的 [(u, v)])"""
+        closed, slowed = [], []
+        for key, factor in self.restrictions.active.items():
+            if key in self.edges:
+                (closed if factor == CLOSED else slowed).append(self.edges[key][:2])
+        return closed, slowed
+
+    def refresh_restrictions(self, now=None, force=False):
+        """按当前时间（或 now）更新生效的规则，返回实际长度有变化的路径列表
+
+        没有规则到达开始或结束时刻时直接返回（可在每次查询前调用）；有变化时只修补受影响的查询结构。
+        """
+        now = time.time() if now is None else now
+        if not force and (self._restrictions_due is None or now < self._restrictions_due):
+            return []
+        changes = self.restrictions.update(now)
+        self._restrictions_due = self.restrictions.next_change(now)
+        if changes:
+            self.restriction_version += 1
+            self._apply_restrictions(changes)
+        return list(changes)
+
+    def _apply_restrictions(self, changes):
+        """生效系数变化 {路径: (原系数, 新系数)}：修补 CSR 图，只丢弃受影响的缓存"""
+        updates = [self.edges[key] + (factors,) for key, factors in changes.items() if key in self.edges]
+        if not updates:
+            return
+        raised = all(new > old for _, _, _, (old, new) in updates)
+        # 路径结果缓存：只有路径变长时，未经过这些路径的结果仍是最短路径
+        if raised:
+            keys = {edge_key(u, v) for u, v, _, _ in updates}
+            self.route_cache.discard(lambda path: any(edge_key(a, b) in keys for a, b in zip(path, path[1:])))
+        else:
+            self.route_cache.clear()
+
+        old_csr = self._csr
+        if old_csr is None:
+            # 编辑后 CSR 图尚未重建：按生效规则重建；最短路径表在编辑时已修补，仍对应原系数，须一并修补
+            csr = self.csr()
+        else:
+            csr = old_csr.reweighted({(old_csr.index[u], old_csr.index[v]): w * new
+                                      for u, v, w, (_, new) in updates})
+            self._csr = csr
+        arcs = [(csr.index[u], csr.index[v], w * old, w * new) for u, v, w, (old, new) in updates]
+
+        if self._table is not None and self._table.repair(csr, arcs) is None:
+            self._table = None
+        if old_csr is None:
+            return  # 其余查询结构随编辑已失效
+        # 路线规划与最近设施的最短路径树：未受影响的树沿用到新图上
+        if self._legs[0] is old_csr:
+            self._legs = (csr, {i: tree for i, tree in self._legs[1].items()
+                                if not tree_affected(tree[0], tree[1], arcs)})
+        for category, (tree_csr, dist, pred, origin) in list(self._facility_tables.items()):
+            if tree_csr is old_csr and not tree_affected(dist, pred, arcs):
+                self._facility_tables[category] = (csr, dist, pred, origin)
+        # A* 的像素→米换算系数：路径只变长时仍可采纳
+        if raised and self._geometry is not None and self._geometry[0] is old_csr:
+            self._geometry = (csr,) + self._geometry[1:]
+
+    # ===== 编辑 =====
+    def add_node(self, name, x, y, intro="", category="", floor=""):
+        """新增景点；与其他编辑方法一样返回逆向操作列表（供撤回日志使用）"""
+        self.locations[name] = (x, y)
+        self.introductions[name] = intro
+        if category:
+            self.categories[name] = category
+        if floor:
+            self.floors[name] = floor
+        self.G.add_node(name, pos=(x, y))
+        self._index_node(name)
+        for other in self.G[name]:
+            self._index_edge(name, other)
+        self.version += 1
+        self._csr = None
+        if self._table is not None:
+            self._table.add_node(name)
+        return [("delete_node", (name,))]
+
+    def move_node(self, name, x, y):
+        """调整景点坐标"""
+        inverse = [("move_node", (name,) + tuple(self.locations[name]))]
+        self.locations[name] = (x, y)
+        self.G.nodes[name]['pos'] = (x, y)
+        self._index_node(name)
+        for other in self.G[name]:
+            self._index_edge(name, other)
+        self.version += 1
+        self._geometry = None
+        return inverse
+
+    def rename_node(self, old, new):
+        """重命名景点，同步更新路径数据"""
+        if old == new:
+            return []
+        G = self.G  # 延迟构建的图须在修改 locations 之前取得
+        self.locations[new] = self.locations.pop(old)
+        if old in self.introductions:
+            self.introductions[new] = self.introductions.pop(old)
+        if old in self.categories:
+            self.categories[new] = self.categories.pop(old)
+        if old in self.floors:
+            self.floors[new] = self.floors.pop(old)
+        # 只改动与该景点相连的路径
+        for other in G[old]:
+            a, b, w = self.edges.pop(edge_key(old, other))
+            self.edges[edge_key(new, other if other != old else new)] = (
+                new if a == old else a, new if b == old else b, w)
+            self._unindex_edge(old, other)
+        self._unindex_node(old)
+        # 原地改名，只触及该节点的邻接（nx.relabel_nodes 会遍历全部节点）
+        G.add_node(new, **G.nodes[old])
+        G.add_edges_from([(new, new if other == old else other, data) for other, data in G[old].items()])
+        G.remove_node(old)
+        # 临时规则随景点改名
+        for rule in self.restrictions.rules.values():
+            if old in rule.edge:
+                rule.edge = edge_key(*(new if name == old else name for name in rule.edge))
+        self.restrictions.active = {edge_key(*(new if name == old else name for name in key)): factor
+                                    for key, factor in self.restrictions.active.items()}
+        self._index_node(new)
+        for other in G[new]:
+            self._index_edge(new, other)
+        self.version += 1
+        self._csr = None
+        if self._table is not None:
+            self._table.rename_node(old, new)
+        return [("rename_node", (new, old))]
+
+    def set_introduction(self, name, intro):
+        """修改景点介绍；intro 为 None 时删除介绍"""
+        inverse = [("set_introduction", (name, self.introductions.get(name)))]
+        if intro is None:
+            self.introductions.pop(name, None)
+        else:
+            self.introductions[name] = intro
+        self.version += 1
+        return inverse
+
+    def set_category(self, name, category):
+        """修改景点类别；category 为空时去掉类别"""
+        inverse = [("set_category", (name, self.categories.get(name, "")))]
+        if category:
+            self.categories[name] = category
+        else:
+            self.categories.pop(name, None)
+        self._facility_tables.clear()
+        self.version += 1
+        return inverse
+
+    def set_floor(self, name, floor):
+        """修改景点所在楼层；floor 为空时改为室外景点"""
+        inverse = [("set_floor", (name, self.floors.get(name, "")))]
+        if floor:
+            self.floors[name] = floor
+        else:
+            self.floors.pop(name, None)
+        self._overlay = (None, None)
+        self.version += 1
+        return inverse
+
+    def delete_node(self, name):
+        """删除景点及其相关路径"""
+        G = self.G  # 延迟构建的图须在修改 locations 之前取得
+        incident = [self.edges.pop(edge_key(name, other)) for other in G[name]]
+        inverse = [("restore_node", (name, self.locations[name], self.introductions.get(name), incident,
+                                     self.categories.get(name, ""), self.floors.get(name, "")))]
+        del self.locations[name]
+        if name in self.introductions:
+            del self.introductions[name]
+        self.categories.pop(name, None)
+        self.floors.pop(name, None)
+        for other in G[name]:
+            self._unindex_edge(name, other)
+        G.remove_node(name)
+        self._unindex_node(name)
+        self._invalidate()
+        return inverse
+
+    def restore_node(self, name, pos, intro, incident, category="", floor=""):
+        """撤回删除：恢复景点及其相关路径；intro 为 None 表示原先没有介绍"""
+        self.add_node(name, pos[0], pos[1], intro or "", category, floor)
+        if intro is None:
+            del self.introductions[name]
+        for u, v, weight in incident:
+            self.add_edge(u, v, weight)
+        return [("delete_node", (name,))]
+
+    def add_edge(self, u, v, weight):
+        """新增路径；已存在时更新长度"""
+        key = edge_key(u, v)
+        old_weight = self.edges[key][2] if key in self.edges else None
+        self.edges[key] = (u, v, weight)
+        self.G.add_edge(u, v, weight=weight)
+        self._index_edge(u, v)
+        self._edge_changed(u, v, old_weight, weight)
+        if old_weight is None:
+            return [("delete_edge", (u, v))]
+        return [("edit_edge", (u, v, old_weight))]
+
+    def edit_edge(self, u, v, weight):
+        """修改路径长度"""
+        key = edge_key(u, v)
+        a, b, old_weight = self.edges[key]
+        self.edges[key] = (a, b, weight)
+        self.G.edges[u, v]['weight'] = weight
+        self._edge_changed(u, v, old_weight, weight)
+        return [("edit_edge", (u, v, old_weight))]
+
+    def delete_edge(self, u, v):
+        """删除路径"""
+        G = self.G  # 延迟构建的图须在修改 edges 之前取得
+        inverse = [("add_edge", self.edges.pop(edge_key(u, v)))]
+        G.remove_edge(u, v)
+        self._unindex_edge(u, v)
+        self._invalidate()
+        return inverse
@@ -0,0 +1,218 @@
+import math
+
+import numpy as np
+
+
+# 地图点击命中检测用的空间索引（均匀网格）
+
+
+def point_segment_distances(x, y, x1, y1, x2, y2):
+    """点 (x, y) 到一组线段的距离（向量化）；退化为点的线段按点距离计算"""
+    dx = x2 - x1
+    dy = y2 - y1
+    length2 = dx * dx + dy * dy
+    safe = np.where(length2 > 0, length2, 1.0)
+    t = np.clip(((x - x1) * dx + (y - y1) * dy) / safe, 0.0, 1.0)
+    t = np.where(length2 > 0, t, 0.0)
+    return np.hypot(x - (x1 + t * dx), y - (y1 + t * dy))
+
+
+class PointGrid:
+    """均匀网格点索引：支持增删（重复插入即移动），按半径查询最近点"""
+
+    def __init__(self, cell_size=32.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}  # (cx, cy) -> {key, ...}
+        self.points = {}  # key -> (x, y)
+
+    def _cell(self, x, y):
+        return int(math.floor(x / self.cell_size)), int(math.floor(y / self.cell_size))
+
+    def __len__(self):
+        return len(self.points)
+
+    def __contains__(self, key):
+        return key in self.points
+
+    def clear(self):
+        self.cells.clear()
+        self.points.clear()
+
+    def load(self, keys, xs, ys):
+        """批量载入（清空原有内容），网格坐标整体计算"""
+        self.clear()
+        xs = np.asarray(xs, dtype=np.float64)
+        ys = np.asarray(ys, dtype=np.float64)
+        cx = np.floor(xs / self.cell_size).astype(np.int64).tolist()
+        cy = np.floor(ys / self.cell_size).astype(np.int64).tolist()
+        self.points = dict(zip(keys, zip(xs.tolist(), ys.tolist())))
+        cells = self.cells
+        for key, cell in zip(keys, zip(cx, cy)):
+            bucket = cells.get(cell)
+            if bucket is None:
+                cells[cell] = {key}
+            else:
+                bucket.add(key)
+
+    def insert(self, key, x, y):
+        if key in self.points:
+            self.remove(key)
+        x, y = float(x), float(y)
+        self.points[key] = (x, y)
+        self.cells.setdefault(self._cell(x, y), set()).add(key)
+
+    def remove(self, key):
+        x, y = self.points.pop(key)
+        cell = self._cell(x, y)
+        bucket = self.cells[cell]
+        bucket.discard(key)
+        if not bucket:
+            del self.cells[cell]
+
+    def nearest(self, x, y, radius, accept=None):
+        """返回距 (x, y) 小于 radius 的最近点，没有则返回 None；只检查半径覆盖的网格
+
+        accept 给定时只考虑 accept(点) 为真的点（如当前显示楼层的节点）。
+        """
+        x0, y0 = self._cell(x - radius, y - radius)
+        x1, y1 = self._cell(x + radius, y + radius)
+        best = None
+        best_dist = radius
+        for cx in range(x0, x1 + 1):
+            for cy in range(y0, y1 + 1):
+                for key in self.cells.get((cx, cy), ()):
+                    if accept is not None and not accept(key):
+                        continue
+                    px, py = self.points[key]
+                    dist = math.hypot(px - x, py - y)
+                    if dist < best_dist:
+                        best, best_dist = key, dist
+        return best
+
+
+class SegmentGrid:
+    """均匀网格线段索引：线段端点存放在 NumPy 数组中，按包围盒登记到网格；
+    查询时只取半径覆盖网格内的候选线段做向量化距离计算"""
+
+    def __init__(self, cell_size=64.0):
+        self.cell_size = float(cell_size)
+        self.cells = {}  # (cx, cy) -> {slot, ...}
+        self.slots = {}  # (u, v) -> slot，查找时两个方向都尝试
+        self.keys = []  # slot -> (u, v)，空闲为 None
+        self.free = []
+        self.coords = np.empty((0, 4))  # slot -> x1, y1, x2, y2
+
+    def _cell_range(self, x0, y0, x1, y1):
+        size = self.cell_size
+        return (int(math.floor(x0 / size)), int(math.floor(y0 / size)),
+                int(math.floor(x1 / size)), int(math.floor(y1 / size)))
+
+    def _covered_cells(self, slot):
+        x1, y1, x2, y2 = self.coords[slot]
+        cx0, cy0, cx1, cy1 = self._cell_range(min(x1, x2), min(y1, y2), max(x1, x2), max(y1, y2))
+        return ((cx, cy) for cx in range(cx0, cx1 + 1) for cy in range(cy0, cy1 + 1))
+
+    def __len__(self):
+        return len(self.slots)
+
+    def _slot(self, u, v):
+        slot = self.slots.get((u, v))
+        return self.slots.get((v, u)) if slot is None else slot
+
+    def __contains__(self, edge):
+        return self._slot(*edge) is not None
+
+    def clear(self):
+        self.cells.clear()
+        self.slots.clear()
+        self.keys = []
+        self.free = []
+        self.coords = np.empty((0, 4))
+
+    def load(self, keys, coords):
+        """批量载入（清空原有内容）；coords 为 (n, 4) 数组 x1, y1, x2, y2
+
+        每条线段覆盖的网格区间整体计算后展开，再按网格分组。
+        """
+        self.clear()
+        keys = list(keys)
+        n = len(keys)
+        coords = np.asarray(coords, dtype=np.float64).reshape(n, 4)
+        self.coords = coords.copy()
+        self.keys = keys
+        self.slots = dict(zip(keys, range(n)))
+        if n == 0:
+            return
+
+        size = self.cell_size
+        cx0 = np.floor(np.minimum(coords[:, 0], coords[:, 2]) / size).astype(np.int64)
+        cy0 = np.floor(np.minimum(coords[:, 1], coords[:, 3]) / size).astype(np.int64)
+        cx1 = np.floor(np.maximum(coords[:, 0], coords[:, 2]) / size).astype(np.int64)
+        cy1 = np.floor(np.maximum(coords[:, 1], coords[:, 3]) / size).astype(np.int64)
+        width = cx1 - cx0 + 1
+        count = width * (cy1 - cy0 + 1)
+
+        # 展开为 (线段, 网格) 对
+        slot = np.repeat(np.arange(n), count)
+        local = np.arange(len(slot)) - np.repeat(np.cumsum(count) - count, count)
+        cx = cx0[slot] + local % width[slot]
+        cy = cy0[slot] + local // width[slot]
+
+        order = np.lexsort((cy, cx))
+        slot, cx, cy = slot[order], cx[order], cy[order]
+        starts = np.flatnonzero(np.r_[True, (cx[1:] != cx[:-1]) | (cy[1:] != cy[:-1])])
+        bounds = np.r_[starts, len(slot)].tolist()
+        cell_x = cx[starts].tolist()
+        cell_y = cy[starts].tolist()
+        slot = slot.tolist()
+        self.cells = {(cell_x[i], cell_y[i]): set(slot[bounds[i]:bounds[i + 1]]) for i in range(len(starts))}
+
+    def insert(self, u, v, p, q):
+        """登记线段 u-v，端点坐标分别为 p、q"""
+        if (u, v) in self:
+            self.remove(u, v)
+        if self.free:
+            slot = self.free.pop()
+            self.keys[slot] = (u, v)
+        else:
+            slot = len(self.keys)
+            self.keys.append((u, v))
+            if slot >= len(self.coords):
+                # 容量按倍数增长，均摊 O(1)
+                grown = np.empty((max(16, 2 * len(self.coords)), 4))
+                grown[:len(self.coords)] = self.coords
+                self.coords = grown
+        self.coords[slot] = (p[0], p[1], q[0], q[1])
+        self.slots[(u, v)] = slot
+        for cell in self._covered_cells(slot):
+            self.cells.setdefault(cell, set()).add(slot)
+
+    def remove(self, u, v):
+        slot = self._slot(u, v)
+        del self.slots[self.keys[slot]]
+        for cell in self._covered_cells(slot):
+            bucket = self.cells[cell]
+            bucket.discard(slot)
+            if not bucket:
+                del self.cells[cell]
+        self.keys[slot] = None
+        self.free.append(slot)
+
+    def nearest(self, x, y, radius, accept=None):
+        """返回距 (x, y) 小于 radius 的最近线段 (u, v)，没有则返回 None；accept(u, v) 为假的线段不考虑"""
+        cx0, cy0, cx1, cy1 = self._cell_range(x - radius, y - radius, x + radius, y + radius)
+        candidates = set()
+        for cx in range(cx0, cx1 + 1):
+            for cy in range(cy0, cy1 + 1):
+                candidates.update(self.cells.get((cx, cy), ()))
+        if accept is not None:
+            candidates = {slot for slot in candidates if accept(*self.keys[slot])}
+        if not candidates:
+            return None
+        slots = np.fromiter(candidates, dtype=np.int64, count=len(candidates))
+        seg = self.coords[slots]
+        dist = point_segment_distances(x, y, seg[:, 0], seg[:, 1], seg[:, 2], seg[:, 3])
+        i = int(np.argmin(dist))
+        if dist[i] >= radius:
+            return None
+        return self.keys[slots[i]]
@@ -0,0 +1,136 @@
+import pandas as pd
+import pytest
+
+from history import EditJournal
+from routing_engine import RoutingEngine, edge_key
+
+
+# 撤回/重做日志：每步撤回后地图回到该步之前的状态，重做后回到该步之后的状态；
+# 路径以无序端点对为键唯一存储，任一方向都能查到、编辑
+
+
+def small_engine():
+    """5 个景点的小路网：图书馆有类别与楼层，食堂没有介绍"""
+    engine = RoutingEngine(None, route_cache_size=0)
+    locations = {"图书馆": (0, 0), "食堂": (100, 0), "校门": (100, 100), "体育馆": (0, 100), "宿舍": (50, 50)}
+    introductions = {name: f"{name}介绍" for name in locations if name != "食堂"}
+    paths = [("图书馆", "食堂", 100), ("食堂", "校门", 100), ("校门", "体育馆", 100),
+             ("体育馆", "图书馆", 100), ("宿舍", "图书馆", 70), ("宿舍", "校门", 70)]
+    engine.replace_data(locations, introductions, paths, {"图书馆": "图书馆", "食堂": "食堂"},
+                        {"图书馆": "图书馆/2F"}, add_defaults=False)
+    return engine
+
+
+def map_state(engine):
+    """地图数据及由其派生的图：撤回/重做后两者都须一致"""
+    graph = {(u, v) if u < v else (v, u): w for u, v, w in engine.G.edges(data="weight")}
+    positions = dict(engine.G.nodes(data="pos"))
+    return (dict(engine.locations), dict(engine.introductions), dict(engine.categories), dict(engine.floors),
+            dict(engine.edges), graph, positions)
+
+
+EDIT_STEPS = [
+    ("新增景点", [("add_node", ("教学楼", 200, 200, "新建", "教学楼", "教学楼/1F"))]),
+    ("新增路径", [("add_edge", ("校门", "教学楼", 120))]),
+    ("移动景点", [("move_node", ("教学楼", 210, 190))]),
+    ("编辑景点", [("rename_node", ("校门", "南门")), ("set_introduction", ("南门", None)),
+                 ("set_category", ("南门", "校门")), ("set_floor", ("图书馆", ""))]),
+    ("修改路径", [("edit_edge", ("教学楼", "南门", 80))]),
+    ("删除路径", [("delete_edge", ("宿舍", "图书馆"))]),
+    ("删除景点", [("delete_node", ("食堂",))]),
+    ("合并导入", [("merge_data", ({"食堂": (90, 10), "操场": (300, 0)}, {"操场": "跑道"},
+                                 [("操场", "教学楼", 150), ("南门", "体育馆", 999)], {"操场": "运动"}))]),
+    ("覆盖导入", [("replace_data", ({"甲": (0, 0), "乙": (1, 1)}, {}, [("甲", "乙", 2)], None, None, False))]),
+]
+
+
+def test_undo_redo_round_trip():
+    engine = small_engine()
+    journal = EditJournal(engine)
+    states = [map_state(engine)]
+    for label, ops in EDIT_STEPS:
+        journal.perform(label, *ops)
+        states.append(map_state(engine))
+    assert len(set(map(repr, states))) == len(states)  # 每一步都确实改变了地图
+
+    for i in range(len(EDIT_STEPS), 0, -1):
+        assert journal.undo() == EDIT_STEPS[i - 1][0]
+        assert map_state(engine) == states[i - 1]
+    assert journal.undo() is None and not journal.can_undo()
+    for i in range(1, len(EDIT_STEPS) + 1):
+        assert journal.redo() == EDIT_STEPS[i - 1][0]
+        assert map_state(engine) == states[i]
+    assert journal.redo() is None and not journal.can_redo()
+
+    # 撤回一半后再做新的编辑：重做栈作废，撤回仍回到对应的状态
+    for _ in range(4):
+        journal.undo()
+    journal.perform("新增路径", ("add_edge", ("南门", "教学楼", 5)))
+    assert not journal.can_redo()
+    journal.undo()
+    assert map_state(engine) == states[len(EDIT_STEPS) - 4]
+
+
+def test_observers_receive_applied_ops():
+    engine = small_engine()
+    journal = EditJournal(engine)
+    seen = []
+    journal.observers.append(seen.append)
+    journal.perform("修改路径", ("edit_edge", ("食堂", "校门", 50)))
+    journal.undo()
+    journal.redo()
+    assert seen == [[("edit_edge", ("食堂", "校门", 50))], [("edit_edge", ("食堂", "校门", 100))],
+                    [("edit_edge", ("食堂", "校门", 50))]]
+
+
+def test_history_is_bounded():
+    engine = small_engine()
+    journal = EditJournal(engine, max_steps=3)
+    for weight in range(10):
+        journal.perform("修改路径", ("edit_edge", ("食堂", "校门", weight)))
+    while journal.undo():
+        pass
+    # 只能撤回最近 3 步
+    assert engine.edge_weight("食堂", "校门") == pytest.approx(6)
+
+
+def assert_edges_consistent(engine):
+    """edges 的键都是规范键，且与图中的路径一一对应"""
+    assert all(key == edge_key(u, v) for key, (u, v, _) in engine.edges.items())
+    assert {edge_key(u, v): w for u, v, w in engine.G.edges(data="weight")} == \
+        {key: w for key, (_, _, w) in engine.edges.items()}
+
+
+def test_edge_store_canonical(tmp_path):
+    engine = RoutingEngine(None, route_cache_size=0)
+    # 重复的路径（含反方向）以最后一次的长度为准，位置保持首次出现处
+    engine.replace_data({"甲": (0, 0), "乙": (1, 0), "丙": (2, 0)}, {},
+                        [("乙", "甲", 1), ("乙", "丙", 5), ("甲", "乙", 3)], add_defaults=False)
+    assert engine.paths == [("甲", "乙", 3), ("乙", "丙", 5)]
+    assert engine.has_edge("乙", "甲") and engine.edge_weight("乙", "甲") == 3
+    assert not engine.has_edge("甲", "丙")
+
+    journal = EditJournal(engine)
+    journal.perform("新增路径", ("add_edge", ("丙", "乙", 4)))  # 已存在：只改长度
+    journal.perform("修改路径", ("edit_edge", ("乙", "甲", 2)))
+    assert len(engine.edges) == 2
+    assert engine.edge_weight("乙", "丙") == 4 and engine.edge_weight("甲", "乙") == 2
+    assert_edges_consistent(engine)
+
+    # 改名后端点排序改变的路径换到新的规范键下
+    journal.perform("编辑景点", ("rename_node", ("甲", "丁")))
+    assert engine.has_edge("乙", "丁") and engine.edge_weight("丁", "乙") == 2
+    assert not any("甲" in key for key in engine.edges)
+    assert_edges_consistent(engine)
+    journal.perform("删除路径", ("delete_edge", ("丙", "乙")))
+    assert not engine.has_edge("乙", "丙")
+    assert_edges_consistent(engine)
+    while journal.undo():
+        assert_edges_consistent(engine)
+    assert {key: w for key, (_, _, w) in engine.edges.items()} == {edge_key("乙", "丙"): 5, edge_key("甲", "乙"): 3}
+
+    # 保存时每条路径只写一次
+    node_path, edge_path = str(tmp_path / "node.csv"), str(tmp_path / "edge.csv")
+    engine.save_csv(node_path, edge_path)
+    saved = pd.read_csv(edge_path, encoding="utf-8-sig")
+    assert list(zip(saved["x"], saved["y"], saved["length"])) == engine.paths
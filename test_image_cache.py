@@ -0,0 +1,49 @@
+import os
+
+import numpy as np
+from PIL import Image
+
+from image_cache import load_resized_image
+
+
+# 底图缓存：第二次读取直接映射缓存文件；缓存文件损坏时删除并由源图片重新生成
+
+
+def make_image(tmp_path):
+    path = str(tmp_path / "map.png")
+    rng = np.random.default_rng(0)
+    Image.fromarray(rng.integers(0, 256, (60, 80, 3), dtype=np.uint8)).save(path)
+    return path
+
+
+def cache_files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(".npy"))
+
+
+def test_cache_reused(tmp_path):
+    path = make_image(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    first = load_resized_image(path, 40, 30, cache_dir)
+    assert first.shape == (30, 40, 3) and first.dtype == np.uint8
+    assert isinstance(first, np.memmap)
+    (name,) = cache_files(cache_dir)
+    np.testing.assert_array_equal(load_resized_image(path, 40, 30, cache_dir), first)
+    assert cache_files(cache_dir) == [name]
+
+
+def test_corrupt_cache_regenerated(tmp_path):
+    path = make_image(tmp_path)
+    cache_dir = str(tmp_path / "cache")
+    expected = np.array(load_resized_image(path, 40, 30, cache_dir))
+    (name,) = cache_files(cache_dir)
+    cache_path = os.path.join(cache_dir, name)
+
+    # 写到一半中断（截断）与内容损坏两种情况
+    for damage in (lambda data: data[:len(data) // 2], lambda data: b"\0" * len(data)):
+        with open(cache_path, "rb") as f:
+            data = f.read()
+        with open(cache_path, "wb") as f:
+            f.write(damage(data))
+        np.testing.assert_array_equal(load_resized_image(path, 40, 30, cache_dir), expected)
+        assert cache_files(cache_dir) == [name]
+        np.testing.assert_array_equal(np.load(cache_path), expected)
@@ -0,0 +1,128 @@
+import os
+
+import pandas as pd
+
+import routing_engine
+from campus_generator import generate, write_campus
+from map_io import DEFAULT_INTRODUCTION, csv_fingerprint, read_edges, read_nodes, read_snapshot_header
+from routing_engine import RoutingEngine, edge_key
+
+
+# 地图数据读写：CSV 按列读取的结果与原始表格一致；快照读回的路网与 CSV 相同，CSV 变化后快照失效
+
+
+def test_read_csv_matches_dataframes(tmp_path):
+    node_path, edge_path = write_campus(str(tmp_path), 200, seed=3)
+    nodes, edges = generate(200, seed=3)
+    names, xs, ys, intros, categories, floors = read_nodes(node_path)
+    assert names == nodes["name"].tolist()
+    assert xs == nodes["x"].tolist() and ys == nodes["y"].tolist()
+    assert intros == nodes["introduction"].tolist()
+    assert categories == nodes["category"].str.strip().tolist()
+    assert floors == [""] * len(names)  # 没有 floor 列
+    assert read_edges(edge_path) == list(zip(edges["x"], edges["y"], edges["length"]))
+
+
+def test_read_nodes_optional_columns(tmp_path):
+    path = tmp_path / "node.csv"
+    pd.DataFrame({
+        "name": ["图书馆", "食堂", "校门"],
+        "x": [10, 20, 30],
+        "y": [5, 15, 25],
+        "desc": ["藏书百万", "三层", "南门"],
+        "floor": ["图书馆/2F", None, " "],
+    }).to_csv(path, index=False, encoding="utf-8-sig")
+    names, xs, ys, intros, categories, floors = read_nodes(str(path))
+    assert intros == ["藏书百万", "三层", "南门"]  # 没有 introduction 列时用 desc
+    assert categories == ["", "", ""]
+    assert floors == ["图书馆/2F", "", ""]
+
+    pd.DataFrame({"name": ["图书馆"], "x": [10], "y": [5]}).to_csv(path, index=False, encoding="utf-8-sig")
+    assert read_nodes(str(path))[3] == [DEFAULT_INTRODUCTION]
+    assert read_nodes(str(path), default_intro="暂无介绍")[3] == ["暂无介绍"]
+
+
+def test_engine_loads_csv(tmp_path):
+    node_path, edge_path = write_campus(str(tmp_path), 200, seed=3)
+    nodes, edges = generate(200, seed=3)
+    engine = RoutingEngine(node_path, edge_path)
+    for name, x, y, intro, category in nodes.itertuples(index=False):
+        assert engine.locations[name] == (x, y)
+        assert engine.introductions[name] == intro
+        assert engine.categories.get(name, "") == category.strip()
+    assert not engine.floors
+    expected = {edge_key(u, v): (u, v, w) for u, v, w in zip(edges["x"], edges["y"], edges["length"])}
+    assert engine.edges == expected
+    assert engine.G.number_of_edges() == len(expected)
+
+
+def engine_state(engine):
+    return (engine.locations, engine.introductions, engine.categories, engine.floors, engine.edges)
+
+
+def forbid_csv(monkeypatch):
+    """之后的加载若解析 CSV 则测试失败"""
+    def fail(*args, **kwargs):
+        raise AssertionError("快照有效时不应读取 CSV")
+    monkeypatch.setattr(routing_engine, "read_nodes", fail)
+    monkeypatch.setattr(routing_engine, "read_edges", fail)
+
+
+def test_snapshot_round_trip(tmp_path, monkeypatch):
+    node_path, edge_path = write_campus(str(tmp_path), 200, seed=3)
+    # 整数坐标与长度、楼层标签、没有介绍的节点
+    nodes = pd.read_csv(node_path, encoding="utf-8-sig")
+    nodes[["x", "y"]] = nodes[["x", "y"]].round().astype(int)
+    nodes["floor"] = ["图书馆/2F" if i % 5 == 0 else "" for i in range(len(nodes))]
+    nodes.loc[0, "introduction"] = "含 , 逗号与\n换行的介绍"
+    nodes.to_csv(node_path, index=False, encoding="utf-8-sig")
+    edges = pd.read_csv(edge_path, encoding="utf-8-sig")
+    edges["length"] = edges["length"].round().astype(int)
+    edges.to_csv(edge_path, index=False, encoding="utf-8-sig")
+
+    snapshot_path = str(tmp_path / "map.snap")
+    from_csv = RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+    assert read_snapshot_header(snapshot_path)[0]["source"]["csv"] == csv_fingerprint(node_path, edge_path)
+
+    forbid_csv(monkeypatch)
+    from_snapshot = RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+    assert engine_state(from_snapshot) == engine_state(from_csv)
+    assert all(type(x) is int and type(y) is int for x, y in from_snapshot.locations.values())
+    assert all(type(w) is int for _, _, w in from_snapshot.edges.values())
+    names = list(from_csv.locations)[::37]
+    for start, end in zip(names, names[1:]):
+        assert from_snapshot.shortest_path(start, end) == from_csv.shortest_path(start, end)
+
+
+def test_snapshot_stale_after_csv_change(tmp_path, monkeypatch):
+    node_path, edge_path = write_campus(str(tmp_path), 200, seed=3)
+    snapshot_path = str(tmp_path / "map.snap")
+    RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+
+    # 追加一条路径：CSV 的大小与修改时间都变了，快照不再使用并按新的 CSV 重写
+    with open(edge_path, "a", encoding="utf-8") as f:
+        f.write("地点0,地点199,1.5\n")
+    engine = RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+    assert engine.edges[edge_key("地点0", "地点199")] == ("地点0", "地点199", 1.5)
+    assert read_snapshot_header(snapshot_path)[0]["source"]["csv"] == csv_fingerprint(node_path, edge_path)
+
+    # 只改修改时间也视为过期
+    stat = os.stat(node_path)
+    os.utime(node_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    assert read_snapshot_header(snapshot_path)[0]["source"]["csv"] != csv_fingerprint(node_path, edge_path)
+    RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+    assert read_snapshot_header(snapshot_path)[0]["source"]["csv"] == csv_fingerprint(node_path, edge_path)
+
+    forbid_csv(monkeypatch)
+    reloaded = RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+    assert engine_state(reloaded) == engine_state(engine)
+
+
+def test_corrupt_snapshot_falls_back_to_csv(tmp_path):
+    node_path, edge_path = write_campus(str(tmp_path), 50, seed=3)
+    snapshot_path = str(tmp_path / "map.snap")
+    with open(snapshot_path, "wb") as f:
+        f.write(b"not a snapshot")
+    engine = RoutingEngine(node_path, edge_path, snapshot_path=snapshot_path)
+    assert engine_state(engine) == engine_state(RoutingEngine(node_path, edge_path))
+    assert read_snapshot_header(snapshot_path)[0]["source"]["csv"] == csv_fingerprint(node_path, edge_path)
@@ -0,0 +1,61 @@
+from history import EditJournal
+from map_store import MapStore
+from routing_engine import RoutingEngine, edge_key
+from test_history import EDIT_STEPS, map_state, small_engine
+
+
+# SQLite 地图存储：每步编辑、撤回、重做后，数据库中的地图与引擎一致（另开连接读取，只能看到已提交的内容）
+
+
+def assert_stored(path, engine):
+    store = MapStore(path)
+    try:
+        locations, introductions, paths, categories, floors = store.read()
+    finally:
+        store.close()
+    assert locations == engine.locations
+    assert introductions == engine.introductions
+    assert categories == engine.categories
+    assert floors == engine.floors
+    assert {edge_key(u, v): (u, v, w) for u, v, w in paths} == engine.edges
+    assert len(paths) == len(engine.edges)
+
+
+def test_record_every_step(tmp_path):
+    path = str(tmp_path / "map.db")
+    engine = small_engine()
+    store = MapStore(path)
+    assert store.is_empty()
+    store.write_all(engine)
+    journal = EditJournal(engine)
+    journal.observers.append(lambda ops: store.record(engine, ops))
+
+    for label, ops in EDIT_STEPS:
+        journal.perform(label, *ops)
+        assert_stored(path, engine)
+    while journal.undo():
+        assert_stored(path, engine)
+    while journal.redo():
+        assert_stored(path, engine)
+    assert store.writes == 1 + 3 * len(EDIT_STEPS)
+    store.close()
+
+
+def test_reload_after_close(tmp_path):
+    """关闭后重新打开数据库，读回的地图与关闭前相同"""
+    path = str(tmp_path / "map.db")
+    engine = small_engine()
+    store = MapStore(path)
+    store.write_all(engine)
+    journal = EditJournal(engine)
+    journal.observers.append(lambda ops: store.record(engine, ops))
+    for label, ops in EDIT_STEPS[:-2]:  # 不含整体替换地图的导入
+        journal.perform(label, *ops)
+    store.close()
+
+    store = MapStore(path)
+    assert not store.is_empty()
+    reloaded = RoutingEngine(None, route_cache_size=0)
+    reloaded.replace_data(*store.read(), add_defaults=False)
+    store.close()
+    assert map_state(reloaded) == map_state(engine)
@@ -0,0 +1,76 @@
+import pytest
+
+from history import EditJournal
+from route_cache import RouteCache
+from test_history import small_engine
+
+
+# 路径结果缓存：LRU 淘汰、按路网版本失效，以及临时规则生效时只丢弃经过受影响路径的结果
+
+
+def test_lru_hits_and_eviction():
+    cache = RouteCache(2)
+    cache.put("甲", 0, ["a", "b"], 1.0)
+    cache.put("乙", 0, ["b", "c"], 2.0)
+    assert cache.get("甲", 0) == (("a", "b"), 1.0)  # 甲成为最近使用
+    cache.put("丙", 0, ["c", "d"], 3.0)  # 淘汰最久未用的乙
+    assert cache.get("乙", 0) is None
+    assert cache.get("丙", 0) == (("c", "d"), 3.0)
+    assert cache.get("甲", 0) == (("a", "b"), 1.0)
+    stats = cache.stats()
+    assert (stats["size"], stats["hits"], stats["misses"], stats["evictions"]) == (2, 3, 1, 1)
+    assert stats["hit_rate"] == pytest.approx(0.75)
+
+
+def test_version_change_invalidates():
+    cache = RouteCache(4)
+    cache.put("甲", 0, ["a", "b"], 1.0)
+    assert cache.get("甲", 1) is None
+    assert len(cache) == 0 and cache.stats()["invalidations"] == 1
+    cache.put("甲", 1, ["a", "c", "b"], 2.0)
+    assert cache.get("甲", 1) == (("a", "c", "b"), 2.0)
+
+    disabled = RouteCache(0)
+    disabled.put("甲", 0, ["a", "b"], 1.0)
+    assert disabled.get("甲", 0) is None and len(disabled) == 0
+
+
+def test_engine_edit_bumps_version():
+    engine = small_engine()
+    engine.route_cache = RouteCache(16)
+    journal = EditJournal(engine)
+    assert engine.shortest_path("图书馆", "校门") == (["图书馆", "宿舍", "校门"], 140)
+    assert not engine.last_cached
+    assert engine.shortest_path("图书馆", "校门") == (["图书馆", "宿舍", "校门"], 140)
+    assert engine.last_cached
+
+    version = engine.version
+    journal.perform("修改路径", ("edit_edge", ("宿舍", "校门", 500)))
+    assert engine.version > version
+    assert engine.shortest_path("图书馆", "校门")[1] == 200
+    assert not engine.last_cached
+    journal.undo()
+    assert engine.shortest_path("图书馆", "校门") == (["图书馆", "宿舍", "校门"], 140)
+    assert not engine.last_cached
+
+
+def test_restriction_discards_only_affected_routes():
+    engine = small_engine()
+    engine.route_cache = RouteCache(16)
+    engine.shortest_path("图书馆", "校门")  # 经过 宿舍-校门
+    engine.shortest_path("食堂", "图书馆")  # 不经过
+    version = engine.version
+
+    # 封闭只会使路径变长：未经过该路径的结果仍有效
+    rule_id = engine.add_restriction("宿舍", "校门")
+    assert engine.version == version
+    assert engine.shortest_path("食堂", "图书馆") == (["食堂", "图书馆"], 100)
+    assert engine.last_cached
+    assert engine.shortest_path("图书馆", "校门")[1] == 200
+    assert not engine.last_cached
+
+    # 解除封闭使路径变短：任何结果都可能不再最短，全部丢弃
+    engine.remove_restriction(rule_id)
+    assert engine.shortest_path("食堂", "图书馆") == (["食堂", "图书馆"], 100)
+    assert not engine.last_cached
+    assert engine.shortest_path("图书馆", "校门") == (["图书馆", "宿舍", "校门"], 140)
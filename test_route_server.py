@@ -0,0 +1,43 @@
+import pytest
+
+from route_server import MAX_ALTERNATIVES, RouteService
+from test_history import small_engine
+
+
+# 路由服务的参数检查：错误的参数返回 400 与明确的说明，而不是 Python 的异常信息
+
+
+@pytest.fixture(scope="module")
+def service():
+    return RouteService(small_engine())
+
+
+def query(service, path, **params):
+    return service.handle(path, {name: [value] for name, value in params.items()})
+
+
+@pytest.mark.parametrize("k", ["abc", "1.5", "0", "-2"])
+def test_count_must_be_positive_integer(service, k):
+    assert query(service, "/alternatives", **{"from": "图书馆", "to": "校门", "k": k}) == \
+        (400, {"error": "k 必须为正整数"})
+    assert query(service, "/nearest", **{"from": "校门", "category": "食堂", "k": k}) == \
+        (400, {"error": "k 必须为正整数"})
+
+
+def test_count_limits_and_defaults(service):
+    status, body = query(service, "/alternatives", **{"from": "图书馆", "to": "校门", "k": str(MAX_ALTERNATIVES + 1)})
+    assert status == 400 and str(MAX_ALTERNATIVES) in body["error"]
+    status, body = query(service, "/alternatives", **{"from": "图书馆", "to": "校门", "k": "2"})
+    assert status == 200 and [route["length"] for route in body["routes"]] == [140, 200]
+    status, body = query(service, "/alternatives", **{"from": "图书馆", "to": "校门"})
+    assert status == 200 and len(body["routes"]) == 3
+    status, body = query(service, "/nearest", **{"from": "校门", "category": "食堂"})
+    assert status == 200 and [facility["name"] for facility in body["facilities"]] == ["食堂"]
+
+
+def test_recommended_id(service):
+    assert query(service, "/recommended", id="第一条") == (400, {"error": "id 必须为正整数"})
+    assert query(service, "/recommended", id="0") == (400, {"error": "id 必须为正整数"})
+    assert query(service, "/recommended") == (400, {"error": "缺少参数 id"})
+    status, body = query(service, "/recommended", id="99")
+    assert status == 400 and "推荐路线 99 不存在" in body["error"]
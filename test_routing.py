@@ -0,0 +1,251 @@
+import itertools
+import math
+import time
+
+import networkx as nx
+import numpy as np
+import pytest
+
+from campus_generator import generate
+from distance_table import DistanceTable
+from history import EditJournal
+from restrictions import CLOSED
+from routing_engine import RoutingEngine, edge_key
+
+
+# 路网查询的正确性测试：在合成校园路网上把各搜索方式的结果与 networkx 的最短路径对比
+# 运行：python -m pytest -q
+
+NUM_NODES = 300
+NUM_PAIRS = 30
+
+
+def make_engine(num_nodes=NUM_NODES, seed=0, floors=None, **kwargs):
+    """由 campus_generator 生成的路网构建引擎；floors 为 {景点: 楼层标签}"""
+    nodes, edges = generate(num_nodes, seed)
+    locations = {name: (x, y) for name, x, y in zip(nodes["name"], nodes["x"], nodes["y"])}
+    introductions = dict(zip(nodes["name"], nodes["introduction"]))
+    categories = {name: category for name, category in zip(nodes["name"], nodes["category"]) if category}
+    paths = list(zip(edges["x"], edges["y"], edges["length"]))
+    engine = RoutingEngine(None, **kwargs)
+    engine.replace_data(locations, introductions, paths, categories, floors or {}, add_defaults=False)
+    return engine
+
+
+def reference_graph(engine):
+    """与引擎查询所用路网相同的 networkx 图：乘以生效规则的系数，不含封闭的路径"""
+    graph = nx.Graph()
+    graph.add_nodes_from(engine.locations)
+    for key, (u, v, w) in engine.edges.items():
+        factor = engine.restrictions.active.get(key, 1.0)
+        if factor != CLOSED:
+            graph.add_edge(u, v, weight=w * factor)
+    return graph
+
+
+def node_pairs(engine, count=NUM_PAIRS, seed=1):
+    names = list(engine.locations)
+    pairs = itertools.islice(itertools.combinations(names[::7], 2), seed, None, 11)
+    return list(itertools.islice(pairs, count))
+
+
+def path_length(graph, path):
+    return sum(graph[u][v]["weight"] for u, v in zip(path, path[1:]))
+
+
+@pytest.fixture(scope="module")
+def engine():
+    return make_engine()
+
+
+def test_k_shortest_paths_match_networkx(engine):
+    graph = reference_graph(engine)
+    for start, end in node_pairs(engine, 10):
+        expected = [path_length(graph, path) for path in
+                    itertools.islice(nx.shortest_simple_paths(graph, start, end, weight="weight"), 5)]
+        routes = engine.k_shortest_paths(start, end, 5)
+        assert [length for _, length in routes] == pytest.approx(expected)
+        assert len({tuple(path) for path, _ in routes}) == len(routes)
+        for path, length in routes:
+            assert path[0] == start and path[-1] == end
+            assert len(set(path)) == len(path)  # 无环
+            assert path_length(graph, path) == pytest.approx(length)
+
+
+def assert_matches_networkx(engine, graph, method, pairs):
+    """各起终点的最短路径长度与 networkx 相同，且路径确实由图中的路径组成；不连通时两者都报告没有路径"""
+    for start, end in pairs:
+        if not nx.has_path(graph, start, end):
+            with pytest.raises(nx.NetworkXNoPath):
+                engine.shortest_path(start, end, method)
+            continue
+        path, length = engine.shortest_path(start, end, method)
+        assert length == pytest.approx(nx.dijkstra_path_length(graph, start, end)), (method, start, end)
+        assert path[0] == start and path[-1] == end
+        assert path_length(graph, path) == pytest.approx(length)
+
+
+def test_contraction_matches_networkx():
+    engine = make_engine(route_cache_size=0)
+    engine.build_contraction()
+    assert engine.contraction() is not None
+    assert_matches_networkx(engine, reference_graph(engine), "ch", node_pairs(engine))
+
+
+def test_contraction_falls_back_after_edit():
+    engine = make_engine(route_cache_size=0)
+    engine.build_contraction()
+    journal = EditJournal(engine)
+    u, v, w = next(iter(engine.edges.values()))
+    journal.perform("缩短路径", ("edit_edge", (u, v, w / 10)))
+    # 路网与层次结构不符：退回 Dijkstra，结果仍然正确
+    assert engine.contraction() is None
+    assert_matches_networkx(engine, reference_graph(engine), "ch", node_pairs(engine))
+    journal.undo()
+    assert engine.contraction() is not None
+    assert_matches_networkx(engine, reference_graph(engine), "ch", node_pairs(engine))
+
+
+def building_floors(engine, size=300):
+    """把路网按 size 像素的方格划分：棋盘格中一半方格为楼宇（节点依次分到 1~3 层），其余为室外"""
+    floors = {}
+    for i, (name, (x, y)) in enumerate(engine.locations.items()):
+        cx, cy = int(x // size), int(y // size)
+        if (cx + cy) % 2 == 0:
+            floors[name] = f"楼{cx}_{cy}/{i % 3 + 1}F"
+    return floors
+
+
+def test_floor_overlay_matches_networkx():
+    plain = make_engine()
+    floors = building_floors(plain)
+    engine = make_engine(floors=floors, route_cache_size=0)
+    overlay = engine.overlay()
+    assert overlay.num_portals > 0 and len(overlay.buildings) > 1
+    graph = reference_graph(engine)
+    # 跨楼宇、室外到楼内，以及同一楼宇内的起终点
+    indoor = [name for name in engine.locations if name in floors]
+    same_building = [(a, b) for a, b in zip(indoor, indoor[1:]) if floors[a].split("/")[0] == floors[b].split("/")[0]]
+    assert same_building
+    assert_matches_networkx(engine, graph, "overlay", node_pairs(engine) + same_building[:10])
+
+
+def assert_table_fresh(engine):
+    """增量修补后的最短路径表与按当前路网重建的相同"""
+    table = engine.distance_table()
+    fresh = DistanceTable(engine.csr())
+    assert table.names == fresh.names
+    np.testing.assert_allclose(table.dist, fresh.dist)
+
+
+def test_distance_table_incremental_edits():
+    engine = make_engine(use_distance_table=True, route_cache_size=0)
+    journal = EditJournal(engine)
+    pairs = node_pairs(engine)
+    engine.distance_table()
+    edges = list(engine.edges.values())
+    u, v, w = edges[0]
+    journal.perform("缩短路径", ("edit_edge", (u, v, w / 4)))
+    a, b = pairs[0]
+    journal.perform("新增路径", ("add_edge", (a, b, 1.0)))
+    u, v, w = edges[1]
+    journal.perform("加长路径", ("edit_edge", (u, v, w * 4)))
+    assert_table_fresh(engine)
+    assert_matches_networkx(engine, reference_graph(engine), "dijkstra", pairs)
+    for _ in range(3):
+        journal.undo()
+    assert_table_fresh(engine)
+    assert_matches_networkx(engine, reference_graph(engine), "dijkstra", pairs)
+
+
+SEARCH_CHECKS = ["dijkstra", "astar", "bidirectional", "bidirectional_astar", "ch"]
+
+
+def assert_all_queries_match(engine, pairs, category):
+    """全部搜索方式、备选路线、最近设施与游览路线规划都与 networkx 一致"""
+    graph = reference_graph(engine)
+    for method in SEARCH_CHECKS:
+        assert_matches_networkx(engine, graph, method, pairs)
+    for start, end in pairs[:5]:
+        expected = [path_length(graph, path) for path in
+                    itertools.islice(nx.shortest_simple_paths(graph, start, end, weight="weight"), 3)]
+        assert [length for _, length in engine.k_shortest_paths(start, end, 3)] == pytest.approx(expected)
+    facilities = [name for name, value in engine.categories.items() if value == category]
+    for start, _ in pairs[:5]:
+        lengths = nx.single_source_dijkstra_path_length(graph, start)
+        expected = min(lengths.get(name, math.inf) for name in facilities)
+        assert engine.nearest_facilities(start, category)[0][2] == pytest.approx(expected)
+    stops = [start for start, _ in pairs[:4]]
+    order, path, length = engine.plan_tour(stops)
+    assert path_length(graph, path) == pytest.approx(length)
+    expected = min(sum(nx.dijkstra_path_length(graph, a, b) for a, b in zip(order_, order_[1:]))
+                   for order_ in ([stops[0]] + list(rest) for rest in itertools.permutations(stops[1:])))
+    assert length == pytest.approx(expected)
+    if engine.use_distance_table:
+        assert_table_fresh(engine)
+
+
+@pytest.mark.parametrize("use_distance_table", [False, True])
+def test_restrictions_applied_and_lifted(use_distance_table):
+    engine = make_engine(use_distance_table=use_distance_table)
+    engine.build_contraction()
+    pairs = node_pairs(engine)
+    category = max(set(engine.categories.values()), key=list(engine.categories.values()).count)
+    # 先查询一遍，使缓存、最短路径树与最短路径表都已建好，规则生效时走增量修补
+    assert_all_queries_match(engine, pairs, category)
+    base = {pair: engine.shortest_path(*pair)[1] for pair in pairs}
+
+    # 在前几条最短路径上封闭一段、减速一段，时段从 100 秒后开始；
+    # 封闭的路径两端都至少有 3 条路径，封闭后路网仍然连通，其余查询都有结果
+    graph = reference_graph(engine)
+    now = time.time()
+    for start, end in pairs[:6]:
+        path, _ = engine.shortest_path(start, end)
+        hops = list(zip(path, path[1:]))
+        u, v = next((a, b) for a, b in hops if graph.degree[a] >= 3 and graph.degree[b] >= 3)
+        engine.add_restriction(u, v, start=now + 100, end=now + 200)
+        engine.add_restriction(*hops[-1], 3.0, start=now + 100, end=now + 200)
+    assert engine.refresh_restrictions(now + 50) == []
+    assert not engine.restrictions.active
+
+    assert engine.refresh_restrictions(now + 150)
+    assert CLOSED in engine.restrictions.active.values()
+    assert nx.is_connected(reference_graph(engine))
+    assert engine.contraction() is None  # 规则生效期间退回 Dijkstra
+    assert_all_queries_match(engine, pairs, category)
+    assert any(engine.shortest_path(*pair)[1] != pytest.approx(base[pair]) for pair in pairs)
+    for start, end in pairs:
+        path, _ = engine.shortest_path(start, end)
+        closed = [key for key, factor in engine.restrictions.active.items() if factor == CLOSED]
+        assert not {edge_key(a, b) for a, b in zip(path, path[1:])} & set(closed)
+
+    assert engine.refresh_restrictions(now + 250)
+    assert not engine.restrictions.active
+    assert engine.contraction() is not None
+    assert_all_queries_match(engine, pairs, category)
+    assert {pair: engine.shortest_path(*pair)[1] for pair in pairs} == pytest.approx(base)
+
+
+def test_restriction_right_after_edit():
+    """编辑路径后未经查询（CSR 图尚未重建）直接添加封闭：最短路径表仍须按规则修补"""
+    engine = make_engine(use_distance_table=True, route_cache_size=0)
+    journal = EditJournal(engine)
+    pairs = node_pairs(engine)
+    graph = reference_graph(engine)
+    start, end = next((a, b) for a, b in pairs if len(engine.shortest_path(a, b)[0]) > 3)
+    path, _ = engine.shortest_path(start, end)
+    u, v = next((a, b) for a, b in zip(path, path[1:]) if graph.degree[a] >= 3 and graph.degree[b] >= 3)
+    journal.perform("缩短路径", ("edit_edge", (u, v, engine.edge_weight(u, v) / 2)))
+    rule_id = engine.add_restriction(u, v)
+    closed_path, _ = engine.shortest_path(start, end)
+    assert edge_key(u, v) not in {edge_key(a, b) for a, b in zip(closed_path, closed_path[1:])}
+    assert_table_fresh(engine)
+    assert_matches_networkx(engine, reference_graph(engine), "dijkstra", pairs)
+
+    # 解除前同样先编辑：解除后走被缩短的路径
+    journal.perform("缩短路径", ("edit_edge", (u, v, engine.edge_weight(u, v) / 2)))
+    engine.remove_restriction(rule_id)
+    assert_table_fresh(engine)
+    assert_matches_networkx(engine, reference_graph(engine), "dijkstra", pairs)
+    lifted_path, _ = engine.shortest_path(start, end)
+    assert edge_key(u, v) in {edge_key(a, b) for a, b in zip(lifted_path, lifted_path[1:])}
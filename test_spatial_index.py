@@ -0,0 +1,114 @@
+import math
+import random
+
+import numpy as np
+
+from spatial_index import PointGrid, SegmentGrid, point_segment_distances
+
+
+# 点击命中检测的空间索引：与逐个计算距离的暴力查找对比
+
+
+def brute_nearest_point(points, x, y, radius, accept=None):
+    best, best_dist = None, radius
+    for key, (px, py) in points.items():
+        dist = math.hypot(px - x, py - y)
+        if (accept is None or accept(key)) and dist < best_dist:
+            best, best_dist = key, dist
+    return best
+
+
+def random_points(rng, count, size=1000.0):
+    return {f"点{i}": (rng.uniform(0, size), rng.uniform(0, size)) for i in range(count)}
+
+
+def test_point_grid_matches_brute_force():
+    rng = random.Random(0)
+    points = random_points(rng, 500)
+    grid = PointGrid(cell_size=32.0)
+    grid.load(list(points), [p[0] for p in points.values()], [p[1] for p in points.values()])
+
+    # 插入新点、移动已有点（重复插入）、删除
+    for i in range(50):
+        key = f"新点{i}"
+        points[key] = (rng.uniform(0, 1000), rng.uniform(0, 1000))
+        grid.insert(key, *points[key])
+    for key in rng.sample(sorted(points), 100):
+        points[key] = (rng.uniform(0, 1000), rng.uniform(0, 1000))
+        grid.insert(key, *points[key])
+    for key in rng.sample(sorted(points), 100):
+        del points[key]
+        grid.remove(key)
+    assert len(grid) == len(points)
+    assert sum(len(bucket) for bucket in grid.cells.values()) == len(points)
+
+    even = lambda key: key.endswith(("0", "2", "4", "6", "8"))
+    for _ in range(300):
+        x, y, radius = rng.uniform(-20, 1020), rng.uniform(-20, 1020), rng.choice([5, 15, 40, 100])
+        assert grid.nearest(x, y, radius) == brute_nearest_point(points, x, y, radius)
+        assert grid.nearest(x, y, radius, even) == brute_nearest_point(points, x, y, radius, even)
+
+
+def test_point_grid_radius_is_strict():
+    grid = PointGrid(cell_size=10.0)
+    grid.insert("图书馆", 0.0, 0.0)
+    assert grid.nearest(3.0, 4.0, 5.0) is None  # 距离恰为 5
+    assert grid.nearest(3.0, 4.0, 5.01) == "图书馆"
+    assert grid.nearest(-3.0, -4.0, 5.01) == "图书馆"  # 负坐标所在的网格
+
+
+def segment_distances(segments, keys, x, y):
+    seg = np.array([segments[key] for key in keys]).reshape(-1, 4)
+    return point_segment_distances(x, y, seg[:, 0], seg[:, 1], seg[:, 2], seg[:, 3])
+
+
+def assert_nearest_segment(grid, segments, x, y, radius, accept=None):
+    """命中的线段与暴力查找的最近距离相同（共享端点时可能有多条同样近的线段）"""
+    keys = [key for key in segments if accept is None or accept(*key)]
+    best = segment_distances(segments, keys, x, y).min(initial=math.inf)
+    found = grid.nearest(x, y, radius, accept)
+    if best >= radius:
+        assert found is None
+    else:
+        assert accept is None or accept(*found)
+        assert segment_distances(segments, [found], x, y)[0] == best
+
+
+def test_segment_grid_matches_brute_force():
+    rng = random.Random(1)
+    points = random_points(rng, 200)
+    names = list(points)
+    segments = {}
+    while len(segments) < 300:
+        u, v = rng.sample(names, 2)
+        if (v, u) not in segments:
+            segments[(u, v)] = points[u] + points[v]
+    grid = SegmentGrid(cell_size=64.0)
+    grid.load(list(segments), np.array(list(segments.values())))
+
+    # 删除、新增（复用空闲位置）、移动，以及退化为点的线段
+    for key in rng.sample(sorted(segments), 80):
+        del segments[key]
+        grid.remove(*key[::-1])  # 两个方向都能找到
+    for i in range(100):
+        u, v = rng.sample(names, 2)
+        if (u, v) in segments or (v, u) in segments:
+            continue
+        segments[(u, v)] = points[u] + points[v]
+        grid.insert(u, v, points[u], points[v])
+    for u, v in rng.sample(sorted(segments), 30):  # 重复插入即移动，键的方向可以相反
+        p = (rng.uniform(0, 1000), rng.uniform(0, 1000))
+        del segments[(u, v)]
+        segments[(v, u)] = p + points[u]
+        grid.insert(v, u, p, points[u])
+    segments[("孤点", "孤点")] = (500.0, 500.0, 500.0, 500.0)
+    grid.insert("孤点", "孤点", (500.0, 500.0), (500.0, 500.0))
+    assert len(grid) == len(segments)
+    assert all(key in grid and key[::-1] in grid for key in segments)
+
+    accept = lambda u, v: u < v
+    for _ in range(300):
+        x, y, radius = rng.uniform(-20, 1020), rng.uniform(-20, 1020), rng.choice([3, 10, 30])
+        assert_nearest_segment(grid, segments, x, y, radius)
+        assert_nearest_segment(grid, segments, x, y, radius, accept)
+    assert grid.nearest(500.5, 500.0, 1.0) == ("孤点", "孤点")
@@ -0,0 +1,119 @@
+import numpy as np
+
+
+# 多景点游览路线规划：给定各景点间的最短距离矩阵，求总长度最短的访问顺序
+# 下标 0 为起点；终点可以不固定（走完即止）、固定为某个景点，或回到起点（环游）
+# 景点不多时用状态压缩动态规划（Held-Karp）求精确解，较多时用最近邻构造 + 2-opt / Or-opt 局部优化
+
+# 不含起点、终点的途经景点数不超过该值时求精确解（状态数为 2^n × n）
+EXACT_LIMIT = 12
+
+
+def plan_order(dist, end=None):
+    """返回访问顺序（dist 的下标列表，首项为 0）
+
+    dist 为对称的距离矩阵（各项有限）；end 为 None 时终点不固定，为 0 时回到起点，否则固定为该下标。
+    """
+    dist = np.asarray(dist, dtype=np.float64)
+    m = len(dist)
+    free = [i for i in range(1, m) if i != end]
+    if len(free) <= EXACT_LIMIT:
+        middle = _held_karp(dist, free, end)
+    else:
+        middle = _improve(dist, _nearest_neighbor(dist, free), end)
+    return [0] + middle + ([end] if end is not None else [])
+
+
+def order_length(dist, order):
+    return float(sum(dist[a][b] for a, b in zip(order[:-1], order[1:])))
+
+
+def _held_karp(dist, free, end):
+    """精确解：dp[mask, k] 为从起点出发、恰好经过 mask 中的途经点且停在第 k 个途经点的最短距离"""
+    n = len(free)
+    if n == 0:
+        return []
+    free = np.array(free)
+    inner = dist[np.ix_(free, free)]
+    tail = dist[free, end] if end is not None else np.zeros(n)
+
+    dp = np.full((1 << n, n), np.inf)
+    parent = np.full((1 << n, n), -1, dtype=np.int64)
+    bits = 1 << np.arange(n)
+    dp[bits, np.arange(n)] = dist[0, free]
+    # 状态 (mask | bit k, k) 只能由 (mask, ·) 转移而来，按 mask 递增的顺序逐行整体计算即可
+    for mask in range(1, 1 << n):
+        cand = dp[mask][:, None] + inner
+        best = cand.min(axis=0)
+        arg = cand.argmin(axis=0)
+        ks = np.flatnonzero((mask & bits) == 0)
+        dp[mask | bits[ks], ks] = best[ks]
+        parent[mask | bits[ks], ks] = arg[ks]
+
+    mask = (1 << n) - 1
+    k = int(np.argmin(dp[mask] + tail))
+    middle = []
+    while k >= 0:
+        middle.append(int(free[k]))
+        mask, k = mask & ~(1 << k), int(parent[mask, k])
+    middle.reverse()
+    return middle
+
+
+def _nearest_neighbor(dist, free):
+    """贪心构造初始顺序：每次前往最近的未访问景点"""
+    remaining = set(free)
+    order = []
+    current = 0
+    while remaining:
+        current = min(remaining, key=dist[current].__getitem__)
+        order.append(current)
+        remaining.remove(current)
+    return order
+
+
+def _improve(dist, middle, end):
+    """对途经点序列交替做 2-opt（翻转一段）与 Or-opt（把 1~3 个连续景点移到别处），直到不再变短"""
+    d = dist.tolist()
+    seq = [0] + middle + ([end] if end is not None else [])
+    last = len(seq) - 1 if end is not None else len(seq)  # 可移动区间为 seq[1:last]
+
+    def cost(a, b):
+        # 终点不固定时序列末尾之后视为距离 0 的虚拟终点
+        return 0.0 if b is None else d[a][b]
+
+    def at(i):
+        return seq[i] if i < len(seq) else None
+
+    improved = True
+    while improved:
+        improved = False
+        # 2-opt：翻转 seq[i..j]
+        for i in range(1, last - 1):
+            for j in range(i + 1, last):
+                a, b, c, e = seq[i - 1], seq[i], seq[j], at(j + 1)
+                if d[a][c] + cost(b, e) < d[a][b] + cost(c, e) - 1e-9:
+                    seq[i:j + 1] = seq[i:j + 1][::-1]
+                    improved = True
+        # Or-opt：把 seq[i..i+size-1] 插入到其他位置（可翻转）
+        for size in (1, 2, 3):
+            i = 1
+            while i + size <= last:
+                segment = seq[i:i + size]
+                a, e = seq[i - 1], at(i + size)
+                removed = d[a][segment[0]] + cost(segment[-1], e) - cost(a, e)
+                rest = seq[:i] + seq[i + size:]
+                best = None
+                for j in range(0, last - size):
+                    # 在去掉该段后的序列中，插到第 j 个元素之后
+                    p, q = rest[j], rest[j + 1] if j + 1 < len(rest) else None
+                    for part in (segment, segment[::-1]):
+                        added = d[p][part[0]] + cost(part[-1], q) - cost(p, q)
+                        if added < removed - 1e-9 and (best is None or added < best[0]):
+                            best = (added, j, part)
+                if best is not None:
+                    _, j, part = best
+                    seq[:] = rest[:j + 1] + part + rest[j + 1:]
+                    improved = True
+                i += 1
+    return seq[1:last]
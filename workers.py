@@ -0,0 +1,115 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+
+# 后台任务：耗时操作在线程池中执行，进度与结果经队列交回 Tk 主线程（root.after 轮询），
+# 回调函数始终在主线程中调用，可以直接操作界面
+
+
+class TaskCancelled(Exception):
+    """任务被取消（由 Task.check 抛出）"""
+
+
+class Task:
+    """提交给线程池的任务句柄：工作函数通过它汇报进度、检查取消"""
+
+    def __init__(self, runner, name, exclusive):
+        self.runner = runner
+        self.name = name
+        self.exclusive = exclusive  # 是否独占路网数据（执行期间界面不得读写路网）
+        self._cancel = threading.Event()
+
+    def cancel(self):
+        """请求取消；工作函数在下一个检查点退出，已开始的单步计算不会被打断"""
+        self._cancel.set()
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    def check(self):
+        """检查点：已请求取消时抛出 TaskCancelled"""
+        if self._cancel.is_set():
+            raise TaskCancelled()
+
+    def report(self, fraction, message=""):
+        """汇报进度（0~1，None 表示无法估计）"""
+        self.runner._events.put((self, "progress", (fraction, message)))
+
+
+class TaskRunner:
+    """线程池 + 主线程回调"""
+
+    def __init__(self, root, max_workers=2, poll_ms=50):
+        self.root = root
+        self.poll_ms = poll_ms
+        self._pool = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="campus-nav")
+        self._events = queue.Queue()
+        self._callbacks = {}  # Task -> (on_done, on_error, on_progress)
+        self._polling = False
+
+    @property
+    def tasks(self):
+        return list(self._callbacks)
+
+    @property
+    def busy(self):
+        """是否有独占路网数据的任务在执行"""
+        return any(task.exclusive for task in self._callbacks)
+
+    def submit(self, name, fn, *args, on_done=None, on_error=None, on_progress=None, exclusive=True):
+        """在线程池中执行 fn(task, *args)，完成后在主线程调用 on_done(结果) 或 on_error(异常)
+
+        工作函数因取消而退出（抛出 TaskCancelled）时两者都不调用；已正常返回的结果总会交付，
+        因此有副作用的任务应在产生副作用之前调用 task.check()。
+        """
+        task = Task(self, name, exclusive)
+        self._callbacks[task] = (on_done, on_error, on_progress)
+        self._pool.submit(self._run, task, fn, args)
+        if not self._polling:
+            self._polling = True
+            self.root.after(self.poll_ms, self._poll)
+        return task
+
+    def _run(self, task, fn, args):
+        try:
+            task.check()
+            self._events.put((task, "done", fn(task, *args)))
+        except TaskCancelled:
+            self._events.put((task, "cancelled", None))
+        except Exception as e:
+            self._events.put((task, "error", e))
+
+    def _poll(self):
+        """主线程：处理队列中的进度与结果"""
+        while True:
+            try:
+                task, kind, value = self._events.get_nowait()
+            except queue.Empty:
+                break
+            if task not in self._callbacks:
+                continue
+            on_done, on_error, on_progress = self._callbacks[task]
+            if kind == "progress":
+                if on_progress is not None and not task.cancelled:
+                    on_progress(*value)
+                continue
+            del self._callbacks[task]
+            if kind == "done" and on_done is not None:
+                on_done(value)
+            elif kind == "error" and on_error is not None:
+                on_error(value)
+
+        if self._callbacks:
+            self.root.after(self.poll_ms, self._poll)
+        else:
+            self._polling = False
+
+    def cancel_all(self):
+        for task in self._callbacks:
+            task.cancel()
+
+    def shutdown(self):
+        self.cancel_all()
+        self._pool.shutdown(wait=False)